@@ -1,64 +1,329 @@
 import os
-import subprocess
+import sys
+import time
+import signal
+import asyncio
 import logging
+import argparse
+import threading
 from concurrent.futures import ThreadPoolExecutor
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gallery_archive import ARCHIVE_FILE_NAME, GalleryArchive
+
+try:
+    import gallery_dl_api
+except ImportError:  # gallery-dl not installed as a package; run the gallery-dl command instead
+    gallery_dl_api = None
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def download_gallery_with_gallery_dl(url, save_directory="images"):
+# Longest stdout/stderr line read from gallery-dl before it is split
+STREAM_LIMIT = 1024 * 1024
+
+# Seconds a cancelled gallery-dl gets to exit before it is killed
+TERMINATE_TIMEOUT = 5
+
+# Galleries synced completely more recently than this are left alone
+DEFAULT_RESYNC_AFTER_HOURS = 24
+
+# gallery-dl stops a gallery after this many files in a row were already archived
+DEFAULT_ABORT_AFTER = 20
+
+# 'api' runs gallery-dl's jobs on threads in this process, 'subprocess' starts
+# a gallery-dl process per gallery, 'auto' uses the API when gallery-dl imports
+MODES = ('auto', 'api', 'subprocess')
+
+def use_api(mode):
+    """
+    Whether galleries run in-process for the given mode. Asking for 'api'
+    without the gallery-dl package falls back to the gallery-dl command.
+    """
+    if mode == 'subprocess':
+        return False
+    if gallery_dl_api is None:
+        if mode == 'api':
+            logging.warning("gallery-dl can't be imported; running the gallery-dl command for each gallery instead.")
+        return False
+    return True
+
+def read_urls(source):
+    """
+    Reads gallery URLs, one per line, from a file or from stdin ('-').
+    Blank lines and lines starting with '#' are ignored, and repeated URLs
+    are only kept once.
+
+    :param source: Path of a text file, or '-' for stdin.
+    :return: The URLs in their original order.
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    urls = [line.strip() for line in lines]
+    return list(dict.fromkeys(url for url in urls if url and not url.startswith('#')))
+
+def positive_int(value):
     """
-    Uses gallery-dl to download all images from a single gallery URL.
+    argparse type for counts that must be at least 1.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+async def stream_lines(stream, label, tail=None, counts=None):
+    # Logs each line as gallery-dl prints it; keeps the last few for error messages.
+    # On stdout gallery-dl prints each saved file, and skipped ones prefixed with '# '.
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        text = line.decode('utf-8', errors='replace').rstrip()
+        if not text:
+            continue
+        if counts is not None and text.startswith('# '):
+            counts['skipped'] += 1
+            logging.debug(f"{label} {text}")
+            continue
+        if counts is not None:
+            counts['new'] += 1
+        logging.info(f"{label} {text}")
+        if tail is not None:
+            tail.append(text)
+            del tail[:-20]
+
+async def download_gallery_with_gallery_dl(url, save_directory="images", label="", archive_path=None, abort_after=0):
+    """
+    Uses gallery-dl to download all images from a single gallery URL,
+    logging each file as it is saved. If the task is cancelled, gallery-dl
+    is terminated (and killed if it does not exit).
 
     :param url: A gallery URL.
     :param save_directory: The directory where images will be saved.
-    :return: True if download was successful, otherwise False.
+    :param label: Prefix for the progress lines, e.g. '[3/10]'.
+    :param archive_path: gallery-dl download archive to record files in and skip them by.
+    :param abort_after: Stop after this many files in a row were skipped (0: never).
+    :return: (success, new files, skipped files).
     """
-    command = ["gallery-dl", "-d", save_directory, url]
+    command = ["gallery-dl", "-d", save_directory]
+    if archive_path:
+        command += ["--download-archive", str(archive_path)]
+    if abort_after:
+        command += ["--abort", str(abort_after)]
+    command.append(url)
+    counts = {'new': 0, 'skipped': 0}
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        logging.info(f"Downloaded gallery from {url} to {save_directory}. Output: {result.stdout.strip()}")
-        return True
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to download gallery from {url}: {e}. Error Output: {e.stderr.strip()}")
-        return False
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+        )
     except FileNotFoundError:
         logging.error("Error: gallery-dl is not installed. Install it using 'pip install gallery-dl'.")
-        return False
+        return False, 0, 0
 
-def download_gallery_task(index, total, url, save_directory):
-    # Print progress message before starting the download
-    logging.info(f"downloading {index} of {total}")
-    return download_gallery_with_gallery_dl(url, save_directory)
+    errors = []
+    try:
+        await asyncio.gather(
+            stream_lines(process.stdout, label, counts=counts),
+            stream_lines(process.stderr, label, errors),
+        )
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), TERMINATE_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        logging.warning(f"{label} Cancelled {url}")
+        raise
+
+    if returncode != 0:
+        logging.error(f"{label} Failed to download gallery from {url}: gallery-dl exited with {returncode}. "
+                      f"Error Output: {' | '.join(errors[-3:])}")
+        return False, counts['new'], counts['skipped']
 
-def download_galleries_multithreaded(urls, save_directory="images", max_threads=4):
+    logging.info(f"{label} Downloaded gallery from {url} to {save_directory}: "
+                 f"{counts['new']} new, {counts['skipped']} already there.")
+    return True, counts['new'], counts['skipped']
+
+async def download_galleries_async(urls, save_directory="images", max_concurrent=4, archive=None,
+                                   resync_after_hours=DEFAULT_RESYNC_AFTER_HOURS, abort_after=DEFAULT_ABORT_AFTER,
+                                   mode='auto'):
     """
-    Downloads multiple galleries using multithreading.
+    Downloads multiple galleries, running at most max_concurrent at a time:
+    as gallery-dl jobs on a thread pool in this process, or as gallery-dl
+    processes (see use_api()).
+
+    With a GalleryArchive, all workers share its gallery-dl download archive,
+    galleries synced completely within resync_after_hours are skipped, and a
+    gallery whose last sync finished stops once abort_after files in a row
+    were already archived, i.e. once it reaches what the last run saw.
 
     :param urls: A list of gallery URLs.
     :param save_directory: The directory where images will be saved.
-    :param max_threads: The maximum number of threads to use.
+    :param max_concurrent: The maximum number of galleries downloading at once.
+    :param archive: Optional GalleryArchive for incremental syncs.
+    :param mode: One of MODES.
+    :return: One (success, new files, skipped files) per URL, or None for a
+             gallery skipped as recently synced.
     """
     os.makedirs(save_directory, exist_ok=True)
-    total = len(urls)
-    with ThreadPoolExecutor(max_workers=max_threads) as executor:
-        futures = [executor.submit(download_gallery_task, i, total, url, save_directory)
-                   for i, url in enumerate(urls, start=1)]
-        for future in futures:
+    # 0 would never start a download, and a negative count raises
+    max_concurrent = max(1, max_concurrent)
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    due = list(urls)
+    if archive is not None:
+        due, recent = archive.partition(urls, resync_after_hours * 3600)
+        if recent:
+            logging.info(f"Skipping {len(recent)} galleries synced in the last {resync_after_hours:g} hours.")
+    total = len(due)
+
+    loop = asyncio.get_running_loop()
+    executor = None
+    cancelled = threading.Event()
+    if due and use_api(mode):
+        gallery_dl_api.configure(save_directory, archive.path if archive is not None else None)
+        executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='gallery-dl')
+
+    async def download_gallery(url, label, abort):
+        if executor is None:
+            return await download_gallery_with_gallery_dl(
+                url, save_directory, label, archive.path if archive is not None else None, abort
+            )
+        return await loop.run_in_executor(executor, gallery_dl_api.run_gallery, url, label, abort, cancelled)
+
+    async def download_gallery_task(index, url):
+        async with semaphore:
+            # Print progress message before starting the download
+            logging.info(f"downloading {index} of {total}")
+            started_at = time.time()
+            if archive is None:
+                return await download_gallery(url, f"[{index}/{total}]", 0)
+
             try:
-                future.result()
-            except Exception as e:
-                logging.error(f"Error occurred during download: {e}")
+                result = await download_gallery(
+                    url,
+                    f"[{index}/{total}]",
+                    abort_after if archive.completed_before(url) else 0
+                )
+            except asyncio.CancelledError:
+                # Unfinished: the next sync must not stop at the files this one saved
+                archive.record(url, False, 0, 0, started_at)
+                raise
+            archive.record(url, *result, started_at)
+            return result
 
-if __name__ == "__main__":
-    urls_input = input("Enter the gallery URLs (comma-separated): ")
-    urls = [url.strip() for url in urls_input.split(',') if url.strip()]
-    output_directory = input("Enter the directory to save images (default: 'images'): ") or "images"
-    
+    tasks = [asyncio.create_task(download_gallery_task(i, url)) for i, url in enumerate(due, start=1)]
+    try:
+        results = dict(zip(due, await asyncio.gather(*tasks)))
+        return [results.get(url) for url in urls]
+    except asyncio.CancelledError:
+        cancelled.set()
+        for task in tasks:
+            task.cancel()
+        # Wait for every gallery-dl to be stopped before giving up
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        if executor is not None:
+            # In-process jobs can't be killed; they stop at their next file once cancelled is set
+            executor.shutdown(wait=True)
+
+def download_galleries(urls, save_directory="images", max_concurrent=4, use_archive=True,
+                       resync_after_hours=DEFAULT_RESYNC_AFTER_HOURS, abort_after=DEFAULT_ABORT_AFTER, mode='auto'):
+    """
+    Runs download_galleries_async() to completion, with the shared archive
+    in save_directory unless use_archive is False. Ctrl-C cancels the
+    remaining downloads and stops the running gallery-dl processes or jobs.
+
+    :return: The results from download_galleries_async(), or None if interrupted.
+    """
+    archive = GalleryArchive(os.path.join(save_directory, ARCHIVE_FILE_NAME)) if use_archive else None
+
+    async def run():
+        main_task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, main_task.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: KeyboardInterrupt still reaches asyncio.run, which cancels the tasks
+        return await download_galleries_async(
+            urls, save_directory, max_concurrent, archive, resync_after_hours, abort_after, mode
+        )
+
+    start = time.perf_counter()
     try:
-        max_threads_input = input("Enter the number of threads to use (default: 4): ") or "4"
-        max_threads = int(max_threads_input)
-    except ValueError:
-        logging.warning("Invalid input for number of threads. Defaulting to 4.")
-        max_threads = 4
+        results = asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logging.warning("Interrupted; running downloads were stopped.")
+        return None
+    finally:
+        if archive is not None:
+            archive.close()
+
+    synced = [result for result in results if result is not None]
+    failed = sum(1 for success, _, _ in synced if not success)
+    logging.info(
+        f"{len(synced) - failed} galleries synced, {failed} failed, "
+        f"{len(results) - len(synced)} skipped as recently synced; "
+        f"{sum(new for _, new, _ in synced)} new files, "
+        f"{sum(skipped for _, _, skipped in synced)} already there "
+        f"({time.perf_counter() - start:.1f}s)."
+    )
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download galleries with gallery-dl.")
+    parser.add_argument('urls', nargs='*', help="Gallery URLs.")
+    parser.add_argument('-i', '--input-file', help="File with one URL per line, or '-' for stdin.")
+    parser.add_argument('-d', '--directory', help="Directory to save images (default: 'images').")
+    parser.add_argument('-j', '--jobs', type=positive_int, help="Galleries to download at once (default: 4).")
+    parser.add_argument('--resync-after', type=float, default=DEFAULT_RESYNC_AFTER_HOURS,
+                        help="Skip galleries synced within this many hours (0: sync all).")
+    parser.add_argument('--abort-after', type=int, default=DEFAULT_ABORT_AFTER,
+                        help="Stop a gallery after this many already-archived files in a row (0: never).")
+    parser.add_argument('--full', action='store_true', help="Sync every gallery to the end, ignoring the last sync.")
+    parser.add_argument('--no-archive', action='store_true', help="Don't use or update the download archive.")
+    parser.add_argument('--mode', choices=MODES, default='auto',
+                        help="Run gallery-dl in this process ('api') or as a command per gallery (default: auto).")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.input_file:
+        urls.extend(read_urls(args.input_file))
+
+    if urls:
+        output_directory = args.directory or "images"
+        max_concurrent = args.jobs or 4
+    else:
+        urls_input = input("Enter the gallery URLs (comma-separated): ")
+        urls = [url.strip() for url in urls_input.split(',') if url.strip()]
+        output_directory = args.directory or input("Enter the directory to save images (default: 'images'): ") or "images"
+
+        try:
+            max_concurrent = args.jobs or int(input("Enter the number of galleries to download at once (default: 4): ") or "4")
+        except ValueError:
+            logging.warning("Invalid input for number of galleries. Defaulting to 4.")
+            max_concurrent = 4
 
-    download_galleries_multithreaded(urls, output_directory, max_threads)
\ No newline at end of file
+    results = download_galleries(
+        urls,
+        output_directory,
+        max_concurrent,
+        use_archive=not args.no_archive,
+        resync_after_hours=0 if args.full else args.resync_after,
+        abort_after=0 if args.full else args.abort_after,
+        mode=args.mode
+    )
+    if results is None:
+        sys.exit(130)
\ No newline at end of file
@@ -1,35 +1,78 @@
 import os
+import re
 import sys
 from yt_dlp import YoutubeDL
 import concurrent.futures
 
+# This script runs on its own. If the repo's video_ids.py, library_index.py
+# and title_cleaner.py are copied next to it (or it runs from the repo), the
+# history is kept in a compact set and the folder listing is cached.
+sys.path[:0] = [os.path.dirname(os.path.abspath(__file__)),
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+try:
+    from video_ids import VideoIdSet
+except ImportError:
+    VideoIdSet = set
+try:
+    from library_index import LibraryIndex
+except ImportError:
+    LibraryIndex = None
+
+# A bare video ID, or the ID in a watch?v=, youtu.be/, /shorts/, /embed/ or /live/ URL
+VIDEO_ID_RE = re.compile(
+    r'^([0-9A-Za-z_-]{11})$'
+    r'|(?:youtu\.be/|/(?:shorts|embed|live|v|e)/|[?&]v=)([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])'
+)
+
 # Define constants for file paths and skip keywords
 destination_folder = os.path.join('./Audio', 'mp3')
 downloaded_videos_file = os.path.join('./Audio', 'downloaded_videos.txt')
 log_file = os.path.join('./Audio', 'download_log.txt')
+library_index_file = os.path.join('./Audio', 'library.sqlite3')
 skip_keywords = set(["interview", "trailer", "promo", "teaser"])  # Keywords to skip downloads for
 
-# Function to load downloaded video URLs from a text file into a set
+# Function to get the video ID from a URL or bare ID, or None if it has none
+def parse_video_id(value):
+    match = VIDEO_ID_RE.search(value.strip())
+    return (match.group(1) or match.group(2)) if match else None
+
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+# Function to load downloaded video IDs from a text file of URLs into a compact set
 def load_downloaded_videos():
-    downloaded_videos = set()
+    video_ids = []
     if os.path.exists(downloaded_videos_file):
-        with open(downloaded_videos_file, 'r') as f:
-            downloaded_videos.update(line.strip() for line in f)
-    return downloaded_videos
-
-# Function to save downloaded video URLs to a text file
+        with open(downloaded_videos_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                video_id = parse_video_id(line)
+                if video_id:
+                    video_ids.append(video_id)
+    return VideoIdSet(video_ids)
+
+# Function to save downloaded video IDs to a text file as canonical URLs
 def save_downloaded_videos(new_downloaded_videos):
-    with open(downloaded_videos_file, 'a') as f:
-        for url in new_downloaded_videos:
-            f.write(f"{url}\n")
+    with open(downloaded_videos_file, 'a', encoding='utf-8') as f:
+        for video_id in new_downloaded_videos:
+            f.write(f"{video_url(video_id)}\n")
 
 # Function to load existing MP3 filenames from the destination folder
 def load_existing_filenames():
     existing_files = set()
-    if os.path.exists(destination_folder):
+    if os.path.exists(destination_folder) and LibraryIndex is None:
         for filename in os.listdir(destination_folder):
             if filename.lower().endswith('.mp3'):
                 existing_files.add(filename)
+    elif os.path.exists(destination_folder):
+        # Only re-reads the folder if its contents changed since the last run
+        index = LibraryIndex(library_index_file)
+        try:
+            index.refresh(destination_folder)
+            for filename in index.names(destination_folder):
+                if filename.lower().endswith('.mp3'):
+                    existing_files.add(filename)
+        finally:
+            index.close()
     return existing_files
 
 # Function to extract the video info from a YouTube URL using yt-dlp
@@ -51,19 +94,22 @@ def extract_video_urls(url):
     with YoutubeDL(ydl_opts) as ydl:
         info_dict = ydl.extract_info(url, download=False)
         if 'entries' in info_dict:
-            return [entry['url'] for entry in info_dict['entries']]
+            # Flat entries carry the ID; entry['url'] comes in several forms
+            return [video_url(entry['id']) for entry in info_dict['entries'] if entry and entry.get('id')]
         else:
             return []
 
 # Function to check if a video has already been downloaded or should be skipped
 def is_video_skipped_or_downloaded(url, info_dict, downloaded_videos, new_downloaded_videos):
-    if url in downloaded_videos or url in new_downloaded_videos:
+    video_id = parse_video_id(url)
+    if video_id in downloaded_videos or video_id in new_downloaded_videos:
         print(f"Already processed: {url}")
         return True
     else:
         title = info_dict.get('title', '')
         if any(keyword in title.lower() for keyword in skip_keywords):
-            new_downloaded_videos.add(url)  # Add skipped URL for tracking
+            if video_id:
+                new_downloaded_videos.add(video_id)  # Add skipped ID for tracking
             print(f"Skipping video due to keyword: {url}")
             return True
     return False
@@ -85,6 +131,8 @@ def download_and_convert(url, info_dict, downloaded_videos, new_downloaded_video
                 'quiet': True
             }
 
+            video_id = parse_video_id(url)
+
             with YoutubeDL(ydl_opts) as ydl:
                 # Get the expected filename
                 expected_filename = ydl.prepare_filename(info_dict)
@@ -95,12 +143,14 @@ def download_and_convert(url, info_dict, downloaded_videos, new_downloaded_video
                 # Check if the file already exists
                 if expected_basename in existing_files:
                     print(f"File already exists, skipping download: {expected_basename}")
-                    new_downloaded_videos.add(url)
+                    if video_id:
+                        new_downloaded_videos.add(video_id)
                     return
 
                 # Download the video
                 ydl.download([url])
-                new_downloaded_videos.add(url)  # Save downloaded URL to the set
+                if video_id:
+                    new_downloaded_videos.add(video_id)  # Save downloaded ID to the set
                 existing_files.add(expected_basename)  # Update existing files set
                 print(f"Downloaded and converted: {url}")
         except Exception as e:
@@ -119,8 +169,8 @@ def main(urls):
         extracted_urls = extract_video_urls(channel_url)
         video_urls.extend(extracted_urls)
 
-    # Remove duplicates
-    video_urls = list(set(video_urls))
+    # Remove duplicates and anything already downloaded before fetching info
+    video_urls = [url for url in dict.fromkeys(video_urls) if parse_video_id(url) not in downloaded_videos]
 
     # Extract video info for all URLs
     with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
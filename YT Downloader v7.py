@@ -1,18 +1,37 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import logging
 import json
-import re
+import os
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadError
+
+from download_ledger import DownloadLedger
+from download_scheduler import DownloadScheduler, StagedPipeline
+from library_index import LibraryIndex
+from listing_cache import ChannelListingCache
+from retry_policy import TRANSIENT, RetryPolicy, classify_failure
+from run_metrics import RunMetrics
+from title_cleaner import DEFAULT_REMOVE_PHRASES, clean_name
+from video_ids import parse_video_id, video_url
 
 
 # Always load config.ini from the same folder as this script
 SCRIPT_DIR = Path(__file__).resolve().parent
 config_file = SCRIPT_DIR / 'config.ini'
 
+# Final audio files, for every audio_format mode
+AUDIO_EXTENSIONS = {'.mp3', '.opus', '.m4a', '.ogg'}
+
+THUMBNAIL_EXTENSIONS = {'.webp', '.jpg', '.jpeg', '.png'}
+
 
 def load_config():
     config = {}
@@ -32,31 +51,20 @@ def load_config():
     return config
 
 
-def load_downloaded_videos(downloaded_videos_file):
-    downloaded = set()
-
-    downloaded_videos_file = Path(downloaded_videos_file)
-
-    if downloaded_videos_file.exists():
-        with open(downloaded_videos_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    downloaded.add(line)
-
-    return downloaded
-
-
-def save_downloaded_videos(downloaded_videos_file, urls):
-    if not urls:
-        return
+def config_int(config, key, default):
+    try:
+        return int(config.get(key, default))
+    except ValueError:
+        logging.warning(f"Invalid integer for {key}; using {default}.")
+        return default
 
-    downloaded_videos_file = Path(downloaded_videos_file)
-    downloaded_videos_file.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(downloaded_videos_file, 'a', encoding='utf-8') as f:
-        for url in urls:
-            f.write(url + '\n')
+def config_float(config, key, default):
+    try:
+        return float(config.get(key, default))
+    except ValueError:
+        logging.warning(f"Invalid number for {key}; using {default}.")
+        return default
 
 
 def parse_cookies_from_browser(value):
@@ -113,10 +121,26 @@ def build_common_ydl_opts(
     return opts
 
 
-def get_playlist_or_channel_urls(url, common_ydl_opts):
+def flat_entry(entry):
     """
-    Expands a channel/playlist URL into individual YouTube video URLs
-    using yt-dlp's Python API instead of subprocess.
+    Keeps the fields of a flat-listing entry that later stages use.
+    """
+
+    video_id = entry.get('id')
+
+    return {
+        'id': video_id,
+        'url': video_url(video_id),
+        'title': entry.get('title'),
+        'duration': entry.get('duration'),
+        'upload_date': entry.get('upload_date'),
+    }
+
+
+def get_playlist_or_channel_entries(url, common_ydl_opts):
+    """
+    Expands a channel/playlist URL into flat entries (id, url, title,
+    duration, upload_date) using yt-dlp's Python API instead of subprocess.
     """
 
     extract_opts = {
@@ -138,136 +162,913 @@ def get_playlist_or_channel_urls(url, common_ydl_opts):
         entries = info.get('entries')
 
         if not entries:
-            video_id = info.get('id')
-
-            if video_id:
-                return [f"https://www.youtube.com/watch?v={video_id}"]
+            if info.get('id'):
+                return [flat_entry(info)]
 
             return []
 
-        video_urls = []
+        return [
+            flat_entry(entry)
+            for entry in entries
+            if entry and entry.get('id')
+        ]
 
-        for entry in entries:
-            if not entry:
-                continue
+    except Exception as e:
+        logging.error(f"Unexpected error fetching URLs from {url}: {e}")
+        return []
+
+
+def get_playlist_or_channel_urls(url, common_ydl_opts):
+    """
+    Expands a channel/playlist URL into individual YouTube video URLs.
+    """
+
+    return [
+        entry['url']
+        for entry in get_playlist_or_channel_entries(url, common_ydl_opts)
+    ]
+
+
+def get_new_channel_entries(url, common_ydl_opts, known_ids, stop_after=30):
+    """
+    Incremental version of get_playlist_or_channel_entries().
 
-            video_id = entry.get('id')
+    Channel /videos tabs are listed newest-first, so the listing is paged
+    lazily (process=False keeps yt-dlp's entries generator unevaluated) and
+    paging stops once `stop_after` consecutive IDs are already in
+    `known_ids`. A daily run therefore fetches one or two pages per channel
+    instead of the whole listing.
+    """
 
-            if video_id:
-                video_urls.append(f"https://www.youtube.com/watch?v={video_id}")
+    extract_opts = {
+        **common_ydl_opts,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+        'skip_download': True,
+        'quiet': True,
+        'no_warnings': False,
+        'ignoreerrors': True,
+    }
 
-        return video_urls
+    try:
+        with YoutubeDL(extract_opts) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+
+            if not info:
+                return []
+
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                # Redirects (e.g. a channel URL without a tab) and single
+                # videos can't be paged lazily, so they go through a full,
+                # unbounded listing instead.
+                logging.info(
+                    f"{url} resolved to {info.get('_type') or 'a video'}, not a playlist; "
+                    f"listing it in full instead of incrementally."
+                )
+                return get_playlist_or_channel_entries(url, common_ydl_opts)
+
+            entries = []
+            known_streak = 0
+
+            for entry in info.get('entries') or []:
+                if not entry or not entry.get('id'):
+                    continue
+
+                entries.append(flat_entry(entry))
+
+                if entry['id'] in known_ids:
+                    known_streak += 1
+
+                    if known_streak >= stop_after:
+                        logging.info(
+                            f"Stopped paging {url} after {stop_after} "
+                            f"already-known videos in a row."
+                        )
+                        break
+                else:
+                    known_streak = 0
+
+        return entries
 
     except Exception as e:
         logging.error(f"Unexpected error fetching URLs from {url}: {e}")
         return []
 
 
-def clean_title(title, remove_phrases):
+def _expand_one(url, common_ydl_opts, downloaded_ids=None, stop_after=30,
+                listing_cache=None, cache_ttl=0, metrics=None):
+    if listing_cache is not None and downloaded_ids is not None \
+            and listing_cache.is_fresh(url, cache_ttl):
+        cached = listing_cache.get(url)
+        logging.info(f"Using cached listing for {url}: {len(cached)} entries.")
+        return [{**entry, 'url': video_url(entry['id'])} for entry in cached]
+
+    logging.info(f"Expanding URL: {url}")
+
+    start = time.perf_counter()
+
+    if downloaded_ids is None:
+        expanded = get_playlist_or_channel_entries(url, common_ydl_opts=common_ydl_opts)
+    else:
+        known_ids = downloaded_ids
+
+        if listing_cache is not None:
+            # The cached listing works like an ETag: paging stops as soon as
+            # the head of the live listing lines up with what we already have.
+            known_ids = downloaded_ids.union(listing_cache.known_ids(url))
+
+        expanded = get_new_channel_entries(
+            url,
+            common_ydl_opts=common_ydl_opts,
+            known_ids=known_ids,
+            stop_after=stop_after
+        )
+
+    elapsed = time.perf_counter() - start
+
+    if metrics is not None:
+        metrics.record_channel(url, elapsed, len(expanded))
+
+    if expanded:
+        logging.info(f"Expanded {url} into {len(expanded)} video URLs in {elapsed:.1f}s.")
+    else:
+        logging.warning(
+            f"Could not expand URL after {elapsed:.1f}s; "
+            f"treating as direct video URL: {url}"
+        )
+
+    if expanded and listing_cache is not None:
+        listing_cache.merge(url, expanded, replace=downloaded_ids is None)
+        expanded = [
+            {**entry, 'url': video_url(entry['id'])}
+            for entry in listing_cache.get(url)
+        ]
+
+    return expanded
+
+
+def expand_urls(urls, common_ydl_opts, max_workers=4, downloaded_ids=None, stop_after=30,
+                listing_cache=None, cache_ttl=0, metrics=None):
+    """
+    Expands every channel/playlist URL concurrently, one YoutubeDL per
+    worker thread, into flat entries. Results are merged in the order of
+    `urls`, not in completion order, so the output is the same as a
+    sequential run.
+
+    Passing `downloaded_ids` switches to incremental expansion (see
+    get_new_channel_entries); leaving it as None enumerates everything.
+    With a `listing_cache`, channels fetched less than `cache_ttl` seconds
+    ago are served from disk without touching the network. With `metrics`,
+    every channel listed from the network is timed.
+    """
+
+    urls = list(urls)
+    workers = max(1, min(max_workers, len(urls) or 1))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda u: _expand_one(
+                u,
+                common_ydl_opts,
+                downloaded_ids,
+                stop_after,
+                listing_cache,
+                cache_ttl,
+                metrics
+            ),
+            urls
+        ))
+
+    all_entries = []
+
+    for u, expanded in zip(urls, results):
+        if expanded:
+            all_entries.extend(expanded)
+        else:
+            video_id = parse_video_id(u)
+            all_entries.append({
+                'id': video_id,
+                'url': video_url(video_id) if video_id else u,
+                'title': None,
+            })
+
+    # Remove duplicates while preserving order; youtu.be, shorts and
+    # watch?v= forms of one video share an ID and collapse here.
+    return list({
+        entry['id'] or entry['url']: entry
+        for entry in all_entries
+    }.values())
+
+
+def clean_title(title, remove_phrases, extension='.mp3'):
     """
     Cleans the video title for filename use while preserving Arabic/Urdu.
+    See title_cleaner.py, which mp3 rename.py shares.
     """
 
-    for phrase in remove_phrases:
-        title = re.sub(re.escape(phrase), ' ', title, flags=re.IGNORECASE)
+    return clean_name(title, remove_phrases) + extension
 
-    # Remove characters that are problematic in filenames
-    title = re.sub(r'[\\/:*?"<>|]', ' ', title)
 
-    # Normalize whitespace
-    title = re.sub(r'\s+', ' ', title).strip()
+def build_audio_options(audio_format='mp3', quality='192'):
+    """
+    Returns (format selector, postprocessors) for an output mode:
 
-    if not title:
-        title = 'untitled'
+      mp3     transcode everything to MP3 at `quality` kbit/s (the old behaviour)
+      native  keep the best audio stream as-is; ffmpeg only remuxes it
+              (webm/opus -> .opus, m4a stays .m4a)
+      m4a     prefer AAC streams and keep them without re-encoding
+      opus    prefer Opus streams and keep them without re-encoding
 
-    return title + '.mp3'
+    Tagging and thumbnail embedding run in every mode. Native files can be
+    converted to MP3 later, in bulk, with audio_transcode.py.
+    """
 
+    if audio_format == 'mp3':
+        format_selector = 'bestaudio/best'
+        extract = {
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': quality,
+        }
+    elif audio_format in ('native', 'm4a', 'opus'):
+        format_selector = {
+            'native': 'bestaudio/best',
+            'm4a': 'bestaudio[ext=m4a]/bestaudio/best',
+            'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+        }[audio_format]
+        extract = {
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'best' if audio_format == 'native' else audio_format,
+        }
+    else:
+        raise ValueError(f"Unknown audio_format: {audio_format}")
+
+    postprocessors = [
+        extract,
+        {
+            'key': 'FFmpegMetadata',
+            'add_metadata': True,
+        },
+        {
+            'key': 'EmbedThumbnail',
+            'already_have_thumbnail': False,
+        },
+    ]
 
-def download_video(url, ydl_opts):
-    try:
-        with YoutubeDL(ydl_opts) as ydl:
-            result = ydl.download([url])
+    return format_selector, postprocessors
+
+
+class MetadataFilter:
+    """
+    Drops videos by title keyword and duration before any bytes are fetched.
+
+    reason() works on flat-listing entries. match_filter() is the same
+    check in yt-dlp's `match_filter` form, for videos whose flat entry had
+    no title or duration; it runs after extraction but before download and
+    remembers what it rejected so the caller can tell a skip from a
+    successful download.
+    """
+
+    def __init__(self, skip_keywords, min_duration=None, max_duration=None):
+        self.skip_keywords = skip_keywords
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self._rejected = {}
+        self._lock = threading.Lock()
+
+    def reason(self, entry):
+        title = (entry.get('title') or '').lower()
+
+        for kw in self.skip_keywords:
+            if kw in title:
+                return f"skip keyword: {kw}"
+
+        duration = entry.get('duration')
+
+        if duration is not None:
+            if self.min_duration and duration < self.min_duration:
+                return f"too short: {duration:.0f}s"
+
+            if self.max_duration and duration > self.max_duration:
+                return f"too long: {duration:.0f}s"
+
+        return None
+
+    def match_filter(self, info, incomplete=False):
+        reason = self.reason(info)
+
+        if reason and info.get('id'):
+            with self._lock:
+                self._rejected[info['id']] = reason
+
+        return reason
+
+    def pop_rejected(self, video_id):
+        with self._lock:
+            return self._rejected.pop(video_id, None)
+
+    def split(self, entries):
+        """
+        Returns (kept_entries, skipped) where skipped is a list of
+        (entry, reason).
+        """
+
+        kept = []
+        skipped = []
+
+        for entry in entries:
+            reason = self.reason(entry)
+
+            if reason:
+                skipped.append((entry, reason))
+            else:
+                kept.append(entry)
+
+        return kept, skipped
+
+
+class YdlSession:
+    """
+    A long-lived YoutubeDL for one download worker.
+
+    Building a YoutubeDL re-initialises every extractor, decrypts the
+    browser cookie store for `cookiesfrombrowser` and probes the JS
+    runtime, which is most of the per-video overhead before the first
+    byte. A session builds it once, warms the cookie jar up front and
+    reuses it across downloads. The instance is thrown away and rebuilt
+    after an unexpected exception or `max_consecutive_failures` failed
+    downloads in a row, in case it got into a bad state.
+    """
+
+    def __init__(self, ydl_opts, max_consecutive_failures=3):
+        self.ydl_opts = ydl_opts
+        self.max_consecutive_failures = max_consecutive_failures
+        self.filepaths = []
+        self._ydl = None
+        self._consecutive_failures = 0
+
+    def _open(self):
+        ydl = YoutubeDL(self.ydl_opts)
+        ydl.add_post_hook(self.filepaths.append)
+        # Loads (and for browsers, decrypts) cookies now rather than on the
+        # first request.
+        ydl.cookiejar
+        return ydl
+
+    def close(self):
+        if self._ydl is not None:
+            try:
+                self._ydl.close()
+            except Exception as e:
+                logging.warning(f"Error closing YoutubeDL session: {e}")
+
+            self._ydl = None
+
+    def _call(self, fn):
+        if self._ydl is None:
+            self._ydl = self._open()
+
+        self.filepaths.clear()
+        # YoutubeDL.download() returns a sticky retcode that is never reset
+        # between calls, so clear it to get this URL's result only.
+        self._ydl._download_retcode = 0
+
+        try:
+            return fn(self._ydl)
+        except DownloadError:
+            self._failed()
+            raise
+        except Exception:
+            self.close()
+            self._consecutive_failures = 0
+            raise
+
+    def download(self, url):
+        """
+        Returns yt-dlp's result code for this URL alone; exceptions
+        propagate after the session has been reset if needed.
+        """
+
+        result = self._call(lambda ydl: ydl.download([url]))
 
         if result == 0:
+            self._consecutive_failures = 0
+        else:
+            self._failed()
+
+        return result
+
+    def extract(self, url):
+        """
+        Like download(), but returns the info dict of what was downloaded.
+        """
+
+        info = self._call(lambda ydl: ydl.extract_info(url, download=True))
+        self._consecutive_failures = 0
+        return info
+
+    def post_process(self, filepath, info):
+        """
+        Runs this session's postprocessors on an already downloaded file
+        and returns the final file path.
+        """
+
+        info = self._call(lambda ydl: ydl.post_process(filepath, info))
+        self._consecutive_failures = 0
+        return info.get('filepath', filepath)
+
+    def _failed(self):
+        self._consecutive_failures += 1
+
+        if self._consecutive_failures >= self.max_consecutive_failures:
+            logging.warning(
+                f"{self._consecutive_failures} failed downloads in a row; "
+                f"rebuilding YoutubeDL session."
+            )
+            self.close()
+            self._consecutive_failures = 0
+
+
+class YdlSessionPool:
+    """
+    Hands each download thread its own YdlSession.
+    """
+
+    def __init__(self, ydl_opts):
+        self.ydl_opts = ydl_opts
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        session = getattr(self._local, 'session', None)
+
+        if session is None:
+            session = YdlSession(self.ydl_opts)
+            self._local.session = session
+
+            with self._lock:
+                self._sessions.append(session)
+
+        return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+
+            self._sessions.clear()
+
+
+def record_outcome(ledger, url, video_id, success, duration, file_path=None,
+                   error=None, skip_reason=None, metrics=None, retry_policy=None):
+    """
+    Commits one download outcome to the ledger (and dequeues it), and ends
+    the video's metrics. Failures are classified as permanent, transient or
+    rate-limited; permanent ones are never queued again. With a retry
+    policy, the others get a backoff before the next attempt and
+    rate-limited ones slow the whole run down.
+    """
+
+    failure_kind = None
+    retry_at = None
+
+    if not success and not skip_reason:
+        failure_kind = classify_failure(error)
+
+        if retry_policy is not None and ledger is not None and video_id:
+            # Rate limiting only pushes retry_at back; it never counts toward giving up
+            if failure_kind == TRANSIENT:
+                failures = ledger.transient_failures(video_id)
+            else:
+                failures = ledger.failed_attempts(video_id)
+
+            failure_kind, retry_at = retry_policy.schedule(failure_kind, failures + 1)
+            logging.info(f"Failure for {url} is {retry_policy.describe(failure_kind, retry_at)}.")
+
+    if retry_policy is not None:
+        retry_policy.observe(success, failure_kind)
+
+    if metrics is not None:
+        metrics.end_video(
+            'skipped' if skip_reason else 'downloaded' if success else 'failed',
+            reason=skip_reason or error,
+            file_path=file_path,
+            failure_kind=failure_kind
+        )
+
+    if ledger is None:
+        return
+
+    if not video_id:
+        ledger.dequeue(url)
+    elif skip_reason:
+        ledger.record_skipped([(video_id, url, skip_reason)])
+    elif success:
+        ledger.record_success(video_id, url, duration=duration, file_path=file_path)
+    else:
+        ledger.record_failure(
+            video_id,
+            url,
+            duration=duration,
+            error=error,
+            failure_kind=failure_kind,
+            retry_at=retry_at
+        )
+
+
+def finish_file(finisher, url, file_path, metrics=None):
+    """
+    Runs the FileFinisher on a completed download. Returns (final_path,
+    skip_reason); a file deleted for a skip keyword counts as skipped.
+    """
+
+    if finisher is None or not file_path:
+        return file_path, None
+
+    start = time.perf_counter()
+
+    try:
+        final_path = finisher.finish(file_path, video_id=parse_video_id(url))
+    except OSError as e:
+        logging.error(f"Error finishing {file_path} for {url}: {e}")
+        return file_path, None
+    finally:
+        if metrics is not None:
+            metrics.add_time('finish', time.perf_counter() - start)
+
+    if final_path is None:
+        return None, "skip keyword in downloaded filename"
+
+    return str(final_path), None
+
+
+def download_video(url, session, ledger=None, metadata_filter=None, finisher=None, metrics=None,
+                   retry_policy=None):
+    """
+    Downloads one URL through a YdlSession. With a ledger, the outcome is
+    committed (and dequeued) as soon as the download finishes, together
+    with how long it took and the final file path. Videos rejected by the
+    metadata filter's match_filter are recorded as skipped, not downloaded.
+
+    With a finisher, the file yt-dlp's post hook reported is cleaned up and
+    renamed right away, so no directory sweep is needed afterwards. With
+    metrics, the video's stages are timed (see RunMetrics). See
+    record_outcome() for what happens to failures.
+    """
+
+    video_id = parse_video_id(url)
+    start = time.perf_counter()
+
+    if metrics is not None:
+        metrics.begin_video(url, video_id)
+
+    skip_reason = None
+
+    try:
+        result = session.download(url)
+
+        if metadata_filter is not None and video_id:
+            skip_reason = metadata_filter.pop_rejected(video_id)
+
+        if skip_reason:
+            logging.info(f"Skipped before download ({skip_reason}): {url}")
+            success = False
+            error = None
+        elif result == 0:
             logging.info(f"Downloaded successfully: {url}")
-            return True
+            success = True
+            error = None
+        else:
+            logging.error(f"yt-dlp returned non-zero result for {url}: {result}")
+            success = False
+            error = f"yt-dlp returned {result}"
 
-        logging.error(f"yt-dlp returned non-zero result for {url}: {result}")
-        return False
+    except Exception as e:
+        logging.error(f"Error downloading {url}: {e}")
+        success = False
+        error = str(e)
+
+    file_path = session.filepaths[-1] if session.filepaths else None
+
+    if success:
+        file_path, skip_reason = finish_file(finisher, url, file_path, metrics)
+        success = not skip_reason
+
+    record_outcome(
+        ledger,
+        url,
+        video_id,
+        success,
+        time.perf_counter() - start,
+        file_path=file_path,
+        error=error,
+        skip_reason=skip_reason,
+        metrics=metrics,
+        retry_policy=retry_policy
+    )
+
+    return success
+
+
+def fetch_video(url, session, ledger=None, metadata_filter=None, metrics=None, retry_policy=None):
+    """
+    First stage of the staged pipeline: downloads the raw audio (and
+    thumbnail) with no postprocessors. Returns a work item for
+    postprocess_video(), or None if there is nothing to postprocess;
+    failures and skips are recorded here.
+    """
+
+    video_id = parse_video_id(url)
+    start = time.perf_counter()
+
+    if metrics is not None:
+        metrics.begin_video(url, video_id)
 
+    try:
+        info = session.extract(url)
     except Exception as e:
         logging.error(f"Error downloading {url}: {e}")
+        record_outcome(
+            ledger,
+            url,
+            video_id,
+            False,
+            time.perf_counter() - start,
+            error=str(e),
+            metrics=metrics,
+            retry_policy=retry_policy
+        )
+        return None
+
+    skip_reason = metadata_filter.pop_rejected(video_id) if metadata_filter and video_id else None
+    downloads = (info or {}).get('requested_downloads') or []
+
+    if skip_reason or not downloads:
+        if skip_reason:
+            logging.info(f"Skipped before download ({skip_reason}): {url}")
+        else:
+            logging.error(f"Nothing was downloaded for {url}")
+
+        record_outcome(
+            ledger,
+            url,
+            video_id,
+            False,
+            time.perf_counter() - start,
+            error=None if skip_reason else "nothing downloaded",
+            skip_reason=skip_reason,
+            metrics=metrics,
+            retry_policy=retry_policy
+        )
+        return None
+
+    download_info = downloads[-1]
+    logging.info(f"Fetched raw audio: {url}")
+
+    return {
+        'url': url,
+        'video_id': video_id,
+        'filepath': download_info.get('filepath') or download_info.get('_filename'),
+        'info': download_info,
+        'started': start,
+        # Waits in the queue until postprocess_video() resumes it
+        'metrics': metrics.pause_video() if metrics is not None else None,
+    }
+
+
+def postprocess_video(item, sessions, ledger=None, finisher=None, metrics=None, retry_policy=None):
+    """
+    Second stage of the staged pipeline: runs the conversion, tagging and
+    thumbnail postprocessors on a fetched file.
+    """
+
+    url = item['url']
+
+    if metrics is not None:
+        metrics.resume_video(item['metrics'])
+
+    try:
+        filepath = sessions.get().post_process(item['filepath'], item['info'])
+    except Exception as e:
+        logging.error(f"Error postprocessing {url}: {e}")
+        record_outcome(
+            ledger,
+            url,
+            item['video_id'],
+            False,
+            time.perf_counter() - item['started'],
+            error=f"postprocessing: {e}",
+            metrics=metrics,
+            retry_policy=retry_policy
+        )
         return False
 
+    logging.info(f"Downloaded successfully: {url}")
+    filepath, skip_reason = finish_file(finisher, url, filepath, metrics)
+
+    record_outcome(
+        ledger,
+        url,
+        item['video_id'],
+        not skip_reason,
+        time.perf_counter() - item['started'],
+        file_path=filepath,
+        skip_reason=skip_reason,
+        metrics=metrics,
+        retry_policy=retry_policy
+    )
+    return not skip_reason
+
 
-def process_downloaded_files(destination_folder, skip_keywords, remove_phrases):
+class FileFinisher:
     """
-    Deletes unwanted MP3s and renames remaining MP3s.
+    Post-download cleanup for one file at a time: deletes it if its name
+    contains a skip keyword, renames it to its cleaned title, and removes
+    a thumbnail yt-dlp left next to it.
+
+    Collisions are resolved against an in-memory set of the folder's
+    names first; only a name the set says is free is checked on disk,
+    since rename() would overwrite a file that appeared after the set was
+    built. With a LibraryIndex the set comes from the index (refreshed
+    first) and every rename or delete is written back to it; otherwise
+    from one directory listing. Safe to call from several download
+    threads.
     """
 
-    destination_folder = Path(destination_folder)
+    def __init__(self, destination_folder, skip_keywords, remove_phrases, library=None):
+        self.destination_folder = Path(destination_folder)
+        self.skip_keywords = skip_keywords
+        self.remove_phrases = remove_phrases
+        self.library = library
+        self._lock = threading.Lock()
 
-    if not destination_folder.exists():
-        logging.warning(f"Destination folder does not exist: {destination_folder}")
-        return
+        if library is not None:
+            library.refresh(self.destination_folder)
+            self._names = library.names(self.destination_folder)
+        else:
+            with os.scandir(self.destination_folder) as entries:
+                self._names = {entry.name for entry in entries}
+
+    def _taken(self, path):
+        if path.name in self._names:
+            return True
+
+        if path.exists():
+            # Appeared since the set was built (another program, a sync)
+            self._names.add(path.name)
+            return True
+
+        return False
+
+    def _free_name(self, file_path, new_name):
+        new_path = self.destination_folder / new_name
+        base_name = new_path.stem
+        ext = new_path.suffix
+        count = 1
+
+        while new_path != file_path and self._taken(new_path):
+            new_path = self.destination_folder / f"{base_name} {count}{ext}"
+            count += 1
+
+        return new_path
+
+    def delete_thumbnails(self, file_path):
+        for ext in THUMBNAIL_EXTENSIONS:
+            thumbnail = file_path.with_suffix(ext)
+
+            try:
+                thumbnail.unlink()
+            except FileNotFoundError:
+                continue
+
+            with self._lock:
+                self._names.discard(thumbnail.name)
+
+            if self.library is not None:
+                self.library.forget([thumbnail])
+
+            logging.info(f"Deleted leftover thumbnail file: {thumbnail.name}")
 
-    for file_path in destination_folder.iterdir():
-        if not file_path.is_file():
-            continue
+    def finish(self, file_path, thumbnails=True, video_id=None):
+        """
+        Returns the file's final path, or None if it was deleted.
+        """
 
-        if file_path.suffix.lower() != '.mp3':
-            continue
+        file_path = Path(file_path)
+
+        if thumbnails:
+            self.delete_thumbnails(file_path)
+
+        if file_path.suffix.lower() not in AUDIO_EXTENSIONS:
+            return file_path
 
         filename = file_path.name
         lower_name = filename.lower()
 
-        if any(kw in lower_name for kw in skip_keywords):
+        if any(kw in lower_name for kw in self.skip_keywords):
             file_path.unlink()
+
+            with self._lock:
+                self._names.discard(filename)
+
+            if self.library is not None:
+                self.library.forget([file_path])
+
             logging.info(f"Deleted file due to skip keyword: {filename}")
-            continue
+            return None
 
-        base_title = file_path.stem
-        new_name = clean_title(base_title, remove_phrases)
-        new_path = destination_folder / new_name
+        new_name = clean_title(file_path.stem, self.remove_phrases, file_path.suffix.lower())
 
-        base_name = new_path.stem
-        ext = new_path.suffix
-        count = 1
+        with self._lock:
+            self._names.add(filename)
+            new_path = self._free_name(file_path, new_name)
 
-        while new_path.exists() and new_path != file_path:
-            new_path = destination_folder / f"{base_name} {count}{ext}"
-            count += 1
+            if new_path != file_path:
+                file_path.rename(new_path)
+                self._names.discard(filename)
+                self._names.add(new_path.name)
 
         if new_path != file_path:
-            file_path.rename(new_path)
             logging.info(f"Renamed {filename} to {new_path.name}")
 
+        if self.library is not None:
+            self.library.record(
+                new_path,
+                video_id=video_id,
+                previous_path=file_path if new_path != file_path else None
+            )
+
+        return new_path
 
-def delete_leftover_thumbnails(destination_folder):
+
+def process_downloaded_files(destination_folder, skip_keywords, remove_phrases, library=None):
     """
-    Deletes leftover thumbnail files created by yt-dlp after embedding.
-    Since this is your raw download folder, all image thumbnails here are treated as disposable.
+    Full reconciliation sweep (--reconcile): runs FileFinisher over every
+    audio file in the folder and deletes every leftover thumbnail. With a
+    LibraryIndex the files come from the index, which only re-reads the
+    folder if it changed; otherwise from a single directory pass. Since
+    this is your raw download folder, all image thumbnails here are
+    treated as disposable.
     """
 
     destination_folder = Path(destination_folder)
 
-    thumbnail_extensions = {
-        '.webp',
-        '.jpg',
-        '.jpeg',
-        '.png',
-    }
+    if not destination_folder.exists():
+        logging.warning(f"Destination folder does not exist: {destination_folder}")
+        return
 
-    for file_path in destination_folder.iterdir():
-        if not file_path.is_file():
-            continue
+    finisher = FileFinisher(destination_folder, skip_keywords, remove_phrases, library)
 
-        if file_path.suffix.lower() in thumbnail_extensions:
-            file_path.unlink()
-            logging.info(f"Deleted leftover thumbnail file: {file_path.name}")
+    if library is not None:
+        files = [
+            (row['name'], row['path'], row['video_id'])
+            for row in library.files(destination_folder, recursive=False)
+        ]
+    else:
+        with os.scandir(destination_folder) as entries:
+            files = [(entry.name, entry.path, None) for entry in entries if entry.is_file()]
+
+    thumbnails = []
+
+    for name, path, video_id in files:
+        suffix = Path(name).suffix.lower()
+
+        if suffix in THUMBNAIL_EXTENSIONS:
+            Path(path).unlink(missing_ok=True)
+            thumbnails.append(path)
+            logging.info(f"Deleted leftover thumbnail file: {name}")
+        elif suffix in AUDIO_EXTENSIONS:
+            finisher.finish(path, thumbnails=False, video_id=video_id)
+
+    if library is not None:
+        library.forget(thumbnails)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Download new audio from the configured YouTube channels."
+    )
+    parser.add_argument(
+        '--full-rescan',
+        action='store_true',
+        help="Enumerate every channel completely instead of stopping at already-downloaded videos."
+    )
+    parser.add_argument(
+        '--no-resume',
+        action='store_true',
+        help="Discard the queue left by an interrupted run and expand channels again."
+    )
+    parser.add_argument(
+        '--reconcile',
+        action='store_true',
+        help="After downloading, sweep the whole destination folder for files to rename or delete."
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
     config = load_config()
 
     destination_folder = Path(config.get(
@@ -275,6 +1076,7 @@ def main():
         str(SCRIPT_DIR / 'a')
     )).expanduser()
 
+    # Legacy text history; only read once to seed an empty ledger.
     downloaded_videos_file = Path(config.get(
         'downloaded_videos_file',
         str(SCRIPT_DIR / 'downloaded_videos.txt')
@@ -285,13 +1087,36 @@ def main():
         str(SCRIPT_DIR / 'download_log.txt')
     )).expanduser()
 
+    ledger_file = Path(config.get(
+        'ledger_file',
+        str(SCRIPT_DIR / 'downloads.sqlite3')
+    )).expanduser()
+
+    listing_cache_file = Path(config.get(
+        'listing_cache_file',
+        str(SCRIPT_DIR / 'channel_listings.sqlite3')
+    )).expanduser()
+
+    library_index_file = Path(config.get(
+        'library_index_file',
+        str(SCRIPT_DIR / 'library.sqlite3')
+    )).expanduser()
+
+    metrics_file = Path(config.get(
+        'metrics_file',
+        str(SCRIPT_DIR / 'download_metrics.jsonl')
+    )).expanduser()
+
+    # Optional node_exporter textfile, e.g. /var/lib/node_exporter/textfile_collector/yt_downloader.prom
+    prometheus_textfile = config.get('prometheus_textfile', None)
+
     cookies_file = config.get('cookies_file', None)
     cookies_from_browser = config.get('cookies_from_browser', None)
     js_runtime = config.get('js_runtime', 'deno')
     remote_components = config.get('remote_components', None)
 
     destination_folder.mkdir(parents=True, exist_ok=True)
-    downloaded_videos_file.parent.mkdir(parents=True, exist_ok=True)
+    ledger_file.parent.mkdir(parents=True, exist_ok=True)
     log_file.parent.mkdir(parents=True, exist_ok=True)
 
     logging.basicConfig(
@@ -305,6 +1130,38 @@ def main():
 
     logging.info("Script started.")
 
+    metrics = RunMetrics(metrics_file)
+
+    max_concurrent_downloads = config_int(config, 'max_concurrent_downloads', 1)
+    max_concurrent_postprocessing = config_int(
+        config,
+        'max_concurrent_postprocessing',
+        os.cpu_count() or 1
+    )
+    rate_limit = config_float(config, 'rate_limit_per_second', 0)
+    rate_limit_burst = config_int(config, 'rate_limit_burst', 1)
+    # Pause after an HTTP 429, doubling while they keep coming
+    rate_limit_cooldown_seconds = config_float(config, 'rate_limit_cooldown_seconds', 30)
+    # Backoff between nightly attempts at a video that failed
+    retry_base_hours = config_float(config, 'retry_base_hours', 12)
+    retry_max_days = config_float(config, 'retry_max_days', 30)
+    retry_give_up_after = config_int(config, 'retry_give_up_after', 10)
+    max_concurrent_expansions = config_int(config, 'max_concurrent_expansions', 4)
+    incremental_stop_after = config_int(config, 'incremental_stop_after', 30)
+    listing_cache_ttl_hours = config_float(config, 'listing_cache_ttl_hours', 6)
+    # Same limits mp3 sortclean.py applies after the fact
+    min_duration_seconds = config_float(config, 'min_duration_seconds', 60)
+    max_duration_seconds = config_float(config, 'max_duration_seconds', 3600)
+    audio_format = config.get('audio_format', 'mp3').lower()
+    audio_quality = config.get('audio_quality', '192')
+    pipeline_mode = config.get('pipeline_mode', 'inline').lower()
+    postprocess_workers = config_int(config, 'postprocess_workers', os.cpu_count() or 1)
+    postprocess_queue_size = config_int(config, 'postprocess_queue_size', 2 * postprocess_workers)
+
+    if audio_format not in ('mp3', 'native', 'm4a', 'opus'):
+        logging.warning(f"Unknown audio_format {audio_format}; using mp3.")
+        audio_format = 'mp3'
+
     skip_keywords = [
         kw.strip().lower()
         for kw in config.get(
@@ -314,11 +1171,12 @@ def main():
         if kw.strip()
     ]
 
+    # Phrases are kept unstripped: ' س ' only matches as a separate word.
     remove_phrases = [
-        ph.strip()
+        ph
         for ph in config.get(
             'remove_phrases',
-            '(as),(sa),(A S ),a s,(a.s),(a.s.), س ,ﷺ, ص ,(ص),(),s a w w,new,NEW'
+            ','.join(DEFAULT_REMOVE_PHRASES)
         ).split(',')
         if ph.strip()
     ]
@@ -349,46 +1207,119 @@ def main():
         remote_components=remote_components,
     )
 
-    all_video_urls = []
+    ledger = DownloadLedger(ledger_file)
 
-    for u in urls:
-        logging.info(f"Expanding URL: {u}")
-
-        expanded = get_playlist_or_channel_urls(
-            u,
-            common_ydl_opts=common_ydl_opts
+    if ledger.is_empty() and downloaded_videos_file.exists():
+        lines_read, added = ledger.import_text_files([downloaded_videos_file])
+        logging.info(
+            f"Imported {added} videos from {lines_read} lines of "
+            f"{downloaded_videos_file} into the ledger."
         )
 
-        if expanded:
-            all_video_urls.extend(expanded)
-            logging.info(f"Expanded {u} into {len(expanded)} video URLs.")
-        else:
-            all_video_urls.append(u)
-            logging.warning(f"Could not expand URL; treating as direct video URL: {u}")
+    metadata_filter = MetadataFilter(
+        skip_keywords,
+        min_duration=min_duration_seconds,
+        max_duration=max_duration_seconds
+    )
 
-    # Remove duplicates while preserving order
-    all_video_urls = list(dict.fromkeys(all_video_urls))
+    # Downloaded, previously skipped and permanently failed videos are
+    # never queued again; failed ones wait out their backoff.
+    done_ids = ledger.done_ids()
+    backoff_ids = ledger.backoff_ids()
 
-    logging.info(f"Total unique URLs found: {len(all_video_urls)}")
+    pending_urls = []
 
-    downloaded_videos = load_downloaded_videos(downloaded_videos_file)
+    if args.no_resume or args.full_rescan:
+        ledger.clear_queue()
+    else:
+        pending_urls = ledger.pending_queue()
 
-    filtered_urls = [
-        url
-        for url in all_video_urls
-        if url not in downloaded_videos
-    ]
+    if pending_urls:
+        # An earlier run was interrupted; its queue already excludes
+        # everything it finished, so skip expansion and pick up from there.
+        filtered_urls = pending_urls
+        logging.info(f"Resuming interrupted run with {len(filtered_urls)} queued URLs.")
+    else:
+        listing_cache = ChannelListingCache(listing_cache_file)
+
+        if args.full_rescan:
+            logging.info("Full rescan requested; enumerating every channel completely.")
+
+        with metrics.timed('expand', channels=len(urls)):
+            all_entries = expand_urls(
+                urls,
+                common_ydl_opts=common_ydl_opts,
+                max_workers=max_concurrent_expansions,
+                downloaded_ids=None if args.full_rescan else done_ids,
+                stop_after=incremental_stop_after,
+                listing_cache=listing_cache,
+                cache_ttl=listing_cache_ttl_hours * 3600,
+                metrics=metrics
+            )
+
+        listing_cache.close()
+
+        logging.info(f"Total unique URLs found: {len(all_entries)}")
+
+        new_entries = [
+            entry
+            for entry in all_entries
+            if entry['id'] not in done_ids
+        ]
+
+        logging.info(f"URLs left after filtering already-downloaded videos: {len(new_entries)}")
+
+        waiting = [entry for entry in new_entries if entry['id'] in backoff_ids]
+
+        if waiting:
+            new_entries = [entry for entry in new_entries if entry['id'] not in backoff_ids]
+            logging.info(f"Holding back {len(waiting)} failed videos until their retry time.")
+
+        new_entries, skipped = metadata_filter.split(new_entries)
+
+        for entry, reason in skipped:
+            logging.info(f"Skipping ({reason}): {entry['title']} {entry['url']}")
+
+        ledger.record_skipped([
+            (entry['id'], entry['url'], reason)
+            for entry, reason in skipped
+            if entry['id']
+        ])
+
+        filtered_urls = [entry['url'] for entry in new_entries]
 
-    logging.info(f"URLs left after filtering already-downloaded videos: {len(filtered_urls)}")
+        logging.info(f"URLs left after metadata filtering: {len(filtered_urls)}")
+
+        ledger.save_queue(filtered_urls)
+
+    format_selector, postprocessors = build_audio_options(audio_format, audio_quality)
+
+    retry_policy = RetryPolicy(
+        base_delay=retry_base_hours * 3600,
+        max_delay=retry_max_days * 86400,
+        give_up_after=retry_give_up_after
+    )
+
+    def retry_sleep(n=0):
+        # Counted in the metrics, with a backoff instead of yt-dlp's immediate retry
+        return metrics.retry_sleep(n) + retry_policy.retry_sleep(n)
 
     ydl_opts = {
         **common_ydl_opts,
 
-        'format': 'bestaudio/best',
+        'format': format_selector,
         'outtmpl': str(destination_folder / '%(title)s [%(id)s].%(ext)s'),
         'ignoreerrors': False,
         'noplaylist': True,
 
+        # Keep .part files from interrupted runs and resume them
+        'continuedl': True,
+        'nopart': False,
+        'overwrites': False,
+
+        # Catches what the flat listing couldn't (missing title/duration)
+        'match_filter': metadata_filter.match_filter,
+
         # Filename handling
         'restrictfilenames': False,
         'windowsfilenames': True,
@@ -397,50 +1328,152 @@ def main():
         'writethumbnail': True,
         'embedmetadata': True,
 
-        'postprocessors': [
-            {
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192'
-            },
-            {
-                'key': 'FFmpegMetadata',
-                'add_metadata': True,
-            },
-            {
-                'key': 'EmbedThumbnail',
-                'already_have_thumbnail': False,
-            },
-        ],
+        'postprocessors': postprocessors,
+
+        # Per-video transfer, postprocessor and retry metrics
+        'progress_hooks': [metrics.progress_hook],
+        'postprocessor_hooks': [metrics.postprocessor_hook],
+        'retry_sleep_functions': {
+            kind: retry_sleep
+            for kind in ('http', 'fragment', 'file_access', 'extractor')
+        },
     }
 
-    newly_downloaded = []
+    scheduler = DownloadScheduler(
+        max_concurrent_downloads=max_concurrent_downloads,
+        max_concurrent_postprocessing=max_concurrent_postprocessing,
+        rate_limit=rate_limit,
+        rate_limit_burst=rate_limit_burst,
+        rate_limit_cooldown=rate_limit_cooldown_seconds,
+    )
+    # Rate-limited failures shrink the scheduler's concurrency
+    retry_policy.throttle = scheduler.throttle
+
+    logging.info(
+        f"Downloading with {scheduler.max_concurrent_downloads} worker(s), "
+        f"{max_concurrent_postprocessing} postprocessing slot(s), "
+        f"rate limit {rate_limit or 'off'}/s per host."
+    )
 
-    total = len(filtered_urls)
+    library = LibraryIndex(library_index_file)
+    finisher = FileFinisher(destination_folder, skip_keywords, remove_phrases, library)
+    children_before = os.times()
+
+    with metrics.timed('download', videos=len(filtered_urls), pipeline_mode=pipeline_mode):
+        if pipeline_mode == 'staged':
+            # Download workers fetch raw audio only; a separate pool sized to
+            # the CPU runs the same postprocessors.
+            fetch_sessions = YdlSessionPool({
+                **ydl_opts,
+                'postprocessors': [],
+            })
+            postprocess_sessions = YdlSessionPool(ydl_opts)
+            pipeline = StagedPipeline(
+                scheduler,
+                postprocess_workers=postprocess_workers,
+                queue_size=postprocess_queue_size
+            )
+
+            logging.info(
+                f"Staged pipeline: {pipeline.postprocess_workers} postprocess worker(s), "
+                f"queue of {pipeline.queue_size} files."
+            )
+
+            newly_downloaded = pipeline.run(
+                filtered_urls,
+                lambda url: fetch_video(
+                    url,
+                    fetch_sessions.get(),
+                    ledger=ledger,
+                    metadata_filter=metadata_filter,
+                    metrics=metrics,
+                    retry_policy=retry_policy
+                ),
+                lambda item: postprocess_video(
+                    item,
+                    postprocess_sessions,
+                    ledger=ledger,
+                    finisher=finisher,
+                    metrics=metrics,
+                    retry_policy=retry_policy
+                )
+            )
+
+            fetch_sessions.close()
+            postprocess_sessions.close()
+        else:
+            # The gate blocks before the metrics hook starts timing the postprocessor
+            ydl_opts['postprocessor_hooks'] = [scheduler.postprocess_gate.hook, *ydl_opts['postprocessor_hooks']]
+            sessions = YdlSessionPool(ydl_opts)
+
+            newly_downloaded = scheduler.run(
+                filtered_urls,
+                lambda url: download_video(
+                    url,
+                    sessions.get(),
+                    ledger=ledger,
+                    metadata_filter=metadata_filter,
+                    finisher=finisher,
+                    metrics=metrics,
+                    retry_policy=retry_policy
+                )
+            )
+
+            sessions.close()
+
+    # ffmpeg runs as child processes, so their CPU time is the cost of the
+    # chosen audio_format.
+    children_after = os.times()
+    postprocess_cpu = (
+        (children_after.children_user - children_before.children_user)
+        + (children_after.children_system - children_before.children_system)
+    )
 
-    for index, url in enumerate(filtered_urls, start=1):
-        logging.info(f"Downloading {index}/{total}: {url}")
-        success = download_video(url, ydl_opts)
+    if newly_downloaded:
+        logging.info(
+            f"Postprocessing CPU ({audio_format}): {postprocess_cpu:.1f}s total, "
+            f"{postprocess_cpu / len(newly_downloaded):.2f}s per file."
+        )
 
-        if success:
-            newly_downloaded.append(url)
+    if args.reconcile:
+        logging.info("Reconciling the whole destination folder.")
 
-    save_downloaded_videos(downloaded_videos_file, newly_downloaded)
+        with metrics.timed('reconcile'):
+            process_downloaded_files(
+                destination_folder,
+                skip_keywords,
+                remove_phrases,
+                library
+            )
+            linked = library.link_ledger(ledger)
 
-    process_downloaded_files(
-        destination_folder,
-        skip_keywords,
-        remove_phrases
+        logging.info(f"Linked {linked} indexed files to their video IDs.")
+
+    ledger.close()
+    library.close()
+
+    run_seconds = metrics.finish(
+        audio_format=audio_format,
+        pipeline_mode=pipeline_mode,
+        postprocess_cpu_seconds=round(postprocess_cpu, 3)
     )
+    metrics.log_summary(run_seconds)
+
+    if prometheus_textfile:
+        try:
+            metrics.write_prometheus(Path(prometheus_textfile).expanduser(), run_seconds)
+        except OSError as e:
+            logging.error(f"Could not write Prometheus textfile {prometheus_textfile}: {e}")
 
-    delete_leftover_thumbnails(destination_folder)
+    metrics.close()
 
     logging.info(f"Newly downloaded videos: {len(newly_downloaded)}")
     logging.info("All processing finished.")
 
     print(f"Done. Downloaded {len(newly_downloaded)} new files.")
     print(f"Destination: {destination_folder}")
-    print(f"Downloaded list: {downloaded_videos_file}")
+    print(f"Download ledger: {ledger_file}")
+    print(f"Metrics: {metrics_file}")
     print(f"Log file: {log_file}")
 
 
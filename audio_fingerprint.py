@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Finds the same audio saved under different names (e.g. one recitation
+re-uploaded by two channels) by comparing audio fingerprints.
+
+    python audio_fingerprint.py /path/to/library --csv duplicate_audio.csv
+
+Each file's first few minutes are decoded by ffmpeg to 5512 Hz mono and
+reduced with NumPy to one 16-bit word per 46 ms frame: the signs of the
+energy differences between 17 log-spaced bands from 300 to 2000 Hz, across
+adjacent bands and frames. Those bits survive re-encoding, volume changes
+and resampling. Fingerprints are kept in the library index with the
+--seconds they cover, so unchanged files are never decoded twice at the
+same --seconds.
+
+Matching samples a quarter of each file's consecutive word pairs (the same
+pairs in every copy of the audio), sorts them into one array, and counts
+how often two files share a pair at the same time offset. Pairs with enough
+votes are confirmed by the bit error rate over their aligned overlap, and
+union-find merges them into clusters.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import shutil
+import struct
+import subprocess
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from library_index import DEFAULT_INDEX_FILE, LibraryIndex
+from near_duplicates import UnionFind
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+AUDIO_EXTENSIONS = {'.mp3', '.opus', '.m4a', '.ogg', '.webm'}
+
+SAMPLE_RATE = 5512
+FRAME_SIZE = 2048
+HOP_SIZE = 256
+FRAMES_PER_SECOND = SAMPLE_RATE / HOP_SIZE
+BAND_EDGES_HZ = (300, 2000)
+BANDS = 17
+
+DEFAULT_SECONDS = 240
+DEFAULT_MAX_BIT_ERROR_RATE = 0.3
+MIN_VOTES = 6
+MIN_OVERLAP_SECONDS = 20
+
+# Word pairs seen more often than this across the library are silence or
+# steady tones, not content.
+MAX_KEY_OCCURRENCES = 50
+
+# Stored fingerprints start with a magic and the seconds they cover
+FINGERPRINT_HEADER = struct.Struct('<4sI')
+FINGERPRINT_MAGIC = b'AFP1'
+
+
+def decode_pcm(path, seconds=DEFAULT_SECONDS):
+    """
+    Decodes the first `seconds` of a file to mono 5512 Hz float samples.
+    """
+
+    result = subprocess.run(
+        [
+            'ffmpeg', '-hide_banner', '-nostdin', '-v', 'error',
+            '-i', str(path),
+            '-t', str(seconds),
+            '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE),
+            '-f', 's16le', '-',
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    if result.returncode != 0:
+        message = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(message[-1] if message else f"ffmpeg exited with {result.returncode}")
+
+    return np.frombuffer(result.stdout, dtype='<i2').astype(np.float32)
+
+
+def fingerprint_samples(samples):
+    """
+    Returns one uint16 word per frame (see the module docstring).
+    """
+
+    if len(samples) < FRAME_SIZE + 2 * HOP_SIZE:
+        return np.zeros(0, dtype=np.uint16)
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE), axis=1)) ** 2
+
+    edges = np.geomspace(*BAND_EDGES_HZ, BANDS + 1) * FRAME_SIZE / SAMPLE_RATE
+    edges = np.round(edges).astype(int)
+    cumulative = np.concatenate(
+        [np.zeros((len(spectrum), 1)), np.cumsum(spectrum, axis=1)],
+        axis=1
+    )
+    energies = cumulative[:, edges[1:]] - cumulative[:, edges[:-1]]
+
+    band_differences = energies[:, :-1] - energies[:, 1:]
+    bits = (band_differences[1:] - band_differences[:-1]) > 0
+
+    return (bits @ (1 << np.arange(BANDS - 2, -1, -1))).astype(np.uint16)
+
+
+def fingerprint_file(path, seconds=DEFAULT_SECONDS):
+    """
+    Worker entry point: returns (path, fingerprint bytes or None, error).
+    """
+
+    try:
+        words = fingerprint_samples(decode_pcm(path, seconds))
+        return path, FINGERPRINT_HEADER.pack(FINGERPRINT_MAGIC, seconds) + words.astype('<u2').tobytes(), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def fingerprint_seconds(blob):
+    """
+    Returns how many seconds a stored fingerprint covers, or None for one
+    stored before that was recorded.
+    """
+
+    if blob is None or len(blob) < FINGERPRINT_HEADER.size:
+        return None
+
+    magic, seconds = FINGERPRINT_HEADER.unpack_from(blob)
+    return seconds if magic == FINGERPRINT_MAGIC else None
+
+
+def load_fingerprint(blob):
+    return np.frombuffer(blob, dtype='<u2', offset=FINGERPRINT_HEADER.size).astype(np.uint16)
+
+
+def bit_error_rate(a, b, offset):
+    """
+    Share of differing bits between a[i] and b[i + offset] over the frames
+    both cover. Returns (rate, overlapping frames).
+    """
+
+    start_a = max(0, -offset)
+    start_b = start_a + offset
+    count = min(len(a) - start_a, len(b) - start_b)
+
+    if count <= 0:
+        return 1.0, 0
+
+    differing = np.bitwise_xor(a[start_a:start_a + count], b[start_b:start_b + count])
+    return np.unpackbits(differing.view(np.uint8)).sum() / (16 * count), count
+
+
+def landmarks(words):
+    """
+    Samples consecutive word pairs by a hash of their value, so every copy
+    of the same audio keeps the same pairs. Returns (keys, frame positions).
+    """
+
+    keys = (words[:-1].astype(np.uint32) << np.uint32(16)) | words[1:]
+    keep = ((keys * np.uint32(2654435761)) >> np.uint32(30)) == 0
+    positions = np.nonzero(keep)[0]
+
+    return keys[positions], positions
+
+
+def candidate_offsets(fingerprints):
+    """
+    Returns {(i, j): best offset} for fingerprint pairs that share at least
+    MIN_VOTES sampled word pairs at (almost) the same time offset.
+    """
+
+    keys, owners, positions = [], [], []
+
+    for index, words in enumerate(fingerprints):
+        file_keys, file_positions = landmarks(words)
+        keys.append(file_keys)
+        positions.append(file_positions)
+        owners.append(np.full(len(file_keys), index, dtype=np.int64))
+
+    if not keys:
+        return {}
+
+    keys = np.concatenate(keys)
+    owners = np.concatenate(owners)
+    positions = np.concatenate(positions)
+
+    order = np.argsort(keys, kind='stable')
+    keys, owners, positions = keys[order], owners[order], positions[order]
+
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    ends = np.append(starts[1:], len(keys))
+    votes = defaultdict(Counter)
+
+    lengths = ends - starts
+    shared = (lengths > 1) & (lengths <= MAX_KEY_OCCURRENCES)
+
+    for start, end in zip(starts[shared].tolist(), ends[shared].tolist()):
+        run_owners = owners[start:end].tolist()
+        run_positions = positions[start:end].tolist()
+
+        for a in range(end - start):
+            for b in range(a + 1, end - start):
+                i, j = run_owners[a], run_owners[b]
+
+                if i == j:
+                    continue
+
+                if i > j:
+                    votes[(j, i)][run_positions[a] - run_positions[b]] += 1
+                else:
+                    votes[(i, j)][run_positions[b] - run_positions[a]] += 1
+
+    candidates = {}
+
+    for pair, offsets in votes.items():
+        # Re-encoded copies can drift by a frame either side of the true offset.
+        best = max(offsets, key=lambda o: offsets[o - 1] + offsets[o] + offsets[o + 1])
+
+        if offsets[best - 1] + offsets[best] + offsets[best + 1] >= MIN_VOTES:
+            candidates[pair] = best
+
+    return candidates
+
+
+def find_duplicate_audio(fingerprints, max_bit_error_rate=DEFAULT_MAX_BIT_ERROR_RATE):
+    """
+    Takes {path: uint16 fingerprint array} and returns clusters (sorted
+    lists of two or more paths) of files holding the same audio.
+    """
+
+    paths = sorted(fingerprints)
+    arrays = [fingerprints[path] for path in paths]
+    min_overlap = MIN_OVERLAP_SECONDS * FRAMES_PER_SECOND
+    groups = UnionFind(len(paths))
+
+    for (i, j), offset in candidate_offsets(arrays).items():
+        if groups.find(i) == groups.find(j):
+            continue
+
+        rate, overlap = min(
+            bit_error_rate(arrays[i], arrays[j], offset + shift)
+            for shift in (-1, 0, 1)
+        )
+
+        # Short files only need to overlap almost entirely.
+        needed = min(min_overlap, 0.9 * min(len(arrays[i]), len(arrays[j])))
+
+        if rate <= max_bit_error_rate and overlap >= needed:
+            groups.union(i, j)
+
+    members = defaultdict(list)
+
+    for index, path in enumerate(paths):
+        members[groups.find(index)].append(path)
+
+    return sorted(
+        (group for group in members.values() if len(group) > 1),
+        key=lambda group: group[0]
+    )
+
+
+def fill_fingerprints(index, root, workers=None, seconds=DEFAULT_SECONDS):
+    """
+    Fingerprints the audio files under `root` that the library index has
+    no fingerprint of `seconds` for (new or changed files, or a different
+    --seconds) across a process pool, storing each result as it arrives so
+    an interrupted run keeps its progress. Returns the number of files
+    fingerprinted.
+    """
+
+    stale = [
+        row['path']
+        for row in index.files(root, extensions=AUDIO_EXTENSIONS)
+        if fingerprint_seconds(row['fingerprint']) != seconds
+    ]
+
+    if not stale:
+        return 0
+
+    logging.info(f"Fingerprinting {len(stale)} new or changed files under {root}.")
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures = [executor.submit(fingerprint_file, path, seconds) for path in stale]
+
+        for future in as_completed(futures):
+            path, fingerprint, error = future.result()
+
+            if fingerprint is None:
+                logging.error(f"Could not fingerprint {path}: {error}")
+                continue
+
+            index.set_values('fingerprint', {path: fingerprint})
+            done += 1
+
+            if done % 100 == 0:
+                logging.info(f"Fingerprinted {done}/{len(stale)}")
+
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report files that contain the same audio.")
+    parser.add_argument('paths', nargs='+', help="Folders to scan.")
+    parser.add_argument('--index', default=str(DEFAULT_INDEX_FILE), help="Library index database.")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel decoders (default: CPU count).")
+    parser.add_argument('--seconds', type=int, default=DEFAULT_SECONDS, help="Audio to fingerprint per file.")
+    parser.add_argument('--max-bit-error-rate', type=float, default=DEFAULT_MAX_BIT_ERROR_RATE)
+    parser.add_argument('--csv', help="Also write the clusters here, one blank row between clusters.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+    if np is None:
+        logging.error("numpy is required: pip install numpy")
+        return
+
+    if not shutil.which('ffmpeg'):
+        logging.error("ffmpeg not found on PATH.")
+        return
+
+    index = LibraryIndex(args.index)
+    fingerprints = {}
+
+    try:
+        for root in args.paths:
+            index.refresh(root)
+            fill_fingerprints(index, root, args.workers, args.seconds)
+
+            for row in index.files(root, extensions=AUDIO_EXTENSIONS):
+                if fingerprint_seconds(row['fingerprint']) == args.seconds:
+                    fingerprints[row['path']] = load_fingerprint(row['fingerprint'])
+    finally:
+        index.close()
+
+    clusters = find_duplicate_audio(fingerprints, args.max_bit_error_rate)
+
+    for cluster in clusters:
+        print()
+
+        for path in cluster:
+            print(path)
+
+    print(f"\n{len(clusters)} clusters of duplicate audio among {len(fingerprints)} files.")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+
+            for cluster in clusters:
+                for path in cluster:
+                    writer.writerow([path])
+
+                writer.writerow([])
+
+
+if __name__ == "__main__":
+    main()
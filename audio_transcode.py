@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bulk-converts natively downloaded audio (opus/m4a/webm) to MP3, in
+parallel across cores, keeping tags and cover art.
+
+    python audio_transcode.py /path/to/folder --workers 8
+    python audio_transcode.py --ledger downloads.sqlite3 --delete-source
+
+An existing <name>.mp3 is never overwritten: that source is skipped. Two
+sources with the same name in one run (song.opus, song.m4a) get
+"song.mp3" and "song 1.mp3". New files and deleted sources are written to
+the library index.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from library_index import DEFAULT_INDEX_FILE, LibraryIndex
+
+NATIVE_AUDIO_EXTENSIONS = {'.opus', '.m4a', '.webm', '.ogg', '.aac', '.mka'}
+
+# Guards the set of targets claimed by a run's worker threads
+_claim_lock = threading.Lock()
+
+
+def run_ffmpeg(command):
+    """
+    Runs an ffmpeg command and returns (returncode, stderr, cpu_seconds).
+
+    On POSIX the CPU time comes from wait4() on that one child, so it is
+    exact even with many conversions running at once. Elsewhere it is None.
+    """
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+
+    if not hasattr(os, 'wait4'):
+        _, stderr = process.communicate()
+        return process.returncode, stderr.decode('utf-8', 'replace'), None
+
+    # Drain stderr before reaping so ffmpeg can't block on a full pipe.
+    stderr = process.stderr.read()
+    process.stderr.close()
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    return (
+        process.returncode,
+        stderr.decode('utf-8', 'replace'),
+        rusage.ru_utime + rusage.ru_stime,
+    )
+
+
+def mp3_command(source, target, quality='192'):
+    return [
+        'ffmpeg', '-hide_banner', '-nostdin', '-y',
+        '-i', str(source),
+        '-map', '0:a:0',
+        '-map', '0:v?',
+        '-map_metadata', '0',
+        '-c:a', 'libmp3lame',
+        '-b:a', f'{quality}k',
+        '-c:v', 'copy',
+        '-disposition:v', 'attached_pic',
+        '-id3v2_version', '3',
+        str(target),
+    ]
+
+
+def pick_target(source, claimed=None):
+    """
+    Returns the MP3 path to write for `source`, or None if <stem>.mp3
+    already existed before this run. `claimed` is the set of targets this
+    run has handed out; a name in it gets the next free " 1", " 2"...
+    """
+
+    target = source.with_suffix('.mp3')
+
+    if claimed is None:
+        return None if target.exists() else target
+
+    with _claim_lock:
+        if target not in claimed and target.exists():
+            return None
+
+        base_name = target.stem
+        count = 1
+
+        while target in claimed or target.exists():
+            target = source.with_name(f"{base_name} {count}.mp3")
+            count += 1
+
+        claimed.add(target)
+
+    return target
+
+
+def transcode_to_mp3(source, quality='192', delete_source=False, library=None, claimed=None):
+    """
+    Converts one file to MP3 next to it. Returns a result dict with the
+    target path, success and skipped flags, wall time and ffmpeg CPU
+    seconds. With a LibraryIndex, the new file and a deleted source are
+    recorded in it.
+    """
+
+    source = Path(source)
+    target = pick_target(source, claimed)
+
+    if target is None:
+        logging.warning(f"Skipped {source.name}: {source.with_suffix('.mp3').name} already exists.")
+        return {
+            'source': str(source),
+            'target': str(source.with_suffix('.mp3')),
+            'ok': False,
+            'skipped': True,
+            'seconds': 0.0,
+            'cpu_seconds': None,
+        }
+
+    temporary = target.with_name(target.stem + '.part.mp3')
+
+    start = time.perf_counter()
+    returncode, stderr, cpu_seconds = run_ffmpeg(mp3_command(source, temporary, quality))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'source': str(source),
+        'target': str(target),
+        'ok': returncode == 0,
+        'skipped': False,
+        'seconds': elapsed,
+        'cpu_seconds': cpu_seconds,
+    }
+
+    if returncode != 0:
+        temporary.unlink(missing_ok=True)
+        last_line = stderr.strip().splitlines()[-1] if stderr.strip() else ''
+        logging.error(f"ffmpeg failed for {source.name}: {last_line}")
+        return result
+
+    temporary.replace(target)
+
+    if library is not None:
+        library.record(target)
+
+    if delete_source:
+        source.unlink()
+
+        if library is not None:
+            library.forget([source])
+
+    return result
+
+
+def transcode_many(paths, workers=None, quality='192', delete_source=False, library=None):
+    """
+    Converts every path on a pool of `workers` threads (default: one per
+    core). Threads are enough because the work happens in ffmpeg.
+    """
+
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    claimed = set()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths) or 1))) as executor:
+        return list(executor.map(
+            lambda path: transcode_to_mp3(path, quality, delete_source, library, claimed),
+            paths
+        ))
+
+
+def find_native_audio(folder):
+    return sorted(
+        entry.path
+        for entry in os.scandir(folder)
+        if entry.is_file() and Path(entry.name).suffix.lower() in NATIVE_AUDIO_EXTENSIONS
+    )
+
+
+def report(results):
+    converted = [r for r in results if r['ok']]
+    skipped = [r for r in results if r['skipped']]
+    cpu = [r['cpu_seconds'] for r in converted if r['cpu_seconds'] is not None]
+
+    print(f"Converted {len(converted)}/{len(results)} files"
+          f"{f', skipped {len(skipped)} with an existing MP3' if skipped else ''}.")
+
+    if cpu:
+        print(f"ffmpeg CPU: {sum(cpu):.1f}s total, {sum(cpu) / len(cpu):.2f}s per file.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert natively downloaded audio to MP3 in bulk.")
+    parser.add_argument('paths', nargs='*', help="Files or folders to convert.")
+    parser.add_argument('--ledger', help="Convert every non-MP3 file recorded in this download ledger.")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel ffmpeg processes (default: CPU count).")
+    parser.add_argument('--quality', default='192', help="MP3 bitrate in kbit/s.")
+    parser.add_argument('--delete-source', action='store_true', help="Remove the original after converting.")
+    parser.add_argument('--index', default=str(DEFAULT_INDEX_FILE), help="Library index database.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+    if not shutil.which('ffmpeg'):
+        logging.error("ffmpeg not found on PATH.")
+        return
+
+    queue = []
+
+    for path in args.paths:
+        path = Path(path)
+        queue.extend(find_native_audio(path) if path.is_dir() else [str(path)])
+
+    ledger = None
+
+    if args.ledger:
+        from download_ledger import DownloadLedger
+
+        ledger = DownloadLedger(args.ledger)
+        queued_from_ledger = {
+            file_path: video_id
+            for video_id, file_path in ledger.downloaded_files()
+            if Path(file_path).suffix.lower() in NATIVE_AUDIO_EXTENSIONS and Path(file_path).exists()
+        }
+        queue.extend(queued_from_ledger)
+
+    queue = list(dict.fromkeys(queue))
+    logging.info(f"{len(queue)} files to convert.")
+
+    library = LibraryIndex(args.index)
+
+    try:
+        results = transcode_many(queue, args.workers, args.quality, args.delete_source, library)
+    finally:
+        library.close()
+
+    if ledger is not None:
+        for result in results:
+            video_id = queued_from_ledger.get(result['source'])
+
+            if result['ok'] and video_id:
+                ledger.set_file_path(video_id, result['target'])
+
+        ledger.close()
+
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
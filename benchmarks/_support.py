@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+
+for path in (str(REPO_DIR), str(BENCH_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def install_fake_yt_dlp():
+    """
+    Makes `import yt_dlp` resolve to the offline fake for this process.
+    """
+
+    import fake_yt_dlp
+    import fake_yt_dlp.utils
+
+    sys.modules['yt_dlp'] = fake_yt_dlp
+    sys.modules['yt_dlp.utils'] = fake_yt_dlp.utils
+    return fake_yt_dlp
+
+
+def load_script(filename, module_name=None):
+    """
+    Imports one of the repo's top-level scripts (most have spaces in their
+    names) without running its __main__ block.
+    """
+
+    path = REPO_DIR / filename
+    module_name = module_name or path.stem.lower().replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def add_json_argument(parser):
+    parser.add_argument(
+        '--json',
+        metavar='PATH',
+        help="Also write the results as JSON to PATH ('-' for stdout), for run_suite.py."
+    )
+
+
+class Results:
+    """
+    Machine-readable results of one benchmark run: named measurements, each
+    with a unit and whether a higher value is better, and named pass/fail
+    checks. run_suite.py collects them and compares them with a baseline.
+    """
+
+    def __init__(self, benchmark, params=None):
+        self.benchmark = benchmark
+        self.params = {key: value for key, value in (params or {}).items() if key != 'json'}
+        self.metrics = {}
+        self.checks = {}
+
+    def add(self, name, value, unit, higher_is_better=True):
+        self.metrics[name] = {
+            'value': value,
+            'unit': unit,
+            'higher_is_better': higher_is_better,
+        }
+        return value
+
+    def check(self, name, passed):
+        self.checks[name] = bool(passed)
+        return passed
+
+    @property
+    def passed(self):
+        return all(self.checks.values())
+
+    def to_dict(self):
+        return {
+            'benchmark': self.benchmark,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'params': self.params,
+            'metrics': self.metrics,
+            'checks': self.checks,
+            'passed': self.passed,
+        }
+
+    def write(self, path):
+        """
+        Writes the results to `path` ('-' for stdout); does nothing without one.
+        """
+
+        if not path:
+            return
+
+        text = json.dumps(self.to_dict(), indent=2, ensure_ascii=False, default=str)
+
+        if path == '-':
+            print(text)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measures download throughput at 1/2/4/8 workers against FakeExtractor.
+
+    python benchmarks/bench_download_scheduler.py --videos 64
+"""
+
+import argparse
+import logging
+import time
+
+import _support
+from download_scheduler import DownloadScheduler
+from fake_extractor import FakeExtractor
+
+
+def run_once(workers, args):
+    extractor = FakeExtractor(
+        extract_latency=args.extract_latency,
+        size_bytes=args.size_bytes,
+        bandwidth=args.bandwidth,
+        postprocess_seconds=args.postprocess_seconds,
+    )
+    scheduler = DownloadScheduler(
+        max_concurrent_downloads=workers,
+        max_concurrent_postprocessing=args.postprocess_slots,
+        rate_limit=args.rate_limit,
+        rate_limit_burst=args.rate_limit_burst,
+    )
+    hooks = [scheduler.postprocess_gate.hook]
+    urls = [
+        f"https://www.youtube.com/watch?v=fake{i:07d}"
+        for i in range(args.videos)
+    ]
+
+    start = time.perf_counter()
+    succeeded = scheduler.run(urls, lambda url: extractor.download(url, hooks))
+    elapsed = time.perf_counter() - start
+
+    return len(succeeded), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--videos', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--postprocess-slots', type=int, default=2)
+    parser.add_argument('--extract-latency', type=float, default=0.05)
+    parser.add_argument('--size-bytes', type=int, default=4_000_000)
+    parser.add_argument('--bandwidth', type=float, default=40_000_000)
+    parser.add_argument('--postprocess-seconds', type=float, default=0.1)
+    parser.add_argument('--rate-limit', type=float, default=0)
+    parser.add_argument('--rate-limit-burst', type=int, default=1)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    results = _support.Results('download_scheduler', vars(args))
+
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"{'workers':>8} {'videos':>8} {'seconds':>10} {'videos/s':>10}")
+
+    for workers in args.workers:
+        count, elapsed = run_once(workers, args)
+        print(f"{workers:>8} {count:>8} {elapsed:>10.2f} {count / elapsed:>10.2f}")
+        results.add(f'workers_{workers}_videos_per_second', count / elapsed, 'videos/s')
+        results.check(f'{workers} workers download every video', count == args.videos)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end YT Downloader v7 runs against the offline fake yt-dlp: main()
+with a throwaway config, synthetic channel listings and generated MP3s.
+Four runs share one library: the first sync, a nightly run with nothing
+new, a nightly run after every channel uploaded a few videos (some of which
+fail: members-only, private, a server error and HTTP 429), and one more run
+that must not retry any of those failures yet.
+
+    python benchmarks/bench_downloader_e2e.py --channel-size 20 --workers 4
+
+Stage timings come from the run's own metrics file (run_metrics.py).
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import _support
+
+# (error message for one new upload, how retry_policy.py should classify it)
+FAILURES = [
+    ("Join this channel to get access to members-only content like this video", 'permanent'),
+    ("Private video. Sign in if you've been granted access to this video", 'permanent'),
+    ("Unable to download webpage: HTTP Error 503: Service Unavailable", 'transient'),
+    ("Unable to download webpage: HTTP Error 429: Too Many Requests", 'rate_limited'),
+]
+
+def write_config(folder, args):
+    settings = {
+        'destination_folder': folder / 'audio',
+        'downloaded_videos_file': folder / 'downloaded_videos.txt',
+        'log_file': folder / 'download_log.txt',
+        'ledger_file': folder / 'downloads.sqlite3',
+        'listing_cache_file': folder / 'channel_listings.sqlite3',
+        'library_index_file': folder / 'library.sqlite3',
+        'metrics_file': folder / 'download_metrics.jsonl',
+        'js_runtime': '',
+        'max_concurrent_downloads': args.workers,
+        'max_concurrent_postprocessing': args.workers,
+        'rate_limit_per_second': 0,
+        # Always list channels, so new uploads are found
+        'listing_cache_ttl_hours': 0,
+        'rate_limit_cooldown_seconds': 0.2,
+        'pipeline_mode': args.pipeline_mode,
+        'postprocess_workers': args.workers,
+    }
+    path = folder / 'config.ini'
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, value in settings.items():
+            f.write(f"{key}={value}\n")
+
+    return path, settings
+
+
+def run_main(downloader, metrics_file):
+    # Returns (seconds, the run's metrics summary)
+    from run_metrics import RunMetrics, read_events
+
+    before = sum(1 for _ in read_events(metrics_file)) if metrics_file.exists() else 0
+    argv = sys.argv
+    sys.argv = ['YT Downloader v7.py']
+    start = time.perf_counter()
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloader.main()
+    finally:
+        sys.argv = argv
+
+    seconds = time.perf_counter() - start
+    totals = RunMetrics()
+
+    for event in list(read_events(metrics_file))[before:]:
+        totals.ingest(event)
+
+    return seconds, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--channel-size', type=int, default=20, help="Videos per channel on the first run.")
+    parser.add_argument('--new-uploads', type=int, default=3, help="Videos each channel adds before the last run.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--pipeline-mode', choices=('inline', 'staged'), default='inline')
+    parser.add_argument('--extract-seconds', type=float, default=0.02)
+    parser.add_argument('--transfer-seconds', type=float, default=0.02)
+    parser.add_argument('--postprocess-seconds', type=float, default=0.03)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    # main() warns that no cookies are configured on every run, and logs
+    # the planted failures as errors
+    logging.basicConfig(level=logging.CRITICAL)
+
+    fake = _support.install_fake_yt_dlp()
+    fake.SETTINGS.update({
+        'init_seconds': 0.0,
+        'cookie_seconds': 0.0,
+        'page_seconds': 0.0,
+        'channel_size': args.channel_size,
+        'extract_seconds': args.extract_seconds,
+        'transfer_seconds': args.transfer_seconds,
+        'postprocess_seconds': args.postprocess_seconds,
+    })
+
+    downloader = _support.load_script('YT Downloader v7.py')
+    from download_ledger import DownloadLedger
+    from run_metrics import read_events
+
+    results = _support.Results('downloader_e2e', vars(args))
+    folder = Path(tempfile.mkdtemp(prefix='bench_downloader_e2e_'))
+
+    try:
+        downloader.config_file, settings = write_config(folder, args)
+        audio = settings['destination_folder']
+        metrics_file = settings['metrics_file']
+
+        first, first_totals = run_main(downloader, metrics_file)
+        channels = first_totals.stages.get('channel listing', [0])[0]
+        expected = channels * args.channel_size
+
+        nothing_new, nothing_new_totals = run_main(downloader, metrics_file)
+
+        # The newest upload of each of the first few channels fails
+        channel_urls = [event['url'] for event in read_events(metrics_file) if event['event'] == 'channel']
+        failures = FAILURES[:min(len(channel_urls), len(FAILURES))] if args.new_uploads else []
+        fake.SETTINGS['channel_size'] = args.channel_size + args.new_uploads
+        fake.SETTINGS['fail_ids'] = {
+            fake.fake_video_id(url, fake.SETTINGS['channel_size']): message
+            for url, (message, _) in zip(channel_urls, failures)
+        }
+        new_uploads, new_totals = run_main(downloader, metrics_file)
+        after_failures, after_totals = run_main(downloader, metrics_file)
+
+        files = [name for name in os.listdir(audio) if not name.startswith('.')]
+        ledger = DownloadLedger(settings['ledger_file'])
+        downloaded = ledger.counts().get('downloaded', 0)
+        failure_counts = ledger.failure_counts()
+        ledger.close()
+
+        expected_failure_counts = {}
+
+        for _, kind in failures:
+            expected_failure_counts[kind] = expected_failure_counts.get(kind, 0) + 1
+
+        print(f"{channels} channels of {args.channel_size} videos, {args.workers} workers, "
+              f"{args.pipeline_mode} pipeline")
+        print(f"  first sync      : {first:6.2f}s, {first_totals.outcomes['downloaded']} videos "
+              f"({results.add('first_sync_videos_per_second', first_totals.outcomes['downloaded'] / first, 'videos/s'):.1f}/s)")
+        print(f"  nothing new     : {results.add('nothing_new_seconds', nothing_new, 's', False):6.2f}s")
+        print(f"  new uploads     : {results.add('new_uploads_seconds', new_uploads, 's', False):6.2f}s, "
+              f"{new_totals.outcomes['downloaded']} videos, {new_totals.outcomes['failed']} failed "
+              f"({', '.join(f'{count} {kind}' for kind, count in sorted(failure_counts.items()))})")
+        print(f"  after failures  : {results.add('after_failures_seconds', after_failures, 's', False):6.2f}s, "
+              f"{sum(after_totals.outcomes.values())} attempts")
+        results.add('first_sync_seconds', first, 's', False)
+
+        print("  first sync stages (summed over videos):")
+
+        for stage, (count, total, _) in first_totals.stages.items():
+            print(f"    {stage:<22} {count:>5} x {total / count * 1000:7.1f} ms")
+            results.add(f"stage_{stage.replace(' ', '_')}_mean_seconds", total / count, 's', False)
+
+        total_expected = expected + channels * args.new_uploads - len(failures)
+        checks = {
+            'every video downloaded once': downloaded == total_expected,
+            'one mp3 per video': len(files) == total_expected and all(name.endswith('.mp3') for name in files),
+            'titles cleaned': not any('(as)' in name or '|' in name for name in files),
+            'nothing new downloads nothing': nothing_new_totals.outcomes['downloaded'] == 0,
+            'new uploads downloaded': new_totals.outcomes['downloaded'] == channels * args.new_uploads - len(failures),
+            'failures classified': failure_counts == expected_failure_counts,
+            'failures not retried yet': sum(after_totals.outcomes.values()) == 0,
+        }
+
+        for name, passed in checks.items():
+            results.check(name, passed)
+
+        failed = [name for name, passed in checks.items() if not passed]
+        print(f"  check           : {'; '.join(f'FAILED {name}' for name in failed) or 'ok'} "
+              f"({downloaded} in ledger, {len(files)} files)")
+    finally:
+        shutil.rmtree(folder)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Channel expansion at 10k entries against the offline fake yt-dlp: a full
+listing, an incremental listing of a channel whose videos are all already
+downloaded, and a listing served from the listing cache.
+
+    python benchmarks/bench_expand_channels.py --entries 10000 --channels 4
+
+The fake pages channels like YouTube's /videos tab, newest first, costing
+--page-seconds per page of --page-size entries.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import _support
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000, help="Entries per channel.")
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--page-size', type=int, default=30)
+    parser.add_argument('--page-seconds', type=float, default=0.005)
+    parser.add_argument('--stop-after', type=int, default=30)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    fake = _support.install_fake_yt_dlp()
+    fake.SETTINGS.update({
+        'init_seconds': 0.0,
+        'channel_size': args.entries,
+        'page_size': args.page_size,
+        'page_seconds': args.page_seconds,
+    })
+
+    downloader = _support.load_script('YT Downloader v7.py')
+    from listing_cache import ChannelListingCache
+
+    urls = [f"https://www.youtube.com/@channel{n}/videos" for n in range(args.channels)]
+    results = _support.Results('expand_channels', vars(args))
+    folder = tempfile.mkdtemp(prefix='bench_expand_channels_')
+
+    def timed(**kwargs):
+        start = time.perf_counter()
+        entries = downloader.expand_urls(urls, {}, max_workers=args.workers, stop_after=args.stop_after, **kwargs)
+        return time.perf_counter() - start, entries
+
+    try:
+        full, entries = timed()
+        known_ids = {entry['id'] for entry in entries}
+
+        incremental, new_entries = timed(downloaded_ids=known_ids)
+
+        cache = ChannelListingCache(os.path.join(folder, 'channel_listings.sqlite3'))
+        timed(downloaded_ids=set(), listing_cache=cache, cache_ttl=0)
+        cached, cached_entries = timed(downloaded_ids=known_ids, listing_cache=cache, cache_ttl=3600)
+        cache.close()
+
+        total = args.entries * args.channels
+        print(f"{args.channels} channels of {args.entries:,} entries, {args.workers} workers")
+        print(f"  full listing        : {full:7.2f}s, {len(entries):,} entries "
+              f"({results.add('full_entries_per_second', len(entries) / full, 'entries/s'):,.0f}/s)")
+        print(f"  incremental, known  : {results.add('incremental_seconds', incremental, 's', False):7.2f}s, "
+              f"{len(new_entries):,} entries listed")
+        print(f"  listing cache       : {results.add('cached_seconds', cached, 's', False):7.2f}s, "
+              f"{len(cached_entries):,} entries")
+        results.add('full_seconds', full, 's', False)
+
+        checks = {
+            'full listing complete': len(entries) == total,
+            'incremental stops early': len(new_entries) <= args.channels * args.stop_after,
+            'cache serves the full listing': len(cached_entries) == total,
+        }
+
+        for name, passed in checks.items():
+            results.check(name, passed)
+
+        failed = [name for name, passed in checks.items() if not passed]
+        print(f"  check               : {'; '.join(f'FAILED {name}' for name in failed) or 'ok'}")
+    finally:
+        shutil.rmtree(folder)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
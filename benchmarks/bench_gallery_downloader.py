@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Galleries per second for Gallery Downloader.py with gallery-dl run
+in-process ('api') versus as a command per gallery ('subprocess'), against
+a local HTTP fixture server. Needs gallery-dl installed.
+
+    python benchmarks/bench_gallery_downloader.py --galleries 200 --jobs 4
+
+Each gallery is one small image (gallery-dl's directlink extractor), so the
+numbers are mostly per-gallery overhead, which is what dominates a sync of
+many small galleries. Every mode does a first sync into an empty folder and
+then a resync where everything is already archived. The server runs in its
+own process so it doesn't compete with in-process jobs for the GIL.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import _support
+
+PNG_HEADER = b'\x89PNG\r\n\x1a\n'
+
+
+def serve(file_bytes):
+    # Any /<gallery>/<name>.png is an image whose content depends on its path.
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            seed = hashlib.blake2b(self.path.encode()).digest()
+            body = PNG_HEADER + (seed * (file_bytes // len(seed) + 1))[:file_bytes]
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.daemon_threads = True
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
+
+
+def snapshot(root):
+    # {relative path: content digest}, leaving out the archive
+    listing = {}
+
+    for folder, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(folder, name)
+            if os.path.dirname(path) == root:
+                continue
+            with open(path, 'rb') as f:
+                listing[os.path.relpath(path, root)] = hashlib.blake2b(f.read()).hexdigest()
+
+    return listing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--galleries', type=int, default=200)
+    parser.add_argument('--jobs', type=int, default=4)
+    parser.add_argument('--file-bytes', type=int, default=16 * 1024)
+    parser.add_argument('--modes', nargs='+', default=['subprocess', 'api'])
+    parser.add_argument('--serve', type=int, metavar='FILE_BYTES', help=argparse.SUPPRESS)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.serve)
+        return
+
+    gallery_downloader = _support.load_script('Gallery Downloader.py')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if 'api' in args.modes and gallery_downloader.gallery_dl_api is None:
+        raise SystemExit("gallery-dl is not installed as a package (pip install gallery-dl).")
+
+    server = subprocess.Popen(
+        [sys.executable, __file__, '--serve', str(args.file_bytes)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    work = tempfile.mkdtemp(prefix='bench_gallery_downloader_')
+    results = _support.Results('gallery_downloader', vars(args))
+
+    try:
+        port = int(server.stdout.readline())
+        urls = [f"http://127.0.0.1:{port}/g{n:05d}/image.png" for n in range(args.galleries)]
+        print(f"{args.galleries} galleries of one {args.file_bytes / 1024:g} KB image, {args.jobs} at a time")
+
+        listings = {}
+        refetched = {}
+
+        for mode in args.modes:
+            folder = os.path.join(work, mode)
+            timings = []
+
+            for _ in ('first sync', 'resync'):
+                start = time.perf_counter()
+                outcomes = gallery_downloader.download_galleries(
+                    urls, folder, args.jobs, resync_after_hours=0, mode=mode
+                )
+                timings.append((time.perf_counter() - start, outcomes))
+
+            listings[mode] = snapshot(folder)
+            (first, first_outcomes), (again, again_outcomes) = timings
+            failed = sum(1 for success, _, _ in first_outcomes + again_outcomes if not success)
+            new = refetched[mode] = sum(new for _, new, _ in again_outcomes)
+            results.add(f'{mode}_first_sync_galleries_per_second', args.galleries / first, 'galleries/s')
+            results.add(f'{mode}_resync_galleries_per_second', args.galleries / again, 'galleries/s')
+
+            print(
+                f"  {mode:<10}: first sync {first:6.2f}s ({args.galleries / first:6.1f} galleries/s), "
+                f"resync {again:6.2f}s ({args.galleries / again:6.1f} galleries/s), "
+                f"{len(listings[mode])} files, {failed} failed, {new} fetched again"
+            )
+
+        problems = [f"{mode} fetched {new} archived files again" for mode, new in refetched.items() if new]
+        for mode, listing in listings.items():
+            if len(listing) != args.galleries:
+                problems.append(f"{mode} saved {len(listing)} of {args.galleries} files")
+        if len({tuple(sorted(listing.items())) for listing in listings.values()}) > 1:
+            problems.append("modes saved different files")
+
+        print(f"  check     : {'; '.join(problems) or 'ok'}")
+        results.check('every mode saved every gallery once, identically', not problems)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Time and peak memory of loading a 1M-line download history: the Termux
+downloader's load_downloaded_videos() (a compact VideoIdSet), a merge into
+the SQLite download ledger, and a plain set of every line as the baseline.
+Each variant runs in its own process so its peak RSS is its own.
+
+    python benchmarks/bench_load_history.py --lines 1000000
+
+The history holds the repo's own downloaded_videos.txt IDs plus synthetic
+ones, written in the URL forms real histories pick up over the years.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import _support
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+
+URL_FORMS = (
+    'https://www.youtube.com/watch?v={}',
+    'https://www.youtube.com/watch?v={}',
+    'https://youtu.be/{}',
+    'https://www.youtube.com/shorts/{}',
+    'https://m.youtube.com/watch?v={}&feature=share',
+    '{}',
+)
+
+
+def write_history(path, lines, distinct_share, seed=23):
+    from video_ids import parse_video_id
+
+    rng = random.Random(seed)
+    pool = []
+    real_history = _support.REPO_DIR / 'downloaded_videos.txt'
+
+    if real_history.exists():
+        with open(real_history, 'r', encoding='utf-8') as f:
+            pool = list({video_id for video_id in map(parse_video_id, f) if video_id})
+
+    while len(pool) < max(1, int(lines * distinct_share)):
+        pool.append(''.join(rng.choices(ALPHABET, k=10)) + rng.choice('AEIMQUYcgkosw048'))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        chunk = []
+
+        for _ in range(lines):
+            chunk.append(rng.choice(URL_FORMS).format(rng.choice(pool)))
+
+            if len(chunk) == 100000:
+                f.write('\n'.join(chunk) + '\n')
+                chunk = []
+
+        if chunk:
+            f.write('\n'.join(chunk) + '\n')
+
+    return len(pool)
+
+
+def run_child(mode, history):
+    start = time.perf_counter()
+
+    if mode == 'set':
+        with open(history, 'r', encoding='utf-8') as f:
+            loaded = {line.strip() for line in f}
+        count = len(loaded)
+    elif mode == 'termux':
+        _support.install_fake_yt_dlp()
+        termux = _support.load_script('Termux Code/YT Downloader.py', 'termux_yt_downloader')
+        termux.downloaded_videos_file = history
+        loaded = termux.load_downloaded_videos()
+        count = len(loaded)
+    else:
+        from download_ledger import DownloadLedger
+
+        ledger = DownloadLedger(os.path.join(os.path.dirname(history), 'downloads.sqlite3'))
+        ledger.import_text_files([history])
+        loaded = ledger.done_ids()
+        count = len(loaded)
+        ledger.close()
+
+    print(json.dumps({
+        'seconds': time.perf_counter() - start,
+        'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'count': count,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=1_000_000)
+    parser.add_argument('--distinct-share', type=float, default=0.6, help="Distinct videos per line.")
+    parser.add_argument('--modes', nargs='+', default=['set', 'termux', 'ledger'])
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'HISTORY'), help=argparse.SUPPRESS)
+    parser.add_argument('--generate', metavar='PATH', help=argparse.SUPPRESS)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    if args.generate:
+        print(write_history(args.generate, args.lines, args.distinct_share))
+        return
+
+    folder = tempfile.mkdtemp(prefix='bench_load_history_')
+    history = os.path.join(folder, 'downloaded_videos.txt')
+    results = _support.Results('load_history', vars(args))
+    labels = {'set': 'plain set of lines', 'termux': 'load_downloaded_videos', 'ledger': 'ledger import'}
+
+    try:
+        start = time.perf_counter()
+        distinct = int(subprocess.run(
+            [
+                sys.executable, __file__, '--generate', history,
+                '--lines', str(args.lines),
+                '--distinct-share', str(args.distinct_share),
+            ],
+            stdout=subprocess.PIPE,
+            check=True,
+            text=True,
+        ).stdout)
+        print(f"{args.lines:,} lines ({os.path.getsize(history) / 1e6:,.0f} MB, up to {distinct:,} videos), "
+              f"written in {time.perf_counter() - start:.1f}s")
+
+        counts = {}
+
+        for mode in args.modes:
+            stats = json.loads(subprocess.run(
+                [sys.executable, __file__, '--child', mode, history],
+                stdout=subprocess.PIPE,
+                check=True,
+                text=True,
+            ).stdout)
+            counts[mode] = stats['count']
+
+            print(
+                f"  {labels[mode]:<24}: {stats['seconds']:6.2f}s, "
+                f"{results.add(f'{mode}_lines_per_second', args.lines / stats['seconds'], 'lines/s'):>9,.0f} lines/s, "
+                f"peak {results.add(f'{mode}_peak_mb', stats['peak_mb'], 'MB', False):5.0f} MB, "
+                f"{stats['count']:,} entries"
+            )
+            results.add(f'{mode}_seconds', stats['seconds'], 's', False)
+
+        # A plain set keeps each URL form of a video apart, so only the ID-based loaders must agree
+        id_counts = {count for mode, count in counts.items() if mode != 'set'}
+        results.check('loaders agree on the video count', len(id_counts) <= 1)
+        results.check('no more videos than the pool', all(count <= distinct for count in id_counts))
+        print(f"  check                   : {'ok' if results.passed else 'FAILED loaders disagree'}")
+    finally:
+        shutil.rmtree(folder)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
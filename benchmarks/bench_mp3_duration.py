@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Files/sec of the header-based MP3 duration scanner, cold and from the
+library index, versus one ffprobe per file (what pydub's mediainfo does for
+mp3 sortclean.py). Runs on generated MP3s: CBR with ID3v1/ID3v2 tags,
+VBR with a Xing header and VBR with a VBRI header, plus a check that every
+duration is within 1% of the true value.
+
+    python benchmarks/bench_mp3_duration.py --files 3000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+
+import _support
+from library_index import LibraryIndex
+from mp3_duration import ffprobe_duration, fill_durations
+
+
+SAMPLES_PER_FRAME = 1152
+SAMPLE_RATE = 44100
+
+# MPEG-1 Layer III bitrate indexes and their kbit/s
+BITRATE_INDEXES = {5: 64, 9: 128, 11: 192, 14: 320}
+
+
+def frame(bitrate_index, padding=0, payload=b''):
+    header = bytes([0xFF, 0xFB, (bitrate_index << 4) | (padding << 1), 0x00])
+    length = 144 * BITRATE_INDEXES[bitrate_index] * 1000 // SAMPLE_RATE + padding
+    body = payload.ljust(length - 4, b'\x00')
+    return header + body
+
+
+def id3v2_tag(size):
+    syncsafe = bytes((size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b'ID3\x03\x00\x00' + syncsafe + b'\x00' * size
+
+
+def make_file(path, kind, frames, rng):
+    """
+    Writes a synthetic MP3 and returns its true duration in seconds.
+    """
+
+    if kind == 'cbr':
+        index = rng.choice(list(BITRATE_INDEXES))
+        body = b''.join(frame(index) for _ in range(frames))
+        data = id3v2_tag(rng.randint(0, 4096)) + body + b'TAG' + b'\x00' * 125
+    else:
+        indexes = [rng.choice(list(BITRATE_INDEXES)) for _ in range(frames)]
+
+        if kind == 'xing':
+            # Side info for MPEG-1 stereo is 32 bytes; flags=1 means "frames follows".
+            info = b'\x00' * 32 + b'Xing' + struct.pack('>II', 1, frames)
+        else:
+            info = b'\x00' * 32 + b'VBRI' + struct.pack('>HHHII', 1, 0, 75, 0, frames)
+
+        data = id3v2_tag(1024) + frame(9, payload=info) + b''.join(frame(i) for i in indexes)
+
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    return frames * SAMPLES_PER_FRAME / SAMPLE_RATE
+
+
+def rate(count, seconds):
+    return f"{count / seconds:>10,.0f} files/s ({seconds:.2f}s)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=3000)
+    parser.add_argument('--frames', type=int, default=200, help="Frames per file (~26 ms each).")
+    parser.add_argument('--ffprobe-files', type=int, default=200, help="Files to time ffprobe on.")
+    parser.add_argument('--workers', type=int, default=None)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    results = _support.Results('mp3_duration', vars(args))
+
+    rng = random.Random(16)
+    folder = tempfile.mkdtemp(prefix='bench_mp3_duration_')
+
+    try:
+        expected = {}
+
+        for n in range(args.files):
+            kind = ('cbr', 'xing', 'vbri')[n % 3]
+            path = os.path.join(folder, f"{n:05d} {kind}.mp3")
+            expected[path] = make_file(path, kind, args.frames + rng.randint(0, 50), rng)
+
+        index = LibraryIndex(os.path.join(folder, 'library.sqlite3'))
+
+        start = time.perf_counter()
+        index.refresh(folder)
+        fill_durations(index, folder, args.workers)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index.refresh(folder)
+        fill_durations(index, folder, args.workers)
+        durations = {row['path']: row['duration'] for row in index.files(folder)}
+        warm = time.perf_counter() - start
+        index.close()
+
+        errors = [
+            abs(durations[path] - seconds) / seconds
+            for path, seconds in expected.items()
+        ]
+
+        print(f"{args.files} files")
+        print(f"  headers, cold index : {rate(args.files, cold)}")
+        print(f"  headers, warm index : {rate(args.files, warm)}")
+        results.add('cold_files_per_second', args.files / cold, 'files/s')
+        results.add('warm_files_per_second', args.files / warm, 'files/s')
+
+        if shutil.which('ffprobe'):
+            sample = list(expected)[:args.ffprobe_files]
+            start = time.perf_counter()
+
+            for path in sample:
+                ffprobe_duration(path)
+
+            seconds = time.perf_counter() - start
+            print(f"  ffprobe per file    : {rate(len(sample), seconds)}")
+            results.add('ffprobe_files_per_second', len(sample) / seconds, 'files/s')
+        else:
+            print("  ffprobe per file    : skipped (ffprobe not on PATH)")
+
+        print(f"  max duration error  : {results.add('max_duration_error', max(errors), 'ratio', False):.3%}")
+        results.check('durations within 1%', max(errors) <= 0.01)
+    finally:
+        shutil.rmtree(folder)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
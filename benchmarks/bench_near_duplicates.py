@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Near-duplicate grouping with the trigram index versus the old all-pairs
+SequenceMatcher scan from name similarity checker.py, on synthetic
+"Title [video ID].mp3" filenames with planted near-duplicates.
+
+    python benchmarks/bench_near_duplicates.py --names 10000 --legacy-names 1500
+
+The all-pairs scan only runs on the first --legacy-names names (it is
+quadratic); its time is extrapolated to the full set, and the groups it
+finds on that subset are used to measure the index's recall. Every planted
+variant normalizes to a different key than its original, so recall is
+measured on pairs the index actually has to find.
+"""
+
+import argparse
+import random
+import time
+from difflib import SequenceMatcher
+
+import _support
+from near_duplicates import UnionFind, find_similar_groups, normalize
+
+
+ID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+
+# Re-uploads and re-encodes: each one changes the normalized name
+VARIANTS = [
+    lambda name, rng: name + ' 1',
+    lambda name, rng: name + ' (2)',
+    lambda name, rng: name + ' 2024',
+    lambda name, rng: name + ' Live',
+    lambda name, rng: name[:-1],
+    lambda name, rng: 'Noha ' + name,
+    lambda name, rng: name.replace(' ', ' e ', 1),
+    lambda name, rng: name[:len(name) // 2] + rng.choice('aeiou') + name[len(name) // 2 + 1:],
+]
+
+
+def synthetic_names(count, duplicate_share, vocabulary=5000, seed=14):
+    # Words follow a Zipf distribution, like real titles, so some trigrams
+    # are in almost every name.
+    rng = random.Random(seed)
+    words = [
+        ''.join(rng.choices('aeioubcdfghjklmnprstvwyz', k=rng.randint(3, 9))).capitalize()
+        for _ in range(vocabulary)
+    ]
+    weights = [1 / rank for rank in range(1, vocabulary + 1)]
+    names = []
+
+    def tag():
+        return f" [{''.join(rng.choices(ID_ALPHABET, k=11))}]"
+
+    while len(names) < count:
+        name = ' '.join(rng.choices(words, weights, k=rng.randint(3, 8)))
+        names.append(name + tag() + '.mp3')
+
+        if rng.random() < duplicate_share:
+            variant = rng.choice(VARIANTS)(name, rng)
+
+            if normalize(variant) != normalize(name):
+                names.append(variant + tag() + rng.choice(['.mp3', '.opus', '.m4a']))
+
+    return names[:count]
+
+
+def legacy_groups(filenames):
+    # The old script's loop, kept verbatim apart from the file output.
+    filenames = sorted(filenames)
+    flagged_groups = []
+
+    for i in range(len(filenames)):
+        current_group = []
+        for j in range(i + 1, len(filenames)):
+            similarity = SequenceMatcher(None, filenames[i], filenames[j]).ratio()
+            if similarity >= 0.8:
+                if filenames[i] not in current_group:
+                    current_group.append(filenames[i])
+                if filenames[j] not in current_group:
+                    current_group.append(filenames[j])
+        if current_group and current_group not in flagged_groups:
+            flagged_groups.append(current_group)
+
+    return flagged_groups
+
+
+def exhaustive_groups(filenames, threshold):
+    # Same normalization and union-find as the index, but every pair compared.
+    filenames = sorted(set(filenames))
+    keys = [normalize(filename) for filename in filenames]
+    groups = UnionFind(len(filenames))
+
+    for i in range(len(keys)):
+        for j in range(i + 1, len(keys)):
+            if SequenceMatcher(None, keys[i], keys[j], autojunk=False).ratio() >= threshold:
+                groups.union(i, j)
+
+    members = {}
+
+    for i, filename in enumerate(filenames):
+        members.setdefault(groups.find(i), []).append(filename)
+
+    return [group for group in members.values() if len(group) > 1]
+
+
+def pair_set(groups):
+    return {
+        (a, b)
+        for group in groups
+        for a in group
+        for b in group
+        if a < b
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--names', type=int, default=10000)
+    parser.add_argument('--legacy-names', type=int, default=1500)
+    parser.add_argument('--duplicate-share', type=float, default=0.1)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--blocking-threshold', type=float, default=0.5)
+    parser.add_argument('--min-recall', type=float, default=0.95)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    results = _support.Results('near_duplicates', vars(args))
+    names = synthetic_names(args.names, args.duplicate_share)
+
+    start = time.perf_counter()
+    groups = find_similar_groups(names, args.threshold, args.blocking_threshold)
+    indexed = time.perf_counter() - start
+
+    print(f"trigram index : {len(names):>6} names in {results.add('index_seconds', indexed, 's', False):7.2f}s, "
+          f"{len(groups)} groups")
+
+    subset = names[:args.legacy_names]
+
+    start = time.perf_counter()
+    old = legacy_groups(subset)
+    legacy = time.perf_counter() - start
+    projected = legacy * (len(names) / len(subset)) ** 2
+
+    print(f"old script    : {len(subset):>6} names in {legacy:7.2f}s, {len(old)} (overlapping) groups")
+    print(f"old script    : ~{projected / 3600:.1f}h projected for {len(names)} names")
+    results.add('legacy_projected_seconds', projected, 's', False)
+
+    expected = pair_set(exhaustive_groups(subset, args.threshold))
+    found = pair_set(find_similar_groups(subset, args.threshold, args.blocking_threshold))
+    recall = len(found & expected) / len(expected) if expected else 1.0
+
+    print(f"recall vs all-pairs on {len(subset)} names: {results.add('recall', recall, 'ratio'):.1%} "
+          f"({len(found & expected)}/{len(expected)} pairs)")
+
+    results.check('all-pairs scan finds near-duplicates', bool(expected))
+    results.check(f'recall at least {args.min_recall:.0%}', recall >= args.min_recall)
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end throughput of inline postprocessing (ffmpeg runs on the
+download worker) versus the staged pipeline, against the offline fake
+yt-dlp.
+
+    python benchmarks/bench_pipeline.py --videos 48 --workers 4
+"""
+
+import argparse
+import logging
+import time
+
+import _support
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--videos', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=4, help="Download workers.")
+    parser.add_argument('--postprocess-workers', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--transfer-seconds', type=float, default=0.1)
+    parser.add_argument('--postprocess-seconds', type=float, default=0.15)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    results = _support.Results('pipeline', vars(args))
+
+    logging.basicConfig(level=logging.WARNING)
+
+    fake = _support.install_fake_yt_dlp()
+    fake.SETTINGS.update({
+        'transfer_seconds': args.transfer_seconds,
+        'postprocess_seconds': args.postprocess_seconds,
+    })
+
+    downloader = _support.load_script('YT Downloader v7.py')
+    from download_scheduler import DownloadScheduler, StagedPipeline
+
+    _, postprocessors = downloader.build_audio_options('mp3')
+    ydl_opts = {'quiet': True, 'postprocessors': postprocessors}
+    urls = [f"https://www.youtube.com/watch?v=fake{i:07d}" for i in range(args.videos)]
+
+    def inline():
+        scheduler = DownloadScheduler(
+            max_concurrent_downloads=args.workers,
+            max_concurrent_postprocessing=args.postprocess_workers,
+        )
+        sessions = downloader.YdlSessionPool({
+            **ydl_opts,
+            'postprocessor_hooks': [scheduler.postprocess_gate.hook],
+        })
+        return scheduler.run(urls, lambda url: downloader.download_video(url, sessions.get()))
+
+    def staged():
+        scheduler = DownloadScheduler(max_concurrent_downloads=args.workers)
+        fetch_sessions = downloader.YdlSessionPool({**ydl_opts, 'postprocessors': []})
+        postprocess_sessions = downloader.YdlSessionPool(ydl_opts)
+        pipeline = StagedPipeline(scheduler, args.postprocess_workers, args.queue_size)
+        return pipeline.run(
+            urls,
+            lambda url: downloader.fetch_video(url, fetch_sessions.get()),
+            lambda item: downloader.postprocess_video(item, postprocess_sessions)
+        )
+
+    print(f"{'mode':>8} {'videos':>7} {'seconds':>9} {'videos/s':>9}")
+
+    for mode, run in (('inline', inline), ('staged', staged)):
+        start = time.perf_counter()
+        done = run()
+        elapsed = time.perf_counter() - start
+        print(f"{mode:>8} {len(done):>7} {elapsed:>9.2f} {len(done) / elapsed:>9.2f}")
+        results.add(f'{mode}_videos_per_second', len(done) / elapsed, 'videos/s')
+        results.check(f'{mode} downloads every video', len(done) == args.videos)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Peak memory and throughput of remove_duplicates.py merging several large
+URL histories, versus the old set-of-every-line loop. Each variant runs in
+its own process so its peak RSS is its own.
+
+    python benchmarks/bench_remove_duplicates.py --lines 10000000
+
+The generated histories overlap the way several machines' downloaded_videos
+files do: mostly the same videos, written in different URL forms. They are
+generated in a child process too, since Linux carries a parent's peak RSS
+over into the children it starts.
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import _support
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+
+URL_FORMS = (
+    'https://www.youtube.com/watch?v={}',
+    'https://www.youtube.com/watch?v={}',
+    'https://youtu.be/{}',
+    'https://www.youtube.com/shorts/{}',
+    '{}',
+)
+
+
+def write_histories(folder, lines, files, distinct_share, seed=19):
+    rng = random.Random(seed)
+    pool = [
+        ''.join(rng.choices(ALPHABET, k=10)) + rng.choice('AEIMQUYcgkosw048')
+        for _ in range(max(1, int(lines * distinct_share)))
+    ]
+    paths = []
+
+    for n in range(files):
+        path = os.path.join(folder, f"downloaded_videos {n}.txt")
+        paths.append(path)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            chunk = []
+
+            for _ in range(lines // files):
+                chunk.append(rng.choice(URL_FORMS).format(rng.choice(pool)))
+
+                if len(chunk) == 100000:
+                    f.write('\n'.join(chunk) + '\n')
+                    chunk = []
+
+            if chunk:
+                f.write('\n'.join(chunk) + '\n')
+
+    return paths
+
+
+def legacy_remove_duplicates(input_files, output_file):
+    # The old loop, extended to several inputs by sharing one seen set.
+    seen = set()
+    lines_read = 0
+
+    with open(output_file, 'w') as out_file:
+        for input_file in input_files:
+            with open(input_file, 'r') as in_file:
+                for line in in_file:
+                    lines_read += 1
+                    if line.strip() not in seen:
+                        seen.add(line.strip())
+                        out_file.write(line)
+
+    return {'lines_read': lines_read, 'lines_written': len(seen)}
+
+
+def run_child(mode, max_keys, output, inputs):
+    start = time.perf_counter()
+
+    if mode == 'legacy':
+        stats = legacy_remove_duplicates(inputs, output)
+    else:
+        remove_duplicates = _support.load_script('remove_duplicates.py')
+        stats = remove_duplicates.remove_duplicates(inputs, output, max_keys=max_keys)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['peak_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=10_000_000)
+    parser.add_argument('--files', type=int, default=3)
+    parser.add_argument('--distinct-share', type=float, default=0.35, help="Distinct videos per line.")
+    parser.add_argument('--max-keys', type=int, default=1_000_000)
+    parser.add_argument('--child', nargs=4, metavar=('MODE', 'MAX_KEYS', 'OUTPUT', 'INPUTS'), help=argparse.SUPPRESS)
+    parser.add_argument('--generate', metavar='FOLDER', help=argparse.SUPPRESS)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, max_keys, output, inputs = args.child
+        run_child(mode, int(max_keys), output, json.loads(inputs))
+        return
+
+    if args.generate:
+        print(json.dumps(write_histories(args.generate, args.lines, args.files, args.distinct_share)))
+        return
+
+    folder = tempfile.mkdtemp(prefix='bench_remove_duplicates_')
+    results = _support.Results('remove_duplicates', vars(args))
+
+    try:
+        start = time.perf_counter()
+        inputs = json.loads(subprocess.run(
+            [
+                sys.executable, __file__, '--generate', folder,
+                '--lines', str(args.lines),
+                '--files', str(args.files),
+                '--distinct-share', str(args.distinct_share),
+            ],
+            stdout=subprocess.PIPE,
+            check=True,
+            text=True,
+        ).stdout)
+        size_mb = sum(os.path.getsize(path) for path in inputs) / 1e6
+        print(f"{args.lines:,} lines in {args.files} files ({size_mb:,.0f} MB), "
+              f"written in {time.perf_counter() - start:.1f}s")
+
+        # max_keys large enough for one in-memory pass, and the default
+        variants = [
+            ('old loop', 'legacy', 0, 'legacy'),
+            ('in memory', 'new', 10 ** 12, 'in_memory'),
+            (f'partitioned (max_keys={args.max_keys:,})', 'new', args.max_keys, 'partitioned'),
+        ]
+        outputs = {}
+
+        for label, mode, max_keys, key in variants:
+            output = os.path.join(folder, f"out {len(outputs)}.txt")
+            result = subprocess.run(
+                [sys.executable, __file__, '--child', mode, str(max_keys), output, json.dumps(inputs)],
+                stdout=subprocess.PIPE,
+                check=True,
+                text=True,
+            )
+            stats = json.loads(result.stdout)
+            outputs[label] = output
+
+            print(
+                f"  {label:<32}: {stats['seconds']:6.1f}s, "
+                f"{stats['lines_read'] / stats['seconds']:>9,.0f} lines/s, "
+                f"peak {stats['peak_mb']:6.0f} MB, {stats['lines_written']:,} lines kept"
+                + (f", {stats['partitions']} partitions" if 'partitions' in stats else "")
+            )
+            results.add(f'{key}_lines_per_second', stats['lines_read'] / stats['seconds'], 'lines/s')
+            results.add(f'{key}_peak_mb', stats['peak_mb'], 'MB', False)
+
+        in_memory, partitioned = list(outputs.values())[1:]
+        same = filecmp.cmp(in_memory, partitioned, shallow=False)
+        print(f"  in-memory and partitioned outputs identical: {same}")
+        results.check('in-memory and partitioned outputs identical', same)
+    finally:
+        shutil.rmtree(folder)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
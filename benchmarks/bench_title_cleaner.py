@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of the compiled single-pass title cleaner against the old
+one-regex-per-phrase clean_title, plus golden checks that YT Downloader v7
+and mp3 rename.py produce identical names.
+
+    python benchmarks/bench_title_cleaner.py
+    python benchmarks/bench_title_cleaner.py --listing-cache channel_listings.sqlite3
+    python benchmarks/bench_title_cleaner.py --titles titles.txt
+
+Without --titles or --listing-cache it reads the real titles from the
+downloader's channel_listings.sqlite3 next to the scripts, if there is one,
+and otherwise falls back to synthetic titles. Exits non-zero if any golden
+check fails.
+"""
+
+import argparse
+import random
+import re
+import sqlite3
+import sys
+import time
+
+import _support
+
+DEFAULT_LISTING_CACHE = _support.REPO_DIR / 'channel_listings.sqlite3'
+
+# (title, expected name) pairs covering every rule.
+GOLDEN = [
+    ('Ya Ali (as) Madad | Nadeem Sarwar', 'Ya Ali Madad Nadeem Sarwar'),
+    ('Imam Hussain (A.S.) Noha 2023', 'Imam Hussain Noha 2023'),
+    ('Bibi Fatima (sa)： New Manqabat', 'Bibi Fatima Manqabat'),
+    ('Rasool ﷺ ki Shan ｜ Naat', 'Rasool ki Shan Naat'),
+    ('Mola Abbas ⧸ Alamdar', 'Mola Abbas Alamdar'),
+    ('＂Labbaik＂ Ya Hussain', 'Labbaik Ya Hussain'),
+    ('علی ع مولا', 'علی مولا'),
+    ('حسین (ع) کربلا', 'حسین کربلا'),
+    ('Nabi s a w w ka Farman', 'Nabi ka Farman'),
+    ('Hindi नया गीत Title', 'Hindi Title'),
+    ('what? <now> * test', 'what now test'),
+    ('__.- Leading junk', 'Leading junk'),
+    ('Ya_Hussain_Noha', 'Ya Hussain Noha'),
+    ('Noha! by Mir, Hasan & Co.', 'Noha by Mir Hasan Co'),
+    ("Ya-Ali Madad (Vol. 2) 'Live'", 'Ya Ali Madad (Vol 2) Live'),
+    ('Ya Ali (as) Madad [a_b-c1234XY]', 'Ya Ali Madad [a_b-c1234XY]'),
+    ('(a.s.) [dQw4w9WgXcQ]', 'untitled [dQw4w9WgXcQ]'),
+    ('( ) ()', 'untitled'),
+    ('', 'untitled'),
+]
+
+WORDS = [
+    'Ya', 'Ali', 'Hussain', 'Abbas', 'Zainab', 'Noha', 'Manqabat', 'Majlis',
+    'Nadeem', 'Sarwar', 'Mir', 'Hasan', 'Official', 'Video', '2019', '2024',
+    'علی', 'حسین', 'مولا', 'کربلا', 'یا', 'زینب', 'نوحہ', 'नया', 'गीत',
+]
+
+DECORATIONS = [
+    '(as)', '(a.s)', '(A.S.)', '(sa)', 'ﷺ', ' ع ', '(ع)', '(س)', '｜', '|',
+    '⧸', '：', '＂', '?', '*', '-', 'New', 'NEW', 's a w w', '( )',
+]
+
+
+def synthetic_titles(count, seed=13):
+    rng = random.Random(seed)
+    titles = []
+
+    for _ in range(count):
+        parts = rng.choices(WORDS, k=rng.randint(3, 9))
+
+        for _ in range(rng.randint(0, 3)):
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(DECORATIONS))
+
+        titles.append(' '.join(parts))
+
+    return titles
+
+
+def load_titles(args):
+    # Returns (titles, where they came from)
+    if args.titles:
+        with open(args.titles, 'r', encoding='utf-8') as f:
+            return [line.rstrip('\n') for line in f if line.strip()], args.titles
+
+    listing_cache = args.listing_cache
+
+    if not listing_cache and DEFAULT_LISTING_CACHE.exists():
+        listing_cache = DEFAULT_LISTING_CACHE
+
+    if listing_cache:
+        conn = sqlite3.connect(listing_cache)
+        rows = conn.execute("SELECT title FROM entries WHERE title IS NOT NULL").fetchall()
+        conn.close()
+        return [row[0] for row in rows], str(listing_cache)
+
+    return synthetic_titles(args.count), 'synthetic'
+
+
+def legacy_clean_title(title, remove_phrases, extension='.mp3'):
+    # clean_title as it was before title_cleaner.py
+    for phrase in remove_phrases:
+        title = re.sub(re.escape(phrase), ' ', title, flags=re.IGNORECASE)
+
+    title = re.sub(r'[\\/:*?"<>|]', ' ', title)
+    title = re.sub(r'\s+', ' ', title).strip()
+
+    if not title:
+        title = 'untitled'
+
+    return title + extension
+
+
+def best_of(repeat, fn):
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--titles', help="Text file with one title per line.")
+    parser.add_argument('--listing-cache', help="Read titles from a channel listing cache database.")
+    parser.add_argument('--count', type=int, default=5000, help="Synthetic titles when no corpus is given.")
+    parser.add_argument('--repeat', type=int, default=5)
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    _support.install_fake_yt_dlp()
+    downloader = _support.load_script('YT Downloader v7.py')
+    renamer = _support.load_script('mp3 rename.py')
+    from title_cleaner import DEFAULT_REMOVE_PHRASES, clean_name
+
+    titles, source = load_titles(args)
+    results = _support.Results('title_cleaner', dict(vars(args), source=source))
+    phrases = list(DEFAULT_REMOVE_PHRASES)
+    failures = 0
+
+    for title, expected in GOLDEN:
+        got = clean_name(title)
+
+        if got != expected:
+            failures += 1
+            print(f"GOLDEN MISMATCH: {title!r} -> {got!r}, expected {expected!r}")
+
+    # An empty title would make ".mp3" a dotfile with no extension, so skip it.
+    for title in [title for title in titles + [t for t, _ in GOLDEN] if title]:
+        downloaded = downloader.clean_title(title, phrases)
+        renamed = ''.join(renamer.clean_filename(title + '.mp3'))
+
+        if downloaded != renamed:
+            failures += 1
+            print(f"SCRIPTS DISAGREE: {title!r}: {downloaded!r} vs {renamed!r}")
+
+    legacy = best_of(args.repeat, lambda: [legacy_clean_title(t, phrases) for t in titles])
+    compiled = best_of(args.repeat, lambda: [downloader.clean_title(t, phrases) for t in titles])
+
+    print(f"{len(titles)} titles ({source}), best of {args.repeat}")
+    print(f"  per-phrase re.sub : {legacy * 1000:8.1f} ms  "
+          f"({results.add('legacy_titles_per_second', len(titles) / legacy, 'titles/s'):,.0f} titles/s)")
+    print(f"  compiled one-pass : {compiled * 1000:8.1f} ms  "
+          f"({results.add('compiled_titles_per_second', len(titles) / compiled, 'titles/s'):,.0f} titles/s)")
+    print(f"  speedup           : {results.add('speedup', legacy / compiled, 'x'):8.1f}x")
+    print(f"Golden checks: {'OK' if not failures else f'{failures} failed'}")
+
+    results.check('golden names and scripts agree', not failures)
+    results.write(args.json)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
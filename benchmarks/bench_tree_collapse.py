@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+tree collapse.py's planner/executor versus the old walk-and-shutil.move
+loop, on a generated tree where some names collide (half of them with
+identical content). Checks that nothing nested is left behind, that every
+distinct content survives at the top level, and that --rollback restores
+the original tree byte for byte.
+
+    python benchmarks/bench_tree_collapse.py --files 20000
+    python benchmarks/bench_tree_collapse.py --simulate-cross-device
+
+--simulate-cross-device makes os.rename fail with EXDEV out of subfolders,
+so the old loop's shutil.move copies one file at a time and every move here
+goes through the threaded copy path.
+"""
+
+import argparse
+import errno
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import _support
+
+
+def build_tree(root, files, collision_share, seed=18):
+    rng = random.Random(seed)
+    names = []
+
+    for n in range(files):
+        folder = os.path.join(root, f"album {n % 97}", f"disc {n % 3}")
+        os.makedirs(folder, exist_ok=True)
+
+        if names and rng.random() < collision_share:
+            name, content = rng.choice(names)
+
+            if rng.random() < 0.5:
+                content = f"{content} other take".encode()
+        else:
+            name = f"track {n:06d}.mp3"
+            content = f"audio {n}".encode() * rng.randint(1, 64)
+            names.append((name, content))
+
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(content)
+
+
+def snapshot(root):
+    # {relative path: content digest}
+    listing = {}
+
+    for folder, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(folder, name)
+            with open(path, 'rb') as f:
+                listing[os.path.relpath(path, root)] = hashlib.blake2b(f.read()).hexdigest()
+
+    return listing
+
+
+def legacy_move_files(directory):
+    # The old script's loop.
+    for root, _, files in os.walk(directory):
+        for file in files:
+            src_file = os.path.join(root, file)
+            dest_file = os.path.join(directory, file)
+            if os.path.exists(dest_file):
+                pass
+            else:
+                shutil.move(src_file, dest_file)
+
+
+def simulate_cross_device(*trees):
+    # Renames out of any subfolder of the trees fail like a mount point would.
+    rename = os.rename
+
+    def cross_device_rename(src, dest, *args, **kwargs):
+        if any(str(src).startswith(tree) and os.path.dirname(str(src)) != tree for tree in trees):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return rename(src, dest, *args, **kwargs)
+
+    os.rename = cross_device_rename
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--collision-share', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--simulate-cross-device', action='store_true')
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    results = _support.Results('tree_collapse', vars(args))
+
+    tree_collapse = _support.load_script('tree collapse.py')
+    work = tempfile.mkdtemp(prefix='bench_tree_collapse_')
+
+    try:
+        legacy_tree = os.path.join(work, 'legacy')
+        tree = os.path.join(work, 'tree')
+        build_tree(legacy_tree, args.files, args.collision_share)
+        build_tree(tree, args.files, args.collision_share)
+        before = snapshot(tree)
+
+        if args.simulate_cross_device:
+            simulate_cross_device(legacy_tree, tree)
+
+        start = time.perf_counter()
+        legacy_move_files(legacy_tree)
+        legacy = time.perf_counter() - start
+        left_behind = sum(len(files) for folder, _, files in os.walk(legacy_tree) if folder != legacy_tree)
+
+        index = tree_collapse.LibraryIndex(os.path.join(work, 'library.sqlite3'))
+        journal = os.path.join(work, 'journal.jsonl')
+
+        start = time.perf_counter()
+        plan = tree_collapse.plan_moves(tree, index, args.workers)
+        planned = time.perf_counter() - start
+        outcomes = tree_collapse.execute_plan(plan, tree, index, journal, args.workers)
+        collapsed = time.perf_counter() - start
+        index.close()
+
+        after = snapshot(tree)
+        nested = [path for path in after if os.sep in path]
+        missing = set(before.values()) - set(after.values())
+
+        start = time.perf_counter()
+        restored = tree_collapse.rollback(journal)
+        undo = time.perf_counter() - start
+
+        print(f"{args.files} files, {args.collision_share:.0%} name collisions")
+        print(f"  old loop  : {legacy:7.2f}s, {left_behind} files left in subfolders")
+        print(f"  plan      : {planned:7.2f}s")
+        print(f"  collapse  : {collapsed:7.2f}s total, {dict(sorted(outcomes.items()))}")
+        print(f"  rollback  : {undo:7.2f}s, {restored} files restored")
+        results.add('legacy_seconds', legacy, 's', False)
+        results.add('plan_seconds', planned, 's', False)
+        results.add('collapse_seconds', collapsed, 's', False)
+        results.add('rollback_seconds', undo, 's', False)
+        results.add('collapse_files_per_second', args.files / collapsed, 'files/s')
+
+        problems = []
+        if nested:
+            problems.append(f"{len(nested)} files still nested")
+        if missing:
+            problems.append(f"{len(missing)} distinct contents lost")
+        restored_tree = snapshot(tree) == before
+        if not restored_tree:
+            problems.append("rollback did not restore the original tree")
+
+        print(f"  check     : {'; '.join(problems) or 'ok'}")
+        results.check('nothing left nested', not nested)
+        results.check('every distinct content kept', not missing)
+        results.check('rollback restores the tree', restored_tree)
+    finally:
+        shutil.rmtree(work)
+
+    results.write(args.json)
+
+    if not results.passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-video overhead before the first byte: a fresh YoutubeDL per URL (the
+old download_video) versus a reused YdlSession.
+
+    python benchmarks/bench_ydl_session.py                 # offline fake
+    python benchmarks/bench_ydl_session.py --real URL ...  # real yt-dlp
+"""
+
+import argparse
+import statistics
+import time
+
+import _support
+
+
+def time_to_first_byte(download, first_byte_error):
+    start = time.perf_counter()
+
+    try:
+        download()
+    except first_byte_error:
+        pass
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--real', nargs='+', metavar='URL', help="Use real yt-dlp against these URLs.")
+    parser.add_argument('--videos', type=int, default=20, help="Number of fake videos.")
+    parser.add_argument('--cookies-from-browser', default='firefox')
+    _support.add_json_argument(parser)
+    args = parser.parse_args()
+
+    results = _support.Results('ydl_session', dict(vars(args), offline=not args.real))
+
+    if args.real:
+        urls = args.real
+    else:
+        _support.install_fake_yt_dlp()
+        urls = [f"https://www.youtube.com/watch?v=fake{i:07d}" for i in range(args.videos)]
+
+    downloader = _support.load_script('YT Downloader v7.py')
+    from yt_dlp import YoutubeDL
+    from yt_dlp.utils import DownloadError
+
+    # A DownloadError subclass, so YdlSession treats it as an ordinary
+    # per-video failure and keeps its YoutubeDL.
+    class FirstByte(DownloadError):
+        pass
+
+    def stop_at_first_byte(d):
+        if d.get('status') == 'downloading':
+            raise FirstByte('first byte')
+
+    ydl_opts = {
+        **downloader.build_common_ydl_opts(cookies_from_browser=args.cookies_from_browser),
+        'format': 'bestaudio/best',
+        'quiet': True,
+        'progress_hooks': [stop_at_first_byte],
+        'outtmpl': '/tmp/bench_ydl_session/%(id)s.%(ext)s',
+        'continuedl': False,
+    }
+
+    def fresh(url):
+        with YoutubeDL(ydl_opts) as ydl:
+            ydl.download([url])
+
+    session = downloader.YdlSession(ydl_opts, max_consecutive_failures=len(urls) + 1)
+
+    timings_by_mode = {}
+
+    for mode, download in (('fresh', fresh), ('session', session.download)):
+        timings_by_mode[mode] = [
+            time_to_first_byte(lambda: download(url), FirstByte)
+            for url in urls
+        ]
+
+    session.close()
+
+    print(f"{'mode':>8} {'videos':>7} {'mean ms':>9} {'median ms':>10} {'first ms':>9}")
+
+    for mode, timings in timings_by_mode.items():
+        print(
+            f"{mode:>8} {len(timings):>7} "
+            f"{results.add(f'{mode}_mean_seconds', statistics.mean(timings), 's', False) * 1000:>9.1f} "
+            f"{results.add(f'{mode}_median_seconds', statistics.median(timings), 's', False) * 1000:>10.1f} "
+            f"{timings[0] * 1000:>9.1f}"
+        )
+
+    results.write(args.json)
+
+
+if __name__ == "__main__":
+    main()
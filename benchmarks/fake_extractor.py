@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import time
+
+
+class FakeExtractor:
+    """
+    Offline stand-in for a yt-dlp download: sleeps for extraction latency and
+    transfer time, then runs a simulated ffmpeg step through the same
+    `postprocessor_hooks` protocol yt-dlp uses. Sleeping models ffmpeg well
+    enough because the real work happens in a subprocess, outside the GIL.
+    """
+
+    def __init__(
+        self,
+        extract_latency=0.05,
+        size_bytes=4_000_000,
+        bandwidth=40_000_000,
+        postprocess_seconds=0.1,
+        jitter=0.2,
+        seed=0,
+    ):
+        self.extract_latency = extract_latency
+        self.size_bytes = size_bytes
+        self.bandwidth = bandwidth
+        self.postprocess_seconds = postprocess_seconds
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def _vary(self, seconds):
+        return seconds * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+    def download(self, url, postprocessor_hooks=()):
+        time.sleep(self._vary(self.extract_latency))
+        time.sleep(self._vary(self.size_bytes / self.bandwidth))
+
+        for hook in postprocessor_hooks:
+            hook({'status': 'started', 'postprocessor': 'FakeExtractAudio'})
+
+        time.sleep(self._vary(self.postprocess_seconds))
+
+        for hook in postprocessor_hooks:
+            hook({'status': 'finished', 'postprocessor': 'FakeExtractAudio'})
+
+        return True
@@ -0,0 +1,228 @@
+"""
+Offline stand-in for the parts of the yt_dlp API the scripts in this repo
+use. It never touches the network: channel listings are synthetic and
+every cost (extractor set-up, cookie decryption, extraction, transfer,
+ffmpeg) is a configurable sleep in SETTINGS.
+
+With an `outtmpl` in the options, downloads write a small media file there
+and FFmpegExtractAudio turns it into a real (silent, CBR) MP3 of
+`audio_seconds`, so renaming, indexing and duration scanning have files to
+work on.
+
+Install with _support.install_fake_yt_dlp() before loading a script.
+"""
+
+import hashlib
+import os
+import re
+import time
+
+from .utils import DownloadError
+
+
+SETTINGS = {
+    # YoutubeDL() construction: extractor registry, option parsing
+    'init_seconds': 0.03,
+    # First cookiejar access with cookiesfrombrowser (profile decryption)
+    'cookie_seconds': 0.15,
+    # Per-video webpage + player extraction
+    'extract_seconds': 0.05,
+    # Per page of a channel listing, and entries per page
+    'page_seconds': 0.02,
+    'page_size': 30,
+    # Entries in every synthetic channel
+    'channel_size': 1000,
+    'transfer_seconds': 0.0,
+    # Only FFmpegExtractAudio costs time; tagging/embedding are cheap
+    'postprocess_seconds': 0.0,
+    # Video IDs whose download fails with DownloadError; a dict maps each
+    # to the error message to fail with
+    'fail_ids': set(),
+    # Size of a downloaded media file, and length of the MP3 made from it
+    'file_bytes': 64 * 1024,
+    'audio_seconds': 5,
+}
+
+ID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+ID_LAST = 'AEIMQUYcgkosw048'
+
+# One 128 kbit/s, 44.1 kHz MPEG-1 Layer III frame (1152 samples) of silence
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x00]) + b'\x00' * 413
+MP3_FRAME_SECONDS = 1152 / 44100
+
+
+def fake_video_id(channel, index):
+    """
+    Deterministic, valid-looking 11-character ID for entry `index` of
+    `channel`.
+    """
+
+    digest = hashlib.blake2b(f"{channel}#{index}".encode('utf-8'), digest_size=8).digest()
+    value = int.from_bytes(digest, 'big')
+    chars = [ID_LAST[value & 15]]
+    value >>= 4
+
+    for _ in range(10):
+        chars.append(ID_ALPHABET[value & 63])
+        value >>= 6
+
+    return ''.join(reversed(chars))
+
+
+def video_title(video_id):
+    # Decorated like real titles, so the title cleaner has work to do
+    return f"Synthetic Noha {video_id} (as) | Official Video"
+
+
+def synthetic_mp3(seconds):
+    return b'ID3\x03\x00\x00\x00\x00\x00\x00' + MP3_FRAME * max(1, round(seconds / MP3_FRAME_SECONDS))
+
+
+def channel_entries(url):
+    size = SETTINGS['channel_size']
+    page_size = SETTINGS['page_size']
+
+    for index in range(size):
+        if index % page_size == 0:
+            time.sleep(SETTINGS['page_seconds'])
+
+        video_id = fake_video_id(url, size - index)
+        yield {
+            '_type': 'url',
+            'ie_key': 'Youtube',
+            'id': video_id,
+            'url': f"https://www.youtube.com/watch?v={video_id}",
+            'title': f"Synthetic title {size - index} of {url}",
+            'duration': 60 + (index * 37) % 3000,
+        }
+
+
+class YoutubeDL:
+    def __init__(self, params=None):
+        time.sleep(SETTINGS['init_seconds'])
+        self.params = params or {}
+        self._download_retcode = 0
+        self._post_hooks = []
+        self._cookiejar = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    @property
+    def cookiejar(self):
+        if self._cookiejar is None:
+            if self.params.get('cookiesfrombrowser'):
+                time.sleep(SETTINGS['cookie_seconds'])
+
+            self._cookiejar = {}
+
+        return self._cookiejar
+
+    def add_post_hook(self, hook):
+        self._post_hooks.append(hook)
+
+    def extract_info(self, url, download=True, process=True):
+        self.cookiejar
+
+        if 'watch?v=' in url:
+            if download:
+                info = self._process(url)
+                return {**info, 'requested_downloads': [info]}
+
+            time.sleep(SETTINGS['extract_seconds'])
+            video_id = url.split('watch?v=', 1)[1][:11]
+            return {'_type': 'video', 'id': video_id, 'title': video_id}
+
+        entries = channel_entries(url)
+
+        return {
+            '_type': 'playlist',
+            'id': url,
+            'title': url,
+            'entries': entries if not process else list(entries),
+        }
+
+    def _hooks(self, key):
+        return self.params.get(key) or []
+
+    def _fetch(self, url):
+        self.cookiejar
+        time.sleep(SETTINGS['extract_seconds'])
+        video_id = url.split('watch?v=', 1)[-1][:11]
+
+        if video_id in SETTINGS['fail_ids']:
+            fail_ids = SETTINGS['fail_ids']
+            message = fail_ids[video_id] if isinstance(fail_ids, dict) else "Video unavailable"
+            self._download_retcode = 1
+            raise DownloadError(f"ERROR: [youtube] {video_id}: {message}")
+
+        info = {
+            'id': video_id,
+            'title': video_title(video_id),
+            'filepath': f"{video_id}.webm",
+            'thumbnails': [],
+        }
+        outtmpl = self.params.get('outtmpl')
+
+        if isinstance(outtmpl, str):
+            # Path separators and other characters yt-dlp's windowsfilenames replaces
+            safe_title = re.sub(r'[\\/:*?"<>|]', '_', info['title'])
+            info['filepath'] = outtmpl % {'title': safe_title, 'id': video_id, 'ext': 'webm'}
+            os.makedirs(os.path.dirname(info['filepath']) or '.', exist_ok=True)
+
+            with open(info['filepath'], 'wb') as f:
+                f.write(os.urandom(16) * (SETTINGS['file_bytes'] // 16))
+
+        for hook in self._hooks('progress_hooks'):
+            hook({'status': 'downloading', 'filename': info['filepath'], 'downloaded_bytes': 1, 'info_dict': info})
+
+        time.sleep(SETTINGS['transfer_seconds'])
+
+        for hook in self._hooks('progress_hooks'):
+            hook({'status': 'finished', 'filename': info['filepath'], 'total_bytes': SETTINGS['file_bytes'], 'info_dict': info})
+
+        return info
+
+    def post_process(self, filename, info, files_to_move=None):
+        info = {**info, 'filepath': filename}
+
+        for pp in self.params.get('postprocessors') or []:
+            for hook in self._hooks('postprocessor_hooks'):
+                hook({'status': 'started', 'postprocessor': pp['key'], 'info_dict': info})
+
+            if pp['key'] == 'FFmpegExtractAudio':
+                time.sleep(SETTINGS['postprocess_seconds'])
+                source = info['filepath']
+                info['filepath'] = source.rsplit('.', 1)[0] + '.mp3'
+
+                if os.path.exists(source):
+                    with open(info['filepath'], 'wb') as f:
+                        f.write(synthetic_mp3(SETTINGS['audio_seconds']))
+
+                    os.remove(source)
+
+            for hook in self._hooks('postprocessor_hooks'):
+                hook({'status': 'finished', 'postprocessor': pp['key'], 'info_dict': info})
+
+        return info
+
+    def _process(self, url):
+        info = self._fetch(url)
+        info = self.post_process(info['filepath'], info)
+
+        for hook in self._post_hooks:
+            hook(info['filepath'])
+
+        return info
+
+    def download(self, urls):
+        for url in urls:
+            self._process(url)
+
+        return self._download_retcode
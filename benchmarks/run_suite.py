@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Runs every benchmark offline and collects their results into one JSON file,
+optionally comparing it with an earlier run to catch regressions.
+
+    python benchmarks/run_suite.py
+    python benchmarks/run_suite.py --quick --only title_cleaner pipeline
+    python benchmarks/run_suite.py --baseline benchmarks/results/old.json
+
+Each benchmark runs in its own process with --json. Results go to
+benchmarks/results/<timestamp>.json unless --output says otherwise. With
+--baseline, any measurement more than --tolerance worse than the baseline's,
+any failed check, or any benchmark that failed to run makes the exit
+status 1.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import _support
+
+RESULTS_DIR = _support.BENCH_DIR / 'results'
+
+# (name, script, arguments, arguments with --quick)
+SUITE = [
+    ('downloader_e2e', 'bench_downloader_e2e.py', [], ['--channel-size', '8']),
+    ('expand_channels', 'bench_expand_channels.py', [], ['--entries', '2000', '--channels', '2']),
+    ('title_cleaner', 'bench_title_cleaner.py', [], ['--repeat', '2']),
+    ('load_history', 'bench_load_history.py', [], ['--lines', '100000']),
+    ('near_duplicates', 'bench_near_duplicates.py', ['--legacy-names', '600'],
+     ['--names', '2000', '--legacy-names', '300']),
+    ('mp3_duration', 'bench_mp3_duration.py', [], ['--files', '300']),
+    ('pipeline', 'bench_pipeline.py', [], ['--videos', '8']),
+    ('download_scheduler', 'bench_download_scheduler.py', [], ['--videos', '8', '--workers', '1', '4']),
+    ('ydl_session', 'bench_ydl_session.py', [], ['--videos', '5']),
+    ('remove_duplicates', 'bench_remove_duplicates.py', ['--lines', '2000000'], ['--lines', '200000']),
+    ('tree_collapse', 'bench_tree_collapse.py', [], ['--files', '2000']),
+    ('gallery_downloader', 'bench_gallery_downloader.py', [], ['--galleries', '16']),
+]
+
+# Benchmarks that need an optional package, and the package
+REQUIRES = {
+    'gallery_downloader': 'gallery_dl',
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=_support.REPO_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(script, arguments):
+    """
+    Runs one benchmark and returns its entry for the suite's results.
+    """
+
+    fd, json_path = tempfile.mkstemp(prefix='bench_', suffix='.json')
+    os.close(fd)
+    start = time.perf_counter()
+
+    try:
+        process = subprocess.run(
+            [sys.executable, str(_support.BENCH_DIR / script), *arguments, '--json', json_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        wall_seconds = time.perf_counter() - start
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        results = json.loads(text) if text.strip() else None
+    finally:
+        os.remove(json_path)
+
+    return {
+        'script': script,
+        'arguments': arguments,
+        'returncode': process.returncode,
+        'wall_seconds': wall_seconds,
+        'results': results,
+        'output': process.stdout,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """
+    Returns one line per measurement that got more than `tolerance` worse
+    than in the baseline suite results.
+    """
+
+    regressions = []
+
+    for name, entry in current['benchmarks'].items():
+        old_entry = baseline.get('benchmarks', {}).get(name)
+
+        if not entry.get('results') or not old_entry or not old_entry.get('results'):
+            continue
+
+        old_metrics = old_entry['results']['metrics']
+
+        for metric, measured in entry['results']['metrics'].items():
+            old = old_metrics.get(metric)
+
+            if not old or not old['value']:
+                continue
+
+            change = measured['value'] / old['value'] - 1
+
+            if measured['higher_is_better'] and change < -tolerance or \
+                    not measured['higher_is_better'] and change > tolerance:
+                regressions.append(
+                    f"{name}.{metric}: {old['value']:.4g} -> {measured['value']:.4g} "
+                    f"{measured['unit']} ({change:+.1%})"
+                )
+
+    return regressions
+
+
+def main():
+    names = [name for name, _, _, _ in SUITE]
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=names, metavar='NAME', help=f"Run only these: {', '.join(names)}.")
+    parser.add_argument('--quick', action='store_true', help="Smaller inputs, for a quick smoke run.")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<timestamp>.json).")
+    parser.add_argument('--baseline', help="Earlier results file to compare with.")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed slowdown against the baseline.")
+    args = parser.parse_args()
+
+    suite = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'quick': args.quick,
+        'benchmarks': {},
+        'skipped': {},
+    }
+    problems = []
+
+    for name, script, arguments, quick_arguments in SUITE:
+        if args.only and name not in args.only:
+            continue
+
+        required = REQUIRES.get(name)
+
+        if required and importlib.util.find_spec(required) is None:
+            suite['skipped'][name] = f"{required} is not installed"
+            print(f"{name:<20} skipped ({required} is not installed)")
+            continue
+
+        print(f"{name:<20} ", end='', flush=True)
+        entry = run_benchmark(script, quick_arguments if args.quick else arguments)
+        suite['benchmarks'][name] = entry
+        results = entry['results']
+
+        if entry['returncode'] or not results:
+            problems.append(f"{name} exited with {entry['returncode']}")
+            print(f"FAILED ({entry['wall_seconds']:.1f}s)")
+            print(entry['output'].rstrip())
+            continue
+
+        failed_checks = [check for check, passed in results['checks'].items() if not passed]
+        problems.extend(f"{name}: check failed: {check}" for check in failed_checks)
+        print(f"{'ok' if not failed_checks else 'CHECKS FAILED'} ({entry['wall_seconds']:.1f}s, "
+              f"{len(results['metrics'])} measurements)")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        regressions = compare(suite, baseline, args.tolerance)
+        suite['baseline'] = {'path': args.baseline, 'commit': baseline.get('commit'), 'regressions': regressions}
+        problems.extend(f"regression: {line}" for line in regressions)
+        print(f"Against {args.baseline} (tolerance {args.tolerance:.0%}): "
+              f"{len(regressions)} regression{'s' if len(regressions) != 1 else ''}")
+
+    output = args.output
+
+    if not output:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(suite, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+    for problem in problems:
+        print(problem)
+
+    print(f"Results written to {output}")
+
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite download ledger for YT Downloader v7, keyed by YouTube video ID.
+
+    python download_ledger.py import downloaded_videos.txt "downloaded_videos copy.txt"
+    python download_ledger.py export downloaded_videos.txt
+    python download_ledger.py stats
+    python download_ledger.py retry --permanent
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from video_ids import VideoIdSet, parse_video_id, video_url
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_LEDGER_FILE = SCRIPT_DIR / 'downloads.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id   TEXT PRIMARY KEY,
+    url        TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    duration   REAL,
+    file_path  TEXT,
+    error      TEXT,
+    first_seen REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    failure_kind TEXT,
+    retry_at   REAL,
+    transient_failures INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS videos_by_status ON videos (status);
+
+CREATE TABLE IF NOT EXISTS run_queue (
+    position INTEGER PRIMARY KEY,
+    url      TEXT NOT NULL UNIQUE
+);
+"""
+
+# Columns added since the first version of the schema, for older ledgers
+ADDED_COLUMNS = {
+    'failure_kind': 'TEXT',
+    'retry_at': 'REAL',
+    'transient_failures': 'INTEGER NOT NULL DEFAULT 0',
+}
+
+
+class DownloadLedger:
+    """
+    One row per video: status ('downloaded', 'failed', or 'skipped' with
+    the reason in `error`), attempt count, how long the last attempt took
+    and where the file ended up. Failed rows also say what kind of failure
+    it was (see retry_policy.py) and when the video may be tried again; a
+    NULL retry_at on a permanent failure means never. `transient_failures`
+    counts the failures in a row that weren't rate limiting, which is what
+    the retry policy gives up on.
+
+    Every write is its own fsync'd transaction in WAL mode, so a run killed
+    halfway keeps everything it finished. The same database holds the
+    current run's work queue; each outcome is recorded and dequeued in one
+    transaction, so whatever is left in the queue after a crash is exactly
+    what still needs doing. Safe to share between download threads.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(videos)")}
+
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE videos ADD COLUMN {column} {column_type}")
+
+        if 'transient_failures' not in columns:
+            # Older ledgers didn't tell rate limiting apart; count every failure
+            self._conn.execute("UPDATE videos SET transient_failures = attempts WHERE status = 'failed'")
+
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM videos LIMIT 1").fetchone() is None
+
+    def ids_with_status(self, status):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM videos WHERE status = ?",
+                (status,)
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+    def downloaded_ids(self):
+        """
+        Returns a VideoIdSet, which keeps a large history compact in memory.
+        """
+
+        return VideoIdSet(self.ids_with_status('downloaded'))
+
+    def done_ids(self):
+        """
+        Downloaded, skipped and permanently failed IDs: everything that
+        should never be queued again.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM videos WHERE status IN ('downloaded', 'skipped') "
+                "OR (status = 'failed' AND failure_kind = 'permanent')"
+            ).fetchall()
+
+        return VideoIdSet(row[0] for row in rows)
+
+    def backoff_ids(self, now=None):
+        """
+        Failed IDs still waiting out their backoff: not to be queued yet.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM videos WHERE status = 'failed' AND retry_at > ?",
+                (now or time.time(),)
+            ).fetchall()
+
+        return VideoIdSet(row[0] for row in rows)
+
+    def failed_attempts(self, video_id):
+        """
+        How many times this video has failed so far. Only failed videos are
+        ever queued again, so these are failures in a row.
+        """
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM videos WHERE video_id = ? AND status = 'failed'",
+                (video_id,)
+            ).fetchone()
+
+        return row[0] if row else 0
+
+    def transient_failures(self, video_id):
+        """
+        How many times in a row this video has failed other than by rate
+        limiting, which says nothing about the video itself.
+        """
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT transient_failures FROM videos WHERE video_id = ? AND status = 'failed'",
+                (video_id,)
+            ).fetchone()
+
+        return row[0] if row else 0
+
+    def failure_counts(self):
+        """
+        Failed rows by failure kind ('unknown' for rows from older versions).
+        """
+
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT COALESCE(failure_kind, 'unknown'), COUNT(*) FROM videos "
+                "WHERE status = 'failed' GROUP BY 1"
+            ).fetchall())
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM videos GROUP BY status"
+            ).fetchall())
+
+    def _record(self, video_id, url, status, duration=None, file_path=None, error=None,
+                failure_kind=None, retry_at=None):
+        now = time.time()
+        transient = int(status == 'failed' and failure_kind != 'rate_limited')
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO videos "
+                "(video_id, url, status, attempts, duration, file_path, error, first_seen, updated_at, "
+                "failure_kind, retry_at, transient_failures) "
+                "VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET "
+                "url = excluded.url, "
+                "status = excluded.status, "
+                "attempts = videos.attempts + 1, "
+                "duration = excluded.duration, "
+                "file_path = COALESCE(excluded.file_path, videos.file_path), "
+                "error = excluded.error, "
+                "updated_at = excluded.updated_at, "
+                "failure_kind = excluded.failure_kind, "
+                "retry_at = excluded.retry_at, "
+                "transient_failures = CASE WHEN excluded.status = 'failed' "
+                "THEN videos.transient_failures + excluded.transient_failures ELSE 0 END",
+                (video_id, url, status, duration, file_path, error, now, now, failure_kind, retry_at, transient)
+            )
+            self._conn.execute("DELETE FROM run_queue WHERE url = ?", (url,))
+
+    def record_success(self, video_id, url, duration=None, file_path=None):
+        self._record(video_id, url, 'downloaded', duration, file_path)
+
+    def record_failure(self, video_id, url, duration=None, error=None, failure_kind=None, retry_at=None):
+        self._record(video_id, url, 'failed', duration, error=error, failure_kind=failure_kind, retry_at=retry_at)
+
+    def clear_failures(self, video_ids=None, permanent_only=False):
+        """
+        Makes failed videos eligible again on the next run (all of them, or
+        just `video_ids`), with their backoff starting over, e.g. after
+        members-only videos went public. Returns how many rows changed.
+        """
+
+        query = (
+            "UPDATE videos SET attempts = 0, transient_failures = 0, failure_kind = NULL, retry_at = NULL "
+            "WHERE status = 'failed'"
+        )
+
+        if permanent_only:
+            query += " AND failure_kind = 'permanent'"
+
+        with self._lock, self._conn:
+            if video_ids is None:
+                return self._conn.execute(query).rowcount
+
+            return sum(
+                self._conn.execute(query + " AND video_id = ?", (video_id,)).rowcount
+                for video_id in video_ids
+            )
+
+    def downloaded_files(self):
+        """
+        Returns (video_id, file_path) for downloads with a known file.
+        """
+
+        with self._lock:
+            return self._conn.execute(
+                "SELECT video_id, file_path FROM videos "
+                "WHERE status = 'downloaded' AND file_path IS NOT NULL"
+            ).fetchall()
+
+    def set_file_path(self, video_id, file_path):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE videos SET file_path = ?, updated_at = ? WHERE video_id = ?",
+                (str(file_path), time.time(), video_id)
+            )
+
+    def record_skipped(self, skipped):
+        """
+        Records (video_id, url, reason) tuples for videos filtered out before
+        download, in one transaction.
+        """
+
+        now = time.time()
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO videos "
+                "(video_id, url, status, attempts, error, first_seen, updated_at) "
+                "VALUES (?, ?, 'skipped', 0, ?, ?, ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET "
+                "status = 'skipped', "
+                "error = excluded.error, "
+                "updated_at = excluded.updated_at",
+                [(video_id, url, reason, now, now) for video_id, url, reason in skipped]
+            )
+            self._conn.executemany(
+                "DELETE FROM run_queue WHERE url = ?",
+                [(url,) for _, url, _ in skipped]
+            )
+
+    def save_queue(self, urls):
+        """
+        Replaces the on-disk work queue with `urls`, in order.
+        """
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM run_queue")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO run_queue (url) VALUES (?)",
+                [(url,) for url in urls]
+            )
+
+    def pending_queue(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM run_queue ORDER BY position"
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+    def dequeue(self, url):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM run_queue WHERE url = ?", (url,))
+
+    def clear_queue(self):
+        self.save_queue([])
+
+    def import_text_files(self, paths):
+        """
+        Merges one-URL-per-line history files into the ledger as downloaded.
+        Duplicates across and within files collapse onto one row. Returns
+        (lines_read, rows_added).
+        """
+
+        now = time.time()
+        lines_read = 0
+        rows = {}
+
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    url = line.strip()
+
+                    if not url:
+                        continue
+
+                    lines_read += 1
+                    video_id = parse_video_id(url)
+
+                    if video_id and video_id not in rows:
+                        rows[video_id] = video_url(video_id)
+
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO videos "
+                "(video_id, url, status, attempts, first_seen, updated_at) "
+                "VALUES (?, ?, 'downloaded', 1, ?, ?)",
+                [(video_id, url, now, now) for video_id, url in rows.items()]
+            )
+            added = self._conn.total_changes - before
+
+        return lines_read, added
+
+    def export_text_file(self, path):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM videos WHERE status = 'downloaded' ORDER BY first_seen, rowid"
+            ).fetchall()
+
+        with open(path, 'w', encoding='utf-8') as f:
+            for (url,) in rows:
+                f.write(url + '\n')
+
+        return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the YT Downloader v7 download ledger.")
+    parser.add_argument('--ledger', default=str(DEFAULT_LEDGER_FILE), help="Ledger database path.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Merge and dedup text history files into the ledger.")
+    import_parser.add_argument('files', nargs='+')
+
+    export_parser = commands.add_parser('export', help="Write downloaded URLs to a text file.")
+    export_parser.add_argument('file')
+
+    commands.add_parser('stats', help="Show row counts by status.")
+
+    retry_parser = commands.add_parser('retry', help="Let failed videos be downloaded again on the next run.")
+    retry_parser.add_argument('video_ids', nargs='*', help="Video IDs or URLs (default: every failed video).")
+    retry_parser.add_argument('--permanent', action='store_true', help="Only videos given up on as permanent.")
+
+    args = parser.parse_args()
+    ledger = DownloadLedger(args.ledger)
+
+    try:
+        if args.command == 'import':
+            lines_read, added = ledger.import_text_files(args.files)
+            print(f"Read {lines_read} lines from {len(args.files)} file(s); added {added} new videos.")
+        elif args.command == 'export':
+            count = ledger.export_text_file(args.file)
+            print(f"Wrote {count} URLs to {args.file}")
+        elif args.command == 'retry':
+            video_ids = [parse_video_id(value) or value for value in args.video_ids] or None
+            count = ledger.clear_failures(video_ids, permanent_only=args.permanent)
+            print(f"{count} failed videos will be tried again on the next run.")
+        else:
+            for status, count in sorted(ledger.counts().items()):
+                print(f"{status}: {count}")
+
+            for kind, count in sorted(ledger.failure_counts().items()):
+                print(f"  failed ({kind}): {count}")
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding at most
+    `capacity` tokens. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def host_key(url):
+    """
+    Groups URLs by site so youtu.be, m.youtube.com and www.youtube.com
+    share one bucket.
+    """
+
+    host = (urlparse(url).hostname or '').lower()
+
+    if host == 'youtu.be':
+        return 'youtube.com'
+
+    parts = host.split('.')
+
+    return '.'.join(parts[-2:]) if len(parts) >= 2 else host
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host. A rate of 0 or None disables limiting.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        if not self.rate:
+            return
+
+        key = host_key(url)
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[key] = bucket
+
+        bucket.acquire()
+
+
+class AdaptiveThrottle:
+    """
+    Slows the whole run down when the site starts throttling (HTTP 429 or
+    a bot check): each rate-limited failure halves how many downloads may
+    run at once and pauses new ones for a cooldown that doubles (with
+    jitter) while 429s keep coming. Concurrency grows back one slot per
+    `recover_after` successful downloads.
+    """
+
+    def __init__(self, limit, cooldown=30, max_cooldown=600, recover_after=10):
+        self.max_limit = max(1, int(limit))
+        self.limit = self.max_limit
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.recover_after = max(1, int(recover_after))
+        self._active = 0
+        self._resume_at = 0.0
+        self._strikes = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                wait = self._resume_at - time.monotonic()
+
+                if wait > 0:
+                    self._condition.wait(wait)
+                elif self._active < self.limit:
+                    self._active += 1
+                    return
+                else:
+                    self._condition.wait()
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def rate_limited(self):
+        with self._condition:
+            delay = min(self.max_cooldown, self.cooldown * 2 ** self._strikes)
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            self._strikes += 1
+            self._successes = 0
+            self.limit = max(1, self.limit // 2)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+        logging.warning(
+            f"Rate limited; pausing new downloads for {delay:.0f}s "
+            f"and running at most {self.limit} at once."
+        )
+
+    def succeeded(self):
+        with self._condition:
+            self._strikes = 0
+
+            if self.limit >= self.max_limit:
+                return
+
+            self._successes += 1
+
+            if self._successes >= self.recover_after:
+                self._successes = 0
+                self.limit += 1
+                self._condition.notify_all()
+                logging.info(f"No rate limiting lately; running up to {self.limit} downloads at once.")
+
+
+class PostprocessGate:
+    """
+    Caps how many ffmpeg postprocessors run at once across all download workers.
+
+    yt-dlp calls `postprocessor_hooks` synchronously on the worker thread
+    right before ('started') and after ('finished') each postprocessor, so
+    blocking in the hook holds the worker until a slot frees up.
+    """
+
+    def __init__(self, limit):
+        self._semaphore = threading.BoundedSemaphore(max(1, int(limit)))
+        self._local = threading.local()
+
+    def hook(self, d):
+        status = d.get('status')
+
+        if status == 'started':
+            self.acquire()
+        elif status == 'finished':
+            self.release()
+
+    def acquire(self):
+        if getattr(self._local, 'held', False):
+            return
+
+        self._semaphore.acquire()
+        self._local.held = True
+
+    def release(self):
+        # A postprocessor that raises never reports 'finished', so the
+        # scheduler also calls this after every download.
+        if getattr(self._local, 'held', False):
+            self._local.held = False
+            self._semaphore.release()
+
+
+class DownloadScheduler:
+    """
+    Runs downloads on a bounded worker pool with per-host rate limiting, a
+    separate cap on concurrent postprocessing and an AdaptiveThrottle that
+    download functions tell about rate-limited failures.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_downloads=1,
+        max_concurrent_postprocessing=1,
+        rate_limit=None,
+        rate_limit_burst=1,
+        rate_limit_cooldown=30,
+    ):
+        self.max_concurrent_downloads = max(1, int(max_concurrent_downloads))
+        self.rate_limiter = HostRateLimiter(rate_limit, rate_limit_burst)
+        self.postprocess_gate = PostprocessGate(max_concurrent_postprocessing)
+        self.throttle = AdaptiveThrottle(self.max_concurrent_downloads, cooldown=rate_limit_cooldown)
+
+    def _run_one(self, index, total, url, download_fn):
+        self.throttle.acquire()
+
+        try:
+            self.rate_limiter.acquire(url)
+            logging.info(f"Downloading {index}/{total}: {url}")
+            return download_fn(url)
+        except Exception as e:
+            logging.error(f"Unhandled error downloading {url}: {e}")
+            return False
+        finally:
+            self.postprocess_gate.release()
+            self.throttle.release()
+
+    def run(self, urls, download_fn):
+        """
+        Calls download_fn(url) for every URL and returns the URLs that
+        succeeded, in input order.
+        """
+
+        urls = list(urls)
+        total = len(urls)
+
+        if not total:
+            return []
+
+        workers = min(self.max_concurrent_downloads, total)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._run_one, index, total, url, download_fn)
+                for index, url in enumerate(urls, start=1)
+            ]
+            results = [future.result() for future in futures]
+
+        return [url for url, success in zip(urls, results) if success]
+
+
+_DONE = object()
+
+
+class StagedPipeline:
+    """
+    Two-stage pipeline: the scheduler's download workers fetch raw files and
+    push them onto a bounded queue; a separate pool of `postprocess_workers`
+    threads (one per core by default, since the real work is in ffmpeg
+    subprocesses) converts, tags and embeds.
+
+    When postprocessing falls behind, the queue fills and download workers
+    block on put(), so at most `queue_size` unprocessed files sit on disk.
+    """
+
+    def __init__(self, scheduler, postprocess_workers=None, queue_size=None):
+        self.scheduler = scheduler
+        self.postprocess_workers = max(1, int(postprocess_workers or os.cpu_count() or 1))
+        self.queue_size = max(1, int(queue_size or 2 * self.postprocess_workers))
+
+    def run(self, urls, fetch_fn, postprocess_fn):
+        """
+        fetch_fn(url) returns an item for postprocess_fn, or None on
+        failure; postprocess_fn(item) returns True on success. Returns the
+        URLs that made it through both stages, in input order.
+        """
+
+        urls = list(urls)
+        pending = queue.Queue(maxsize=self.queue_size)
+        results = {}
+        results_lock = threading.Lock()
+
+        def consume():
+            while True:
+                got = pending.get()
+
+                if got is _DONE:
+                    return
+
+                url, item = got
+
+                try:
+                    ok = postprocess_fn(item)
+                except Exception as e:
+                    logging.error(f"Unhandled error postprocessing {url}: {e}")
+                    ok = False
+
+                with results_lock:
+                    results[url] = ok
+
+        def produce(url):
+            item = fetch_fn(url)
+
+            if item is None:
+                return False
+
+            # Blocks while the postprocess stage is `queue_size` files behind.
+            pending.put((url, item))
+            return True
+
+        consumers = [
+            threading.Thread(target=consume, name=f"postprocess-{n}", daemon=True)
+            for n in range(self.postprocess_workers)
+        ]
+
+        for consumer in consumers:
+            consumer.start()
+
+        try:
+            self.scheduler.run(urls, produce)
+        finally:
+            for _ in consumers:
+                pending.put(_DONE)
+
+            for consumer in consumers:
+                consumer.join()
+
+        return [url for url in urls if results.get(url)]
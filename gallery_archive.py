@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared state for Gallery Downloader.py: gallery-dl's download archive and
+when each gallery was last synced, in one SQLite file next to the images.
+
+gallery-dl records every file it saves in the `archive` table
+(--download-archive) and skips archived files without touching the disk,
+so workers writing to the same folder never fetch a file twice. The file
+is switched to WAL mode here, which is stored in the database itself, so
+gallery-dl's own connections use it too and concurrent workers don't
+block each other's writes.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+ARCHIVE_FILE_NAME = 'gallery_archive.sqlite3'
+
+SCHEMA = """
+-- gallery-dl's own table; it creates the same one if it's missing
+CREATE TABLE IF NOT EXISTS archive (
+    entry TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS galleries (
+    url           TEXT PRIMARY KEY,
+    status        TEXT NOT NULL,
+    last_attempt  REAL NOT NULL,
+    last_sync     REAL,
+    new_files     INTEGER NOT NULL DEFAULT 0,
+    skipped_files INTEGER NOT NULL DEFAULT 0,
+    total_files   INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class GalleryArchive:
+    """
+    One row per gallery: status of the last attempt ('ok' or 'failed'),
+    when it was last synced completely, and how many files the last run
+    saved and skipped. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def states(self, urls):
+        """
+        Returns {url: (status, last_sync)} for the galleries seen before.
+        """
+
+        with self._lock:
+            rows = self._conn.execute("SELECT url, status, last_sync FROM galleries").fetchall()
+
+        wanted = set(urls)
+        return {url: (status, last_sync) for url, status, last_sync in rows if url in wanted}
+
+    def partition(self, urls, max_age_seconds):
+        """
+        Splits `urls` into (due, recent): galleries last synced completely
+        less than `max_age_seconds` ago are recent and can be left alone.
+        """
+
+        if max_age_seconds <= 0:
+            return list(urls), []
+
+        states = self.states(urls)
+        cutoff = time.time() - max_age_seconds
+        due, recent = [], []
+
+        for url in urls:
+            status, last_sync = states.get(url, (None, None))
+
+            if status == 'ok' and last_sync is not None and last_sync >= cutoff:
+                recent.append(url)
+            else:
+                due.append(url)
+
+        return due, recent
+
+    def completed_before(self, url):
+        """
+        True if the last attempt at this gallery finished; only then is it
+        safe to stop at the first run of files already archived.
+        """
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM galleries WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        return row is not None and row[0] == 'ok'
+
+    def record(self, url, success, new_files, skipped_files, started_at):
+        """
+        Stores the outcome of one gallery-dl run that began at `started_at`.
+        """
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO galleries "
+                "(url, status, last_attempt, last_sync, new_files, skipped_files, total_files) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET "
+                "status = excluded.status, "
+                "last_attempt = excluded.last_attempt, "
+                "last_sync = COALESCE(excluded.last_sync, galleries.last_sync), "
+                "new_files = excluded.new_files, "
+                "skipped_files = excluded.skipped_files, "
+                "total_files = galleries.total_files + excluded.new_files",
+                (
+                    url,
+                    'ok' if success else 'failed',
+                    started_at,
+                    started_at if success else None,
+                    new_files,
+                    skipped_files,
+                    new_files,
+                )
+            )
+
+    def archived_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM archive").fetchone()[0]
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Runs gallery-dl inside this process through its job API, for
+Gallery Downloader.py. Starting a gallery-dl process per gallery costs an
+interpreter start, every extractor import and a config parse each time,
+which is most of the work for small galleries; here that happens once and
+galleries run on worker threads.
+
+Needs gallery-dl installed as a Python package (pip install gallery-dl);
+importing this module raises ImportError otherwise, and
+Gallery Downloader.py falls back to the gallery-dl command.
+"""
+
+import logging
+
+from gallery_dl import config, exception, extractor, job, output
+
+
+def configure(save_directory, archive_path=None):
+    """
+    Loads the user's gallery-dl config files and applies the options every
+    gallery shares, like the -d and --download-archive flags would. The
+    config is global to gallery-dl, so call this once before starting jobs.
+    """
+
+    config.clear()
+    config.load()
+    config.set((), 'base-directory', str(save_directory))
+    if archive_path:
+        config.set((), 'archive', str(archive_path))
+
+    # gallery-dl imports extractor modules lazily from a generator, which
+    # threads can't share; load them all here, once
+    extractor.extractors()
+
+
+class GalleryOutput(output.NullOutput):
+    """
+    Takes the place of gallery-dl's console output: counts saved and skipped
+    files and logs them like the subprocess mode does. Holds the `cancelled`
+    event the job checks before each file.
+    """
+
+    def __init__(self, label="", cancelled=None):
+        self.label = label
+        self.cancelled = cancelled
+        self.new = 0
+        self.skipped = 0
+
+    def check_cancelled(self):
+        if self.cancelled is not None and self.cancelled.is_set():
+            raise exception.TerminateExtraction()
+
+    def skip(self, path):
+        self.skipped += 1
+        logging.debug(f"{self.label} # {path}")
+
+    def success(self, path):
+        self.new += 1
+        logging.info(f"{self.label} {path}")
+
+
+class GalleryJob(job.DownloadJob):
+    """
+    A gallery-dl DownloadJob reporting to a GalleryOutput, that stops after
+    abort_after files in a row were skipped (--abort) or before the next
+    file once cancelled. Child jobs for nested galleries take both from
+    their parent.
+    """
+
+    def __init__(self, url, parent=None, out=None, abort_after=0):
+        job.DownloadJob.__init__(self, url, parent)
+        if parent is not None:
+            out, abort_after = parent.out, parent.abort_after
+        self.out = out if out is not None else GalleryOutput()
+        self.abort_after = abort_after
+
+    def initialize(self, kwdict=None):
+        job.DownloadJob.initialize(self, kwdict)
+        if self.abort_after:
+            self._skipexc = exception.StopExtraction()
+            self._skipmax = self.abort_after
+            self._skipftr = None
+
+    def handle_url(self, url, kwdict):
+        self.out.check_cancelled()
+        job.DownloadJob.handle_url(self, url, kwdict)
+
+
+def run_gallery(url, label="", abort_after=0, cancelled=None):
+    """
+    Downloads one gallery on the calling thread.
+
+    :param url: A gallery URL.
+    :param label: Prefix for the progress lines, e.g. '[3/10]'.
+    :param abort_after: Stop after this many files in a row were skipped (0: never).
+    :param cancelled: Optional threading.Event; once set, the job stops at its next file.
+    :return: (success, new files, skipped files), as for the subprocess mode.
+    """
+
+    out = GalleryOutput(label, cancelled)
+    try:
+        status = GalleryJob(url, out=out, abort_after=abort_after).run()
+    except exception.NoExtractorError:
+        logging.error(f"{label} Failed to download gallery from {url}: no gallery-dl extractor for this URL.")
+        return False, 0, 0
+    except exception.TerminateExtraction:
+        logging.warning(f"{label} Cancelled {url}")
+        return False, out.new, out.skipped
+
+    if status:
+        logging.error(f"{label} Failed to download gallery from {url}: gallery-dl returned status {status}.")
+        return False, out.new, out.skipped
+
+    logging.info(f"{label} Downloaded gallery from {url}: {out.new} new, {out.skipped} already there.")
+    return True, out.new, out.skipped
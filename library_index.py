@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared SQLite index of the audio library, so the downloader and the
+cleanup scripts stop walking the same folders from scratch.
+
+    python library_index.py refresh /path/to/library --ledger downloads.sqlite3
+    python library_index.py stats
+
+One row per file: path, size, mtime, duration, source video ID, cleaned
+title and audio fingerprint. refresh() lists every directory with scandir,
+but only stats files in directories whose mtime changed (adding, removing
+or renaming a file bumps it), so an unchanged 50k-file library refreshes in
+milliseconds. Pass full=True to stat everything, which also catches files
+edited in place. Duration and fingerprint are cleared when a file changes;
+a rename (same size and mtime under a new path) keeps them.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from title_cleaner import clean_name
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_INDEX_FILE = SCRIPT_DIR / 'library.sqlite3'
+
+# YT Downloader v7's output template puts the ID in brackets
+VIDEO_ID_IN_NAME = re.compile(r'\[([0-9A-Za-z_-]{11})\]')
+
+# Columns tools may fill in with set_values()
+DERIVED_COLUMNS = {'duration', 'video_id', 'fingerprint'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    folder      TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    duration    REAL,
+    video_id    TEXT,
+    clean_title TEXT,
+    fingerprint BLOB,
+    indexed_at  REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS files_by_folder ON files (folder);
+CREATE INDEX IF NOT EXISTS files_by_video_id ON files (video_id);
+
+CREATE TABLE IF NOT EXISTS folders (
+    path     TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def under(root):
+    """
+    SQL range covering every path below `root`, without LIKE escaping.
+    """
+
+    prefix = os.path.join(root, '')
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def describe(path):
+    """
+    Returns (folder, name, clean title, video ID from the name or None).
+    """
+
+    folder, name = os.path.split(path)
+    match = VIDEO_ID_IN_NAME.search(name)
+
+    return folder, name, clean_name(os.path.splitext(name)[0]), match.group(1) if match else None
+
+
+class LibraryIndex:
+    """
+    See the module docstring. Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stamps(self, root):
+        """
+        Returns {path: (size, mtime_ns)} for every indexed file under `root`.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE path >= ? AND path < ?",
+                under(os.path.abspath(root))
+            ).fetchall()
+
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def refresh(self, root, full=False):
+        """
+        Brings the rows under `root` in line with the disk. Returns counts
+        of added, changed, renamed, removed and unchanged files.
+        """
+
+        root = os.path.abspath(root)
+        stored = self.stamps(root)
+
+        with self._lock:
+            stored_folders = dict(self._conn.execute(
+                "SELECT path, mtime_ns FROM folders WHERE path = ? OR (path >= ? AND path < ?)",
+                (root, *under(root))
+            ).fetchall())
+
+        seen = set()
+        folders = []
+        updates = {}
+        pending = [root]
+
+        while pending:
+            folder = pending.pop()
+
+            try:
+                folder_mtime = os.stat(folder).st_mtime_ns
+                entries = list(os.scandir(folder))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            unchanged = not full and stored_folders.get(folder) == folder_mtime
+            folders.append((folder, folder_mtime))
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                    continue
+
+                if not entry.is_file():
+                    continue
+
+                seen.add(entry.path)
+
+                if unchanged and entry.path in stored:
+                    continue
+
+                stat = entry.stat()
+                stamp = (stat.st_size, stat.st_mtime_ns)
+
+                if stored.get(entry.path) != stamp:
+                    updates[entry.path] = stamp
+
+        removed = {path: stored[path] for path in stored if path not in seen}
+
+        # A file that vanished and one that appeared with the same size and
+        # mtime is a rename; keep what was worked out for it. Stamps shared
+        # by several files are ambiguous and treated as delete plus add.
+        removed_stamps = Counter(removed.values())
+        added_stamps = Counter(stamp for path, stamp in updates.items() if path not in stored)
+        removed_by_stamp = {stamp: path for path, stamp in removed.items() if removed_stamps[stamp] == 1}
+        renames = {
+            path: removed_by_stamp[stamp]
+            for path, stamp in updates.items()
+            if path not in stored and added_stamps[stamp] == 1 and stamp in removed_by_stamp
+        }
+        deleted = set(removed) - set(renames.values())
+
+        now = time.time()
+
+        with self._lock, self._conn:
+            for path, old_path in renames.items():
+                folder, name, title, _ = describe(path)
+                self._conn.execute(
+                    "UPDATE files SET path = ?, folder = ?, name = ?, clean_title = ?, indexed_at = ? "
+                    "WHERE path = ?",
+                    (path, folder, name, title, now, old_path)
+                )
+
+            self._upsert([
+                (path, *stamp)
+                for path, stamp in updates.items()
+                if path not in renames
+            ], now)
+            self._conn.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [(path,) for path in deleted]
+            )
+            self._conn.execute(
+                "DELETE FROM folders WHERE path = ? OR (path >= ? AND path < ?)",
+                (root, *under(root))
+            )
+            self._conn.executemany(
+                "INSERT INTO folders (path, mtime_ns) VALUES (?, ?)",
+                folders
+            )
+
+        changed = sum(1 for path in updates if path in stored)
+
+        return {
+            'added': len(updates) - changed - len(renames),
+            'changed': changed,
+            'renamed': len(renames),
+            'removed': len(deleted),
+            'unchanged': len(seen) - len(updates),
+        }
+
+    def _upsert(self, stamped, now):
+        # Caller holds the lock and the transaction.
+        self._conn.executemany(
+            "INSERT INTO files (path, folder, name, size, mtime_ns, video_id, clean_title, indexed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET "
+            "size = excluded.size, "
+            "mtime_ns = excluded.mtime_ns, "
+            "duration = CASE WHEN files.size = excluded.size AND files.mtime_ns = excluded.mtime_ns "
+            "THEN files.duration END, "
+            "fingerprint = CASE WHEN files.size = excluded.size AND files.mtime_ns = excluded.mtime_ns "
+            "THEN files.fingerprint END, "
+            "video_id = COALESCE(excluded.video_id, files.video_id), "
+            "indexed_at = excluded.indexed_at",
+            [
+                (path, folder, name, size, mtime_ns, video_id, title, now)
+                for path, size, mtime_ns in stamped
+                for folder, name, title, video_id in [describe(path)]
+            ]
+        )
+
+    def record(self, path, video_id=None, previous_path=None):
+        """
+        Indexes one file the caller just wrote, renamed or moved, without a
+        directory scan. With `previous_path`, that row's data moves along.
+        """
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        now = time.time()
+
+        with self._lock, self._conn:
+            if previous_path:
+                self._move_row(os.path.abspath(previous_path), path, now)
+
+            self._upsert([(path, stat.st_size, stat.st_mtime_ns)], now)
+
+            if video_id:
+                self._conn.execute("UPDATE files SET video_id = ? WHERE path = ?", (video_id, path))
+
+    def record_moves(self, moves):
+        """
+        Points the rows of files moved as (old, new) pairs at their new
+        paths, in one transaction. Size and mtime are kept as they were,
+        which is what os.rename and shutil.copy2 leave behind.
+        """
+
+        now = time.time()
+
+        with self._lock, self._conn:
+            for old, new in moves:
+                self._move_row(os.path.abspath(old), os.path.abspath(new), now)
+
+    def _move_row(self, old, new, now):
+        # Caller holds the lock and the transaction.
+        self._conn.execute("DELETE FROM files WHERE path = ?", (new,))
+        folder, name, title, _ = describe(new)
+        self._conn.execute(
+            "UPDATE files SET path = ?, folder = ?, name = ?, clean_title = ?, indexed_at = ? "
+            "WHERE path = ?",
+            (new, folder, name, title, now, old)
+        )
+
+    def forget(self, paths):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [(os.path.abspath(path),) for path in paths]
+            )
+
+    def names(self, folder):
+        """
+        Returns the set of file names directly inside `folder`.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM files WHERE folder = ?",
+                (os.path.abspath(folder),)
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+    def files(self, root, recursive=True, extensions=None):
+        """
+        Returns rows (sqlite3.Row, all columns) for files under `root`, or
+        only directly inside it if not `recursive`, optionally limited to
+        lower-case `extensions` such as {'.mp3'}.
+        """
+
+        root = os.path.abspath(root)
+
+        with self._lock:
+            if recursive:
+                rows = self._conn.execute(
+                    "SELECT * FROM files WHERE path >= ? AND path < ? ORDER BY path",
+                    under(root)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM files WHERE folder = ? ORDER BY path",
+                    (root,)
+                ).fetchall()
+
+        if extensions:
+            rows = [row for row in rows if os.path.splitext(row['name'])[1].lower() in extensions]
+
+        return rows
+
+    def missing(self, column, root, extensions=None):
+        """
+        Returns {path: (size, mtime_ns)} for files under `root` whose
+        `column` hasn't been filled in.
+        """
+
+        return {
+            row['path']: (row['size'], row['mtime_ns'])
+            for row in self.files(root, extensions=extensions)
+            if row[column] is None
+        }
+
+    def set_values(self, column, values):
+        """
+        Stores {path: value} into one of DERIVED_COLUMNS.
+        """
+
+        if column not in DERIVED_COLUMNS:
+            raise ValueError(f"Not a derived column: {column}")
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"UPDATE files SET {column} = ? WHERE path = ?",
+                [(value, path) for path, value in values.items()]
+            )
+
+    def link_ledger(self, ledger):
+        """
+        Copies video IDs from a DownloadLedger's recorded file paths.
+        Returns how many indexed files matched.
+        """
+
+        values = {
+            os.path.abspath(file_path): video_id
+            for video_id, file_path in ledger.downloaded_files()
+        }
+
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE files SET video_id = ? WHERE path = ?",
+                [(video_id, path) for path, video_id in values.items()]
+            )
+            return self._conn.total_changes - before
+
+    def counts(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), COUNT(duration), COUNT(video_id), COUNT(fingerprint), "
+                "COALESCE(SUM(size), 0) FROM files"
+            ).fetchone()
+
+        return dict(zip(('files', 'with_duration', 'with_video_id', 'with_fingerprint', 'bytes'), row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the shared library index.")
+    parser.add_argument('--index', default=str(DEFAULT_INDEX_FILE), help="Library index database.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    refresh_parser = commands.add_parser('refresh', help="Sync the index with one or more folders.")
+    refresh_parser.add_argument('folders', nargs='+')
+    refresh_parser.add_argument('--full', action='store_true', help="Stat every file, not just changed folders.")
+    refresh_parser.add_argument('--ledger', help="Copy video IDs from this download ledger.")
+
+    commands.add_parser('stats', help="Show what the index holds.")
+
+    args = parser.parse_args()
+    index = LibraryIndex(args.index)
+
+    try:
+        if args.command == 'refresh':
+            for folder in args.folders:
+                start = time.perf_counter()
+                changes = index.refresh(folder, full=args.full)
+                summary = ', '.join(f"{count} {kind}" for kind, count in changes.items())
+                print(f"{folder}: {summary} ({time.perf_counter() - start:.3f}s)")
+
+            if args.ledger:
+                from download_ledger import DownloadLedger
+
+                ledger = DownloadLedger(args.ledger)
+                print(f"Linked {index.link_ledger(ledger)} files to their video IDs.")
+                ledger.close()
+        else:
+            for key, value in index.counts().items():
+                print(f"{key}: {value}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_url TEXT PRIMARY KEY,
+    fetched_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS entries (
+    channel_url TEXT NOT NULL,
+    video_id    TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    title       TEXT,
+    duration    REAL,
+    upload_date TEXT,
+    seen_at     REAL NOT NULL,
+    PRIMARY KEY (channel_url, video_id)
+);
+
+CREATE INDEX IF NOT EXISTS entries_by_position ON entries (channel_url, position);
+"""
+
+
+class ChannelListingCache:
+    """
+    On-disk cache of each channel's flat listing (id, title, duration,
+    upload date), kept newest-first. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def fetched_at(self, channel_url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at FROM channels WHERE channel_url = ?",
+                (channel_url,)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def is_fresh(self, channel_url, ttl_seconds):
+        fetched_at = self.fetched_at(channel_url)
+
+        if fetched_at is None or ttl_seconds <= 0:
+            return False
+
+        return time.time() - fetched_at < ttl_seconds
+
+    def get(self, channel_url):
+        """
+        Returns the cached listing, newest first, or an empty list.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, title, duration, upload_date FROM entries "
+                "WHERE channel_url = ? ORDER BY position",
+                (channel_url,)
+            ).fetchall()
+
+        return [
+            {
+                'id': video_id,
+                'title': title,
+                'duration': duration,
+                'upload_date': upload_date,
+            }
+            for video_id, title, duration, upload_date in rows
+        ]
+
+    def known_ids(self, channel_url):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM entries WHERE channel_url = ?",
+                (channel_url,)
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+    def merge(self, channel_url, entries, replace=False):
+        """
+        Puts freshly fetched `entries` (newest first) in front of the cached
+        listing and stamps the channel as fetched now. With replace=True the
+        old listing is dropped, which is what a full rescan wants.
+        """
+
+        now = time.time()
+        fresh = list({
+            entry['id']: entry
+            for entry in entries
+            if entry.get('id')
+        }.values())
+        fresh_ids = {entry['id'] for entry in fresh}
+
+        with self._lock, self._conn:
+            if replace:
+                older = []
+                self._conn.execute(
+                    "DELETE FROM entries WHERE channel_url = ?",
+                    (channel_url,)
+                )
+            else:
+                older = self._conn.execute(
+                    "SELECT video_id FROM entries WHERE channel_url = ? ORDER BY position",
+                    (channel_url,)
+                ).fetchall()
+                older = [row[0] for row in older if row[0] not in fresh_ids]
+                self._conn.executemany(
+                    "DELETE FROM entries WHERE channel_url = ? AND video_id = ?",
+                    [(channel_url, video_id) for video_id in fresh_ids]
+                )
+
+            self._conn.executemany(
+                "INSERT INTO entries "
+                "(channel_url, video_id, position, title, duration, upload_date, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        channel_url,
+                        entry['id'],
+                        position,
+                        entry.get('title'),
+                        entry.get('duration'),
+                        entry.get('upload_date'),
+                        now,
+                    )
+                    for position, entry in enumerate(fresh)
+                ]
+            )
+
+            # Shift what was already cached behind the new entries.
+            self._conn.executemany(
+                "UPDATE entries SET position = ? WHERE channel_url = ? AND video_id = ?",
+                [
+                    (len(fresh) + position, channel_url, video_id)
+                    for position, video_id in enumerate(older)
+                ]
+            )
+
+            self._conn.execute(
+                "INSERT INTO channels (channel_url, fetched_at) VALUES (?, ?) "
+                "ON CONFLICT(channel_url) DO UPDATE SET fetched_at = excluded.fetched_at",
+                (channel_url, now)
+            )
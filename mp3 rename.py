@@ -1,10 +1,19 @@
 import os
-import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from title_cleaner import clean_name
 
 # Replace 'directory_path' with the path of your directory
 directory_path = r'C:\a'
 log_file_path = os.path.join(directory_path, 'name_changes_log.txt')
 
+def clean_filename(filename):
+    # Clean the name with the same rules YT Downloader v7 names downloads with
+    name, extension = os.path.splitext(filename)
+    return clean_name(name), extension
+
 def rename_and_clean_files(directory):
     # Open the log file with UTF-8 encoding
     with open(log_file_path, 'w', encoding='utf-8') as log_file:
@@ -16,21 +25,7 @@ def rename_and_clean_files(directory):
             if old_filepath == log_file_path or not os.path.isfile(old_filepath):
                 continue
 
-            # Split the filename into name and extension
-            name, extension = os.path.splitext(filename)
-
-            # Remove preceding underscores and punctuation from the name
-            new_name = re.sub(r'^[_.\s-]+', '', name)
-            # Remove Hindi characters from the name
-            new_name = re.sub(r'[\u0900-\u097F]+', ' ', new_name)
-
-            # Define all patterns to be replaced and replace them with a space
-            patterns = ['_', '｜', '|', '⧸', '/', ' ع ', '(ع)', '＂', '：', '"', ':', '(س)', '(as)', '(sa)', '(A S )', 'a s', '(a.s)', '(a.s.)', ' س ', 'ﷺ', ' ص ', '(ص)', 's a w w', 'new', 'NEW', '( )']
-            pattern = '|'.join(map(re.escape, patterns))
-            new_name = re.sub(pattern, ' ', new_name)
-
-            # Replace special characters with spaces in the name, remove leading and trailing spaces, and collapse multiple spaces
-            new_name = ' '.join(re.sub(r'[^\w\s\u0080-\uFFFF()]+', ' ', new_name).split())
+            new_name, extension = clean_filename(filename)
 
             # Append the extension to the modified name
             new_name_ext = new_name + extension
@@ -42,7 +37,7 @@ def rename_and_clean_files(directory):
                 # If a file with the new name already exists, append a number to make it unique
                 count = 1
                 while os.path.exists(new_filepath):
-                    new_name_ext = f"{new_name}_{count}{extension}"
+                    new_name_ext = f"{new_name} {count}{extension}"
                     new_filepath = os.path.join(directory, new_name_ext)
                     count += 1
 
@@ -53,4 +48,5 @@ def rename_and_clean_files(directory):
                 log_file.write(f"{old_filepath} -> {new_filepath}\n")
                 print(f"{old_filepath} -> {new_filepath}")
 
-rename_and_clean_files(directory_path)
\ No newline at end of file
+if __name__ == "__main__":
+    rename_and_clean_files(directory_path)
\ No newline at end of file
@@ -1,46 +1,75 @@
 import os
-from pydub.utils import mediainfo
+import sys
+import argparse
 
-def delete_mp3_files(directory, min_length=None, max_length=None, delete_contains=None):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from library_index import LibraryIndex
+from mp3_duration import fill_durations
+
+def delete_mp3_files(directory, index, min_length=None, max_length=None, delete_contains=None, dry_run=False, workers=None):
     deleted_files = []
 
-    # Traverse through the directory
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".mp3"):
-                file_path = os.path.join(root, file)
+    # Sync the library index, then read durations from the headers of new or changed MP3s only
+    index.refresh(directory)
+    for file_path, error in fill_durations(index, directory, workers).items():
+        print(f"Error reading {os.path.basename(file_path)}: {error}")
+
+    for row in index.files(directory, extensions={'.mp3'}):
+        file_path, file, duration = row['path'], row['name'], row['duration']
+
+        if duration is None:
+            continue
+
+        length_ms = int(duration * 1000)
+
+        # Check if the file meets deletion criteria
+        if (min_length is not None and length_ms < min_length) or \
+           (max_length is not None and length_ms > max_length) or \
+           (delete_contains and any(substring.lower() in file.lower() for substring in delete_contains)):
+
+            # Delete the file, unless this is a dry run
+            if not dry_run:
                 try:
-                    # Get duration of the mp3 file
-                    duration_info = mediainfo(file_path)['duration']
-                    length_ms = int(float(duration_info) * 1000)
-                    
-                    # Check if the file meets deletion criteria
-                    if (min_length is not None and length_ms < min_length) or \
-                       (max_length is not None and length_ms > max_length) or \
-                       (delete_contains and any(substring.lower() in file.lower() for substring in delete_contains)):
-                        
-                        # Delete the file
-                        os.remove(file_path)
-                        deleted_files.append((file, length_ms))
-                except Exception as e:
-                    print(f"Error reading {file}: {e}")
+                    os.remove(file_path)
+                except OSError as e:
+                    print(f"Error deleting {file}: {e}")
+                    continue
+                index.forget([file_path])
+
+            deleted_files.append((file, length_ms))
 
     return deleted_files
 
 def main():
+    parser = argparse.ArgumentParser(description="Delete MP3s outside a length range or with unwanted words in the name.")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the files that would be deleted.")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel header readers.")
+    args = parser.parse_args()
+
     directory = r'C:\a\b'
     min_length = int(60000)
     max_length = int(3600000)
     delete_contains_str = "promo, trailer, interview"
     delete_contains = [substring.strip() for substring in delete_contains_str.split(",")] if delete_contains_str else None
 
-    deleted_files = delete_mp3_files(directory, min_length=min_length, max_length=max_length, delete_contains=delete_contains)
+    index = LibraryIndex()
+    try:
+        deleted_files = delete_mp3_files(directory, index, min_length=min_length, max_length=max_length, delete_contains=delete_contains,
+                                         dry_run=args.dry_run, workers=args.workers)
+    finally:
+        index.close()
+
+    log_name = "would_delete_files.txt" if args.dry_run else "deleted_files.txt"
 
     if deleted_files:
-        with open("deleted_files.txt", "w", encoding="utf-8") as f:  # Specify encoding
+        with open(log_name, "w", encoding="utf-8") as f:  # Specify encoding
             for file, length in deleted_files:
                 f.write(f"{file}: {length} ms\n")
-        print("Deletion complete. Deleted files logged in deleted_files.txt")
+        if args.dry_run:
+            print(f"Dry run: {len(deleted_files)} files would be deleted. Listed in {log_name}")
+        else:
+            print(f"Deletion complete. Deleted files logged in {log_name}")
     else:
         print("No files deleted.")
 
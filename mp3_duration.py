@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Reads MP3 durations from the file itself instead of spawning ffprobe per
+file.
+
+Skips any ID3v2 tag, finds the first frame (confirmed by a second frame
+right after it) and takes the frame count from a Xing/Info or VBRI header
+when there is one. Otherwise, if the first frames share one bitrate, the
+file is treated as CBR and the duration is the audio byte count over the
+bitrate. Anything else, like VBR without a header or a damaged file, falls
+back to ffprobe. fill_durations() stores results in the library index, so
+a file is only read again after it changes.
+
+    python mp3_duration.py /path/to/folder
+"""
+
+import argparse
+import os
+import struct
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from library_index import DEFAULT_INDEX_FILE, LibraryIndex
+
+
+# kbit/s by (MPEG-1?, layer) and bitrate index
+BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Hz by version bits and sample rate index
+SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+HEAD_BYTES = 64 * 1024
+CBR_CHECK_FRAMES = 8
+
+
+def parse_frame_header(data, offset):
+    """
+    Returns a dict describing the MPEG audio frame header at `offset`, or
+    None if there isn't a valid one.
+    """
+
+    if offset + 4 > len(data):
+        return None
+
+    b0, b1, b2, b3 = data[offset:offset + 4]
+
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 3
+    layer = 4 - ((b1 >> 1) & 3)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 3
+
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 1
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+
+    return {
+        'mpeg1': mpeg1,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'samples': samples,
+        'length': length,
+        'mono': b3 >> 6 == 3,
+    }
+
+
+def id3v2_size(head):
+    if len(head) < 10 or head[:3] != b'ID3':
+        return 0
+
+    size = 0
+
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def find_first_frame(data):
+    """
+    Returns (offset, header) of the first frame that is followed by another
+    valid frame, or (None, None).
+    """
+
+    offset = data.find(b'\xff')
+
+    while offset != -1:
+        header = parse_frame_header(data, offset)
+
+        if header:
+            following = offset + header['length']
+
+            if following + 4 > len(data) or parse_frame_header(data, following):
+                return offset, header
+
+        offset = data.find(b'\xff', offset + 1)
+
+    return None, None
+
+
+def vbr_frame_count(data, offset, header):
+    """
+    Returns (frame count, 'xing'|'vbri') from a VBR header inside the first
+    frame, or (None, None).
+    """
+
+    if header['mpeg1']:
+        side_info = 17 if header['mono'] else 32
+    else:
+        side_info = 9 if header['mono'] else 17
+
+    xing = offset + 4 + side_info
+
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+
+        if flags & 1 and len(data) >= xing + 12:
+            return struct.unpack('>I', data[xing + 8:xing + 12])[0], 'xing'
+
+    vbri = offset + 36
+
+    if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+        return struct.unpack('>I', data[vbri + 14:vbri + 18])[0], 'vbri'
+
+    return None, None
+
+
+def is_constant_bitrate(data, offset, header):
+    bitrate = header['bitrate']
+
+    for _ in range(CBR_CHECK_FRAMES):
+        offset += header['length']
+        header = parse_frame_header(data, offset)
+
+        if header is None:
+            # Ran past the bytes read: the frames so far all agreed.
+            return offset + 4 > len(data)
+
+        if header['bitrate'] != bitrate:
+            return False
+
+    return True
+
+
+def header_duration(path, size=None):
+    """
+    Returns (seconds, method) read from the file's own headers, or
+    (None, None) when only a decoder can tell.
+    """
+
+    with open(path, 'rb') as f:
+        head = f.read(10)
+        audio_start = id3v2_size(head)
+        f.seek(audio_start)
+        data = f.read(HEAD_BYTES)
+
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+
+        f.seek(max(0, size - 128))
+        has_id3v1 = f.read(3) == b'TAG'
+
+    offset, header = find_first_frame(data)
+
+    if header is None:
+        return None, None
+
+    frames, method = vbr_frame_count(data, offset, header)
+
+    if frames:
+        return frames * header['samples'] / header['sample_rate'], method
+
+    if not is_constant_bitrate(data, offset, header):
+        return None, None
+
+    audio_bytes = size - audio_start - offset - (128 if has_id3v1 else 0)
+    return audio_bytes * 8 / header['bitrate'], 'cbr'
+
+
+def ffprobe_duration(path):
+    result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            str(path),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffprobe exited with {result.returncode}")
+
+    return float(result.stdout.strip())
+
+
+def mp3_duration(path, size=None):
+    """
+    Returns (seconds, method); method is 'xing', 'vbri', 'cbr' or 'ffprobe'.
+    Raises if neither the headers nor ffprobe give a duration.
+    """
+
+    duration, method = header_duration(path, size)
+
+    if duration is None:
+        return ffprobe_duration(path), 'ffprobe'
+
+    return duration, method
+
+
+def scan_durations(files, workers=None):
+    """
+    Takes {path: (size, mtime_ns)} and returns {path: (seconds, method)},
+    reading the files on a thread pool. Files nothing could read map to
+    (None, 'error: ...').
+    """
+
+    def measure(path):
+        try:
+            return mp3_duration(path, files[path][0])
+        except Exception as e:
+            return None, f"error: {e}"
+
+    paths = list(files)
+
+    with ThreadPoolExecutor(max_workers=workers or min(32, 4 * (os.cpu_count() or 1))) as executor:
+        return dict(zip(paths, executor.map(measure, paths)))
+
+
+def fill_durations(index, root, workers=None):
+    """
+    Reads durations for the MP3s under `root` that the library index has
+    none for (new or changed files) and stores them. Returns the errors as
+    {path: message}.
+    """
+
+    measured = scan_durations(index.missing('duration', root, {'.mp3'}), workers)
+    index.set_values('duration', {
+        path: duration
+        for path, (duration, _) in measured.items()
+        if duration is not None
+    })
+
+    return {
+        path: method
+        for path, (duration, method) in measured.items()
+        if duration is None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print MP3 durations read from frame headers.")
+    parser.add_argument('directory')
+    parser.add_argument('--index', default=str(DEFAULT_INDEX_FILE), help="Library index database.")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    index = LibraryIndex(args.index)
+    start = time.perf_counter()
+
+    try:
+        index.refresh(args.directory)
+        errors = fill_durations(index, args.directory, args.workers)
+        rows = index.files(args.directory, extensions={'.mp3'})
+    finally:
+        index.close()
+
+    elapsed = time.perf_counter() - start
+
+    for row in rows:
+        shown = f"{row['duration']:10.1f}s" if row['duration'] is not None else f"{'?':>11}"
+        print(f"{shown}  {row['path']}")
+
+    for path, error in sorted(errors.items()):
+        print(f"Error reading {path}: {error}")
+
+    print(f"{len(rows)} files in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
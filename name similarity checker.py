@@ -1,29 +1,27 @@
 import os
+import sys
 import csv
-from difflib import SequenceMatcher
 
-# this code is extremely slow and (largely) useless. need to refine
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-def similar(a, b):
-    return SequenceMatcher(None, a, b).ratio()
+from library_index import LibraryIndex
+from near_duplicates import find_similar_groups
 
-def compare_and_flag(directory):
-    filenames = os.listdir(directory)
-    filenames.sort()  # Sort filenames
+def compare_and_flag(directory, threshold=0.8):
+    # Names come from the shared library index; only changed folders are re-read
+    index = LibraryIndex()
+    try:
+        index.refresh(directory)
+        filenames = [
+            name
+            for name in index.names(directory)
+            if name != 'similar_filenames.csv'
+        ]
+    finally:
+        index.close()
 
-    flagged_groups = []
-
-    for i in range(len(filenames)):
-        current_group = []
-        for j in range(i + 1, len(filenames)):
-            similarity = similar(filenames[i], filenames[j])
-            if similarity >= 0.8:
-                if filenames[i] not in current_group:
-                    current_group.append(filenames[i])
-                if filenames[j] not in current_group:
-                    current_group.append(filenames[j])
-        if current_group and current_group not in flagged_groups:
-            flagged_groups.append(current_group)
+    # Disjoint groups of names that are similar after title cleaning
+    flagged_groups = find_similar_groups(filenames, threshold)
 
     output_file_path = os.path.join(directory, 'similar_filenames.csv')
     with open(output_file_path, 'w', newline='', encoding='utf-8') as csvfile:
@@ -33,6 +31,10 @@ def compare_and_flag(directory):
                 writer.writerow([filename])
             writer.writerow([])  # Blank row after each group of similar names
 
+    print(f"{len(flagged_groups)} groups of similar names written to {output_file_path}")
+
 # Replace 'directory_path' with the path of your directory
 directory_path = r'C:\Audio\a'
-compare_and_flag(directory_path)
\ No newline at end of file
+
+if __name__ == "__main__":
+    compare_and_flag(directory_path)
\ No newline at end of file
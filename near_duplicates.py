@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Near-duplicate filename detection that scales to tens of thousands of
+names.
+
+Names are normalized with the downloader's title cleaning rules (without
+the video ID tag), then candidate pairs are found with a trigram inverted
+index and prefix filtering. With every name's trigrams in one global order,
+rarest first, two names whose trigram sets have a Dice similarity of at
+least `blocking_threshold` always share one of the first
+|x| - ceil(t * |x|) + 1 trigrams of each, t being the equivalent Jaccard
+threshold, so each name only looks up that prefix and no such pair is
+missed. Names are visited from fewest trigrams to most, which lets the
+index hold a shorter prefix and drop names that have become too small.
+Candidates are checked against the blocking threshold, compared with
+SequenceMatcher, and union-find merges the matches into disjoint groups.
+"""
+
+import math
+import os
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from title_cleaner import VIDEO_ID_TAG, clean_name
+
+
+def normalize(filename):
+    """
+    Compares names the way they'd look after cleaning, without the
+    extension or video ID tag and case-insensitively.
+    """
+
+    stem, _ = os.path.splitext(filename)
+    return clean_name(VIDEO_ID_TAG.sub('', stem)).casefold()
+
+
+def trigrams(name):
+    padded = f'  {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        parent = self.parent
+
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def similar(a, b, threshold):
+    """
+    SequenceMatcher ratio test, short-circuiting on its cheap upper bounds.
+    """
+
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+
+    return (
+        matcher.real_quick_ratio() >= threshold
+        and matcher.quick_ratio() >= threshold
+        and matcher.ratio() >= threshold
+    )
+
+
+def prefix_length(size, overlap):
+    """
+    How many of a name's `size` trigrams to take so that any name sharing
+    at least `overlap` * `size` trigrams with it shares one of them.
+    """
+
+    return size - math.ceil(overlap * size - 1e-9) + 1
+
+
+def candidate_pairs(keys, blocking_threshold=0.5):
+    """
+    Yields index pairs (i, j), i < j, of keys whose trigram sets have a
+    Dice similarity of at least `blocking_threshold`, all of them.
+    """
+
+    grams = [trigrams(key) for key in keys]
+    frequency = Counter(gram for key_grams in grams for gram in key_grams)
+    by_rarity = sorted(frequency, key=lambda gram: (frequency[gram], gram))
+    rank = {gram: r for r, gram in enumerate(by_rarity)}
+    index = defaultdict(list)
+    starts = defaultdict(int)
+
+    # Dice d and Jaccard j are related by j = d / (2 - d)
+    jaccard = blocking_threshold / (2 - blocking_threshold)
+    half = blocking_threshold / 2
+
+    for i in sorted(range(len(grams)), key=lambda i: len(grams[i])):
+        key_grams = grams[i]
+        size = len(key_grams)
+        # Rarest first, so the prefix holds the shortest posting lists.
+        ordered = sorted(key_grams, key=rank.__getitem__)
+        seen = set()
+
+        for position, gram in enumerate(ordered[:prefix_length(size, jaccard)]):
+            postings = index[gram]
+            start = starts[gram]
+
+            # Names are visited by size, so one too small now stays too small
+            while start < len(postings) and len(grams[postings[start][0]]) < jaccard * size:
+                start += 1
+
+            starts[gram] = start
+
+            for j, other_position in postings[start:]:
+                if j in seen:
+                    continue
+
+                other = len(grams[j])
+                needed = half * (size + other)
+
+                # Met at their rarest shared trigram: at most the trigrams
+                # from here on can be shared, on either side
+                if min(size - position, other - other_position) < needed:
+                    continue
+
+                seen.add(j)
+
+                if len(key_grams & grams[j]) >= needed:
+                    yield min(i, j), max(i, j)
+
+        # Later names are no smaller, so a pair needs 2j / (1 + j) of this one
+        for position, gram in enumerate(ordered[:prefix_length(size, 2 * jaccard / (1 + jaccard))]):
+            index[gram].append((i, position))
+
+
+def find_similar_groups(filenames, threshold=0.8, blocking_threshold=0.5):
+    """
+    Returns disjoint groups (sorted lists, two or more names each) of
+    filenames whose normalized names have a SequenceMatcher ratio of at
+    least `threshold`, directly or through other members of the group.
+    """
+
+    filenames = sorted(set(filenames))
+    by_key = defaultdict(list)
+
+    for position, filename in enumerate(filenames):
+        by_key[normalize(filename)].append(position)
+
+    keys = list(by_key)
+    groups = UnionFind(len(keys))
+
+    for i, j in candidate_pairs(keys, blocking_threshold):
+        if groups.find(i) != groups.find(j) and similar(keys[i], keys[j], threshold):
+            groups.union(i, j)
+
+    members = defaultdict(list)
+
+    for key_index, key in enumerate(keys):
+        members[groups.find(key_index)].extend(filenames[p] for p in by_key[key])
+
+    return sorted(
+        (sorted(group) for group in members.values() if len(group) > 1),
+        key=lambda group: group[0]
+    )
@@ -1,20 +1,177 @@
-def remove_duplicates(input_file, output_file):
+import argparse
+import heapq
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from video_ids import parse_video_id, video_url
+
+try:
+  import resource
+except ImportError:  # Windows
+  resource = None
+
+# Distinct keys held in memory at once (a Python set costs ~100 bytes a key)
+DEFAULT_MAX_KEYS = 1_000_000
+
+# Shortest line that can carry a key (a bare ID plus newline), for sizing partitions
+MIN_LINE_BYTES = 12
+
+def line_key(line):
+  """
+  Returns what a line is compared by: its video ID when it has one (so
+  watch?v=, youtu.be/ and /shorts/ forms of one video match), otherwise
+  the stripped line. Blank lines return None.
   """
-  Removes duplicate lines from a text file and saves the unique lines to a new file.
+  text = line.strip()
+  if not text:
+    return None
+  return parse_video_id(text) or text
+
+def read_lines(input_files):
+  # UTF-8 regardless of platform; surrogateescape carries undecodable bytes through unchanged
+  for input_file in input_files:
+    with open(input_file, 'r', encoding='utf-8', errors='surrogateescape', newline=None) as in_file:
+      yield from in_file
+
+def output_line(line, key, canonical):
+  if canonical and len(key) == 11 and parse_video_id(key) == key:
+    return video_url(key) + '\n'
+  return line.rstrip('\r\n') + '\n'
+
+def remove_duplicates(input_files, output_file, max_keys=DEFAULT_MAX_KEYS, canonical=False, temp_dir=None):
+  """
+  Merges one or more history files into output_file, keeping the first
+  line seen for each video (or each distinct non-URL line), in input order.
+
+  Inputs small enough for max_keys are deduplicated in one pass with a set.
+  Larger ones are streamed into hash partitions on disk, each partition is
+  deduplicated exactly on its own, and the inputs are read a second time
+  to write the kept lines in their original order. Memory stays around
+  max_keys keys however large the inputs are.
 
   Args:
-      input_file: Path to the text file containing duplicate lines.
+      input_files: Paths of the text files to merge, in priority order.
       output_file: Path to the output file where unique lines will be saved.
+      max_keys: Distinct keys to hold in memory at once.
+      canonical: Write video lines as watch?v= URLs instead of as found.
+      temp_dir: Where to put the partitions (default: the system temp dir).
+
+  Returns:
+      Dict of lines read, lines written, partitions used and seconds taken.
   """
-  seen = set()  # Keeps track of seen lines
-  with open(input_file, 'r') as in_file, open(output_file, 'w') as out_file:
-    for line in in_file:
-      if line.strip() not in seen:  # Check for line without trailing whitespace
-        seen.add(line.strip())
-        out_file.write(line)
+  if isinstance(input_files, (str, os.PathLike)):
+    input_files = [input_files]
+
+  for input_file in input_files:
+    if os.path.exists(output_file) and os.path.samefile(input_file, output_file):
+      raise ValueError(f"Output file is also an input: {output_file}")
+
+  start = time.perf_counter()
+  total_bytes = sum(os.path.getsize(input_file) for input_file in input_files)
+  partitions = -(-total_bytes // (MIN_LINE_BYTES * max_keys)) or 1
+
+  with open(output_file, 'w', encoding='utf-8', errors='surrogateescape', newline='\n') as out_file:
+    if partitions == 1:
+      lines_read, lines_written = dedupe_in_memory(input_files, out_file, canonical)
+    else:
+      with tempfile.TemporaryDirectory(prefix='remove_duplicates_', dir=temp_dir) as work_dir:
+        lines_read, lines_written = dedupe_partitioned(input_files, out_file, partitions, work_dir, canonical)
+
+  return {
+    'lines_read': lines_read,
+    'lines_written': lines_written,
+    'partitions': partitions,
+    'seconds': time.perf_counter() - start,
+  }
+
+def dedupe_in_memory(input_files, out_file, canonical):
+  seen = set()  # Keeps track of seen keys
+  lines_read = 0
+  for line in read_lines(input_files):
+    lines_read += 1
+    key = line_key(line)
+    if key is not None and key not in seen:
+      seen.add(key)
+      out_file.write(output_line(line, key, canonical))
+  return lines_read, len(seen)
+
+def dedupe_partitioned(input_files, out_file, partitions, work_dir, canonical):
+  # Pass 1: "<line number>\t<key>" records, split by hash of the key
+  paths = [os.path.join(work_dir, f"part{n}.txt") for n in range(partitions)]
+  parts = [open(path, 'w', encoding='utf-8', errors='surrogateescape') for path in paths]
+  lines_read = 0
+  try:
+    for seq, line in enumerate(read_lines(input_files)):
+      lines_read += 1
+      key = line_key(line)
+      if key is not None:
+        parts[hash(key) % partitions].write(f"{seq}\t{key}\n")
+  finally:
+    for part in parts:
+      part.close()
+
+  # Each key lives in exactly one partition, written in input order, so
+  # its first record there is its first occurrence overall.
+  kept_paths = []
+  for path in paths:
+    kept_path = path + '.kept'
+    seen = set()
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape') as part, open(kept_path, 'w') as kept:
+      for record in part:
+        seq, key = record.rstrip('\n').split('\t', 1)
+        if key not in seen:
+          seen.add(key)
+          kept.write(seq + '\n')
+    os.remove(path)
+    kept_paths.append(kept_path)
+
+  # Pass 2: the kept line numbers, merged back into one ascending stream
+  kept_files = [open(kept_path, 'r') for kept_path in kept_paths]
+  lines_written = 0
+  try:
+    keep = heapq.merge(*(map(int, kept) for kept in kept_files))
+    next_keep = next(keep, None)
+    for seq, line in enumerate(read_lines(input_files)):
+      if seq == next_keep:
+        out_file.write(output_line(line, line_key(line) if canonical else None, canonical))
+        lines_written += 1
+        next_keep = next(keep, None)
+  finally:
+    for kept in kept_files:
+      kept.close()
+
+  return lines_read, lines_written
+
+def peak_memory_mb():
+  if resource is None:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Kilobytes on Linux, bytes on macOS
+  return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
 
 # Example usage
 input_file = r'C:\a\downloaded_videos.txt'
 output_file = r'C:\a\downloaded_videos3.txt'
-remove_duplicates(input_file, output_file)
-print(f"Duplicate lines removed and saved to {output_file}")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Merge URL history files, keeping the first line for each video.")
+  parser.add_argument('inputs', nargs='*', default=[input_file], help="History files, in priority order.")
+  parser.add_argument('-o', '--output', default=output_file)
+  parser.add_argument('--max-keys', type=int, default=DEFAULT_MAX_KEYS, help="Distinct keys to hold in memory at once.")
+  parser.add_argument('--canonical', action='store_true', help="Write video lines as watch?v= URLs.")
+  parser.add_argument('--temp-dir', help="Where to put partitions for large inputs.")
+  args = parser.parse_args()
+
+  stats = remove_duplicates(args.inputs, args.output, args.max_keys, args.canonical, args.temp_dir)
+  peak = peak_memory_mb()
+  print(f"Duplicate lines removed and saved to {args.output}")
+  print(
+    f"{stats['lines_read']} lines read, {stats['lines_written']} kept, "
+    f"{stats['partitions']} partition(s), {stats['seconds']:.1f}s "
+    f"({stats['lines_read'] / max(stats['seconds'], 1e-9):,.0f} lines/s)"
+    + (f", peak memory {peak:.0f} MB" if peak is not None else "")
+  )
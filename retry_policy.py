@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import re
+import time
+
+
+PERMANENT = 'permanent'
+TRANSIENT = 'transient'
+RATE_LIMITED = 'rate_limited'
+
+# yt-dlp error messages for videos that will fail the same way every night.
+# Checked after RATE_LIMITED_PATTERNS, since "Sign in to confirm you're not
+# a bot" would otherwise look like the age gate.
+PERMANENT_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r'members[- ]only',
+        r'available to this channel.s members',
+        r'join this channel',
+        r'private video',
+        r'video unavailable',
+        r'(?:has been|was) removed',
+        r'no longer available',
+        r'account .* (?:has been )?terminated',
+        r'sign in to confirm your age',
+        r'age[- ]restricted',
+        r'inappropriate for some users',
+        r'copyright grounds',
+        r'not (?:made this video )?available in your country',
+    )
+]
+
+# Throttling: HTTP 429, YouTube's bot check and its session rate limit
+RATE_LIMITED_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r'HTTP Error 429',
+        r'too many requests',
+        r'rate[- ]limit',
+        r'confirm you.re not a bot',
+        r'try again later',
+    )
+]
+
+
+def classify_failure(error):
+    """
+    Sorts a failed download's error message into PERMANENT (members-only,
+    removed, private, age-restricted, blocked), RATE_LIMITED (the site is
+    throttling us, not a problem with this video) or TRANSIENT (everything
+    else, including errors with no message).
+    """
+
+    if not error:
+        return TRANSIENT
+
+    error = str(error)
+
+    if any(pattern.search(error) for pattern in RATE_LIMITED_PATTERNS):
+        return RATE_LIMITED
+
+    if any(pattern.search(error) for pattern in PERMANENT_PATTERNS):
+        return PERMANENT
+
+    return TRANSIENT
+
+
+class RetryPolicy:
+    """
+    Decides when a failed video may be queued again: never for permanent
+    failures, otherwise after an exponential backoff with jitter on the
+    number of failures in a row. A video that keeps failing transiently is
+    given up on (treated as permanent) after `give_up_after` transient
+    failures; rate-limited failures never count toward that.
+
+    Rate-limited failures back off on their own, shorter scale, since the
+    video itself is probably fine; they are also passed on to `throttle`
+    (an AdaptiveThrottle) so the whole run slows down.
+    """
+
+    def __init__(self, base_delay=12 * 3600, max_delay=30 * 86400, rate_limit_delay=3600,
+                 rate_limit_max_delay=86400, give_up_after=10, max_retry_sleep=30, throttle=None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+        self.rate_limit_max_delay = rate_limit_max_delay
+        self.give_up_after = give_up_after
+        self.max_retry_sleep = max_retry_sleep
+        self.throttle = throttle
+
+    @staticmethod
+    def _jittered(delay):
+        # "Equal jitter": at least half the delay, so backoff still grows,
+        # but videos that failed together don't all come due together.
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def schedule(self, kind, failures, now=None):
+        """
+        Returns (kind, retry_at) for a video that has now failed `failures`
+        times in a row; retry_at is a Unix time, or None for never. For
+        TRANSIENT, `failures` should leave out rate-limited failures.
+        """
+
+        if kind == TRANSIENT and self.give_up_after and failures >= self.give_up_after:
+            return PERMANENT, None
+
+        if kind == PERMANENT:
+            return PERMANENT, None
+
+        if kind == RATE_LIMITED:
+            base, cap = self.rate_limit_delay, self.rate_limit_max_delay
+        else:
+            base, cap = self.base_delay, self.max_delay
+
+        delay = min(cap, base * 2 ** max(0, failures - 1))
+        return kind, (time.time() if now is None else now) + self._jittered(delay)
+
+    def retry_sleep(self, n=0):
+        """
+        Pause before yt-dlp's own n-th retry within a download (HTTP,
+        fragment and extractor retries): 1, 2, 4... seconds with jitter, up
+        to `max_retry_sleep`.
+        """
+
+        return self._jittered(min(self.max_retry_sleep, 2 ** n))
+
+    def observe(self, success, kind=None):
+        """
+        Tells the throttle how a download went.
+        """
+
+        if self.throttle is None:
+            return
+
+        if kind == RATE_LIMITED:
+            self.throttle.rate_limited()
+        elif success:
+            self.throttle.succeeded()
+
+    def describe(self, kind, retry_at):
+        if retry_at is None:
+            return f"{kind}, not retrying"
+
+        hours = max(0, retry_at - time.time()) / 3600
+        return f"{kind}, retrying in {hours:.1f}h" if hours < 48 else f"{kind}, retrying in {hours / 24:.1f} days"
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Structured metrics for YT Downloader v7 runs: how long each stage took
+(channel expansion, extraction, transfer, every postprocessor, renaming,
+the reconcile sweep), bytes transferred, retries and failure reasons, per
+video and per run.
+
+Each finished video, channel listing and stage is appended to a JSONL file
+as it happens, so a run that dies half-way still leaves its numbers.
+
+    python run_metrics.py                       # summary of the last run
+    python run_metrics.py --run 20250101T031500
+    python run_metrics.py --list
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_METRICS_FILE = SCRIPT_DIR / 'download_metrics.jsonl'
+
+# "ERROR: [youtube] dQw4w9WgXcQ: Video unavailable" -> "Video unavailable",
+# so one reason groups across videos
+ERROR_PREFIX_RE = re.compile(r'^(?:ERROR:\s*)?(?:\[[^\]]+\]\s*)?(?:[A-Za-z0-9_-]{11}:\s*)?')
+
+PROMETHEUS_PREFIX = 'yt_downloader'
+
+
+def failure_reason(error, limit=120):
+    """
+    Shortens a yt-dlp error message to what it has in common with the same
+    failure on other videos.
+    """
+
+    if not error:
+        return 'unknown'
+
+    reason = ERROR_PREFIX_RE.sub('', str(error).strip().splitlines()[0]).strip()
+    return (reason or str(error).strip())[:limit]
+
+
+def format_bytes(count):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+class VideoMetrics:
+    """
+    Timings, bytes and retries of one video. Stages are timed with
+    start()/stop(); a stage still open when the video ends is closed then.
+    """
+
+    def __init__(self, url, video_id):
+        self.url = url
+        self.video_id = video_id
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.bytes = 0
+        self.retries = 0
+        self._open = {}
+
+    def start(self, stage):
+        self._open.setdefault(stage, time.perf_counter())
+
+    def stop(self, stage):
+        began = self._open.pop(stage, None)
+
+        if began is not None:
+            self.add(stage, time.perf_counter() - began)
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def close(self):
+        for stage in list(self._open):
+            self.stop(stage)
+
+
+class RunMetrics:
+    """
+    Collects metrics for one run. Safe to share between download threads.
+
+    Each thread works on one video at a time: begin_video() makes it the
+    thread's current video, and the yt-dlp hooks (progress_hook,
+    postprocessor_hook, retry_sleep) and add_time() credit that video. In the
+    staged pipeline a fetched video is paused on the download thread and
+    resumed on the postprocess thread, so the wait in between is timed as
+    'queue'.
+    """
+
+    def __init__(self, jsonl_file=None):
+        self.run_id = time.strftime('%Y%m%dT%H%M%S')
+        self.started = time.perf_counter()
+        self.path = Path(jsonl_file) if jsonl_file else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+
+        # stage -> [count, seconds, max seconds]
+        self.stages = {}
+        self.outcomes = Counter()
+        self.failures = Counter()
+        self.failure_kinds = Counter()
+        self.bytes = 0
+        self.retries = 0
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _emit(self, event):
+        # Aggregates the event and appends it to the JSONL file.
+        event = {'run': self.run_id, 'time': round(time.time(), 3), **event}
+
+        with self._lock:
+            self.ingest(event)
+
+            if self._file is not None:
+                self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+                self._file.flush()
+
+    def ingest(self, event):
+        """
+        Adds one event to the totals. Used live, and to rebuild a past
+        run's summary from the JSONL file.
+        """
+
+        kind = event.get('event')
+
+        if kind == 'video':
+            self.outcomes[event['outcome']] += 1
+            self.bytes += event.get('bytes', 0)
+            self.retries += event.get('retries', 0)
+
+            if event['outcome'] == 'failed':
+                self.failures[event.get('reason') or 'unknown'] += 1
+                self.failure_kinds[event.get('failure_kind') or 'unknown'] += 1
+
+            for stage, seconds in event.get('stages', {}).items():
+                self._add_stage(stage, seconds)
+        elif kind == 'channel':
+            self._add_stage('channel listing', event['seconds'])
+        elif kind == 'stage':
+            self._add_stage(event['stage'], event['seconds'])
+
+    def _add_stage(self, stage, seconds):
+        totals = self.stages.setdefault(stage, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+
+    # Run-level stages
+
+    def record_stage(self, stage, seconds, **fields):
+        self._emit({'event': 'stage', 'stage': stage, 'seconds': round(seconds, 4), **fields})
+
+    @contextmanager
+    def timed(self, stage, **fields):
+        """
+        Times a whole stage of the run, e.g. 'expand'.
+        """
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start, **fields)
+
+    def record_channel(self, url, seconds, entries):
+        self._emit({'event': 'channel', 'url': url, 'seconds': round(seconds, 4), 'entries': entries})
+
+    # Per-video metrics, for the calling thread's current video
+
+    def begin_video(self, url, video_id):
+        video = VideoMetrics(url, video_id)
+        video.start('extract')
+        self._local.video = video
+        return video
+
+    def current_video(self):
+        return getattr(self._local, 'video', None)
+
+    def pause_video(self):
+        """
+        Detaches the current video from this thread (it waits in the staged
+        pipeline's queue) and returns it for resume_video().
+        """
+
+        video = self.current_video()
+        self._local.video = None
+
+        if video is not None:
+            video.close()
+            video.start('queue')
+
+        return video
+
+    def resume_video(self, video):
+        if video is not None:
+            video.stop('queue')
+
+        self._local.video = video
+
+    def add_time(self, stage, seconds):
+        video = self.current_video()
+
+        if video is not None:
+            video.add(stage, seconds)
+
+    def retry_sleep(self, n=0):
+        """
+        yt-dlp `retry_sleep_functions` entry, called once per HTTP, fragment
+        or extractor retry: counts it and returns no pause, which callers
+        with their own backoff can add to.
+        """
+
+        video = self.current_video()
+
+        if video is not None:
+            video.retries += 1
+
+        return 0
+
+    def progress_hook(self, d):
+        """
+        yt-dlp progress hook: times the transfer and counts its bytes.
+        Extraction ends at the first progress report.
+        """
+
+        video = self.current_video()
+
+        if video is None:
+            return
+
+        video.stop('extract')
+        status = d.get('status')
+
+        if status == 'downloading':
+            video.start('transfer')
+        elif status == 'finished':
+            video.stop('transfer')
+            video.bytes += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+        elif status == 'error':
+            video.stop('transfer')
+
+    def postprocessor_hook(self, d):
+        """
+        yt-dlp postprocessor hook: times each postprocessor (ffmpeg) by name.
+        """
+
+        video = self.current_video()
+
+        if video is None:
+            return
+
+        video.stop('extract')
+        stage = d.get('postprocessor') or 'postprocess'
+
+        if d.get('status') == 'started':
+            video.start(stage)
+        elif d.get('status') == 'finished':
+            video.stop(stage)
+
+    def end_video(self, outcome, reason=None, file_path=None, failure_kind=None):
+        """
+        Records the current video as 'downloaded', 'skipped' or 'failed'
+        (with the retry_policy.py kind of failure).
+        """
+
+        video = self.current_video()
+        self._local.video = None
+
+        if video is None:
+            return
+
+        video.close()
+
+        self._emit({
+            'event': 'video',
+            'url': video.url,
+            'video_id': video.video_id,
+            'outcome': outcome,
+            'reason': failure_reason(reason) if outcome == 'failed' else reason,
+            'seconds': round(time.perf_counter() - video.started, 4),
+            'stages': {stage: round(seconds, 4) for stage, seconds in video.stages.items()},
+            'bytes': video.bytes,
+            'retries': video.retries,
+            'file_path': str(file_path) if file_path else None,
+            'failure_kind': failure_kind,
+        })
+
+    # End of run
+
+    def finish(self, **fields):
+        """
+        Records the run's total time and counts, with any extra fields.
+        """
+
+        seconds = time.perf_counter() - self.started
+
+        self._emit({
+            'event': 'run',
+            'seconds': round(seconds, 4),
+            'outcomes': dict(self.outcomes),
+            'bytes': self.bytes,
+            'retries': self.retries,
+            **fields,
+        })
+
+        return seconds
+
+    def summary_lines(self, seconds=None):
+        lines = [
+            f"{'stage':<24} {'count':>7} {'total s':>10} {'mean s':>9} {'max s':>9}",
+        ]
+
+        for stage, (count, total, longest) in self.stages.items():
+            lines.append(
+                f"{stage[:24]:<24} {count:>7} {total:>10.1f} {total / count:>9.2f} {longest:>9.2f}"
+            )
+
+        lines.append(
+            f"videos: {self.outcomes['downloaded']} downloaded, {self.outcomes['skipped']} skipped, "
+            f"{self.outcomes['failed']} failed; {format_bytes(self.bytes)} transferred, "
+            f"{self.retries} retries"
+            + (f", {seconds:.1f}s total" if seconds is not None else "")
+        )
+
+        if self.failure_kinds:
+            lines.append("failures: " + ", ".join(
+                f"{count} {kind}" for kind, count in self.failure_kinds.most_common()
+            ))
+
+        for reason, count in self.failures.most_common(10):
+            lines.append(f"  {count}x {reason}")
+
+        return lines
+
+    def log_summary(self, seconds=None):
+        for line in self.summary_lines(seconds):
+            logging.info(line)
+
+    def write_prometheus(self, path, seconds=None):
+        """
+        Writes the run's totals in the Prometheus text format, for
+        node_exporter's textfile collector. The file is replaced atomically,
+        as the collector requires.
+        """
+
+        def label(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_last_run_timestamp_seconds When the last run finished.",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {time.time():.0f}",
+            f"# HELP {p}_run_duration_seconds Wall time of the last run.",
+            f"# TYPE {p}_run_duration_seconds gauge",
+            f"{p}_run_duration_seconds {seconds if seconds is not None else time.perf_counter() - self.started:.3f}",
+            f"# HELP {p}_videos Videos by outcome in the last run.",
+            f"# TYPE {p}_videos gauge",
+        ]
+
+        for outcome in ('downloaded', 'skipped', 'failed'):
+            lines.append(f'{p}_videos{{outcome="{outcome}"}} {self.outcomes[outcome]}')
+
+        lines += [
+            f"# HELP {p}_failures Failed videos by kind (permanent, transient, rate_limited) in the last run.",
+            f"# TYPE {p}_failures gauge",
+        ]
+
+        for kind, count in sorted(self.failure_kinds.items()):
+            lines.append(f'{p}_failures{{kind="{label(kind)}"}} {count}')
+
+        lines += [
+            f"# HELP {p}_bytes Bytes transferred in the last run.",
+            f"# TYPE {p}_bytes gauge",
+            f"{p}_bytes {self.bytes}",
+            f"# HELP {p}_retries yt-dlp retries in the last run.",
+            f"# TYPE {p}_retries gauge",
+            f"{p}_retries {self.retries}",
+            f"# HELP {p}_stage_seconds Time spent per stage in the last run, summed over videos.",
+            f"# TYPE {p}_stage_seconds gauge",
+        ]
+
+        for stage, (_, total, _) in self.stages.items():
+            lines.append(f'{p}_stage_seconds{{stage="{label(stage)}"}} {total:.3f}')
+
+        lines += [
+            f"# HELP {p}_stage_count Times each stage ran in the last run.",
+            f"# TYPE {p}_stage_count gauge",
+        ]
+
+        for stage, (count, _, _) in self.stages.items():
+            lines.append(f'{p}_stage_count{{stage="{label(stage)}"}} {count}')
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + '.tmp')
+
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        os.replace(temp_path, path)
+
+
+def read_events(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise YT Downloader v7 runs from the metrics file.")
+    parser.add_argument('--metrics', default=str(DEFAULT_METRICS_FILE), help="Metrics JSONL path.")
+    parser.add_argument('--run', help="Run ID to summarise (default: the last run).")
+    parser.add_argument('--list', action='store_true', help="List the runs in the file.")
+    args = parser.parse_args()
+
+    runs = {}
+
+    for event in read_events(args.metrics):
+        runs.setdefault(event['run'], []).append(event)
+
+    if not runs:
+        print(f"No runs in {args.metrics}")
+        return
+
+    if args.list:
+        for run_id, events in runs.items():
+            totals = RunMetrics()
+            for event in events:
+                totals.ingest(event)
+            finished = next((e for e in events if e['event'] == 'run'), None)
+            print(
+                f"{run_id}: {totals.outcomes['downloaded']} downloaded, {totals.outcomes['failed']} failed"
+                + (f", {finished['seconds']:.0f}s" if finished else " (unfinished)")
+            )
+        return
+
+    run_id = args.run or list(runs)[-1]
+
+    if run_id not in runs:
+        parser.error(f"No run {run_id} in {args.metrics}")
+
+    totals = RunMetrics()
+    finished = None
+
+    for event in runs[run_id]:
+        totals.ingest(event)
+        if event['event'] == 'run':
+            finished = event
+
+    print(f"Run {run_id}" + ("" if finished else " (unfinished)"))
+
+    for line in totals.summary_lines(finished['seconds'] if finished else None):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
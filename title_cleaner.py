@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+from functools import lru_cache
+
+
+# Union of YT Downloader v7's remove_phrases and the list mp3 rename.py used
+DEFAULT_REMOVE_PHRASES = (
+    '(as)', '(sa)', '(A S )', 'a s', '(a.s)', '(a.s.)',
+    ' س ', 'ﷺ', ' ص ', '(ص)', '()', 's a w w', 'new', 'NEW',
+    ' ع ', '(ع)', '(س)', '( )',
+)
+
+# Full-width and look-alike punctuation yt-dlp substitutes into titles
+PUNCTUATION_FOLD = str.maketrans({
+    '｜': '|',
+    '⧸': '/',
+    '：': ':',
+    '＂': '"',
+})
+
+DEVANAGARI = r'[\u0900-\u097F]+'
+
+# ASCII punctuation other than parentheses (which covers every character
+# that is problematic in filenames), and underscores, as mp3 rename.py
+# always treated them
+ASCII_PUNCTUATION = r'[^\w\s\u0080-\uFFFF()]+|_+'
+
+# The " [video ID]" yt-dlp's outtmpl appends; IDs contain _ and -, so the
+# tag is set aside rather than cleaned
+VIDEO_ID_TAG = re.compile(r'\s*\[([0-9A-Za-z_-]{11})\]\s*$')
+
+
+@lru_cache(maxsize=8)
+def compile_cleaner(remove_phrases):
+    """
+    Builds one case-insensitive alternation of Devanagari runs, every
+    phrase, ASCII punctuation and underscores, all of which are replaced
+    by a space, so a title is cleaned in a single regex pass. Phrases are
+    tried longest first, so '(a.s.)' wins over '(a.s)', and before the
+    punctuation, so '(a.s.)' is removed as a whole.
+    """
+
+    phrases = sorted(
+        {phrase.lower(): phrase for phrase in remove_phrases if phrase}.values(),
+        key=len,
+        reverse=True
+    )
+    alternatives = [DEVANAGARI] + [re.escape(phrase) for phrase in phrases] + [ASCII_PUNCTUATION]
+
+    return re.compile('|'.join(alternatives), flags=re.IGNORECASE)
+
+
+def clean_name(title, remove_phrases=DEFAULT_REMOVE_PHRASES):
+    """
+    Cleans a title for filename use while preserving Arabic/Urdu. Returns
+    the name without an extension, 'untitled' if nothing is left. A
+    trailing " [video ID]" is kept as it is.
+    """
+
+    tag = VIDEO_ID_TAG.search(title)
+    suffix = ''
+
+    if tag:
+        title = title[:tag.start()]
+        suffix = f" [{tag.group(1)}]"
+
+    pattern = compile_cleaner(tuple(remove_phrases))
+    title = pattern.sub(' ', title.translate(PUNCTUATION_FOLD))
+
+    # Normalize whitespace and drop leading separators
+    title = ' '.join(title.split()).lstrip('_.- ')
+
+    return (title or 'untitled') + suffix
@@ -1,17 +1,289 @@
+import argparse
+import errno
+import hashlib
+import json
 import os
+import sys
 import shutil
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def move_files(directory):
-    for root, _, files in os.walk(directory):
-        for file in files:
-            src_file = os.path.join(root, file)
-            dest_file = os.path.join(directory, file)
-            if os.path.exists(dest_file):
-                print(f"File '{file}' already exists in the main directory.")
-            else:
-                shutil.move(src_file, dest_file)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from library_index import DEFAULT_INDEX_FILE, LibraryIndex
+
+# Undo log of the last run; --rollback replays it backwards
+JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tree_collapse_journal.jsonl')
+
+HASH_CHUNK = 1024 * 1024
+
+def file_hash(path):
+    digest = hashlib.blake2b()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+    except OSError as e:
+        print(f"Could not read '{path}': {e}")
+        return None
+    return digest.hexdigest()
+
+def plan_moves(directory, index, workers=None):
+    """
+    Returns the full plan for pulling every nested file up into `directory`
+    as a list of (action, source, destination):
+
+    ('move', src, dest)  dest is free; a name already taken by different
+                         content gets " 1", " 2", ... before the extension
+    ('drop', src, kept)  src is byte-identical to the file ending up at kept
+
+    Contents are only hashed for files whose name and size both collide,
+    on a thread pool.
+    """
+
+    directory = os.path.abspath(directory)
+    index.refresh(directory)
+    rows = index.files(directory)
+
+    sizes = {row['path']: row['size'] for row in rows}
+    nested = [row['path'] for row in rows if row['folder'] != directory]
+
+    # Case-folded on case-insensitive filesystems; maps name -> (content, final path)
+    taken = {
+        os.path.normcase(row['name']): (row['path'], row['path'])
+        for row in rows
+        if row['folder'] == directory
+    }
+
+    by_name = defaultdict(list)
+    for path in sizes:
+        by_name[os.path.normcase(os.path.basename(path))].append(path)
+
+    to_hash = set()
+    for paths in by_name.values():
+        if len(paths) > 1:
+            size_counts = Counter(sizes[path] for path in paths)
+            to_hash.update(path for path in paths if size_counts[sizes[path]] > 1)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = dict(zip(to_hash, executor.map(file_hash, to_hash)))
+
+    def same_content(a, b):
+        if sizes[a] != sizes[b]:
+            return False
+        for path in (a, b):
+            if path not in hashes:
+                hashes[path] = file_hash(path)
+        return hashes[a] is not None and hashes[a] == hashes[b]
+
+    plan = []
+    for src in nested:
+        name = os.path.basename(src)
+        stem, ext = os.path.splitext(name)
+        candidate = name
+        count = 1
+
+        while True:
+            occupant = taken.get(os.path.normcase(candidate))
+
+            if occupant is None:
+                dest = os.path.join(directory, candidate)
+                taken[os.path.normcase(candidate)] = (src, dest)
+                plan.append(('move', src, dest))
+                break
+
+            content, final_path = occupant
+            if same_content(src, content):
+                plan.append(('drop', src, final_path))
+                break
+
+            candidate = f"{stem} {count}{ext}"
+            count += 1
+
+    return plan
+
+def print_plan(plan):
+    for action, src, dest in plan:
+        if action == 'move':
+            print(f"move  {src} -> {dest}")
+        else:
+            print(f"drop  {src} (same as {dest})")
+
+    moves = [(src, dest) for action, src, dest in plan if action == 'move']
+    suffixed = sum(1 for src, dest in moves if os.path.basename(src) != os.path.basename(dest))
+    dropped = len(plan) - len(moves)
+    print(f"{len(moves)} files to move ({suffixed} renamed with a suffix), {dropped} duplicates to drop.")
+
+def copy_across(src, dest):
+    # Copy to a temporary name first so an interrupted copy never looks finished
+    partial = dest + '.part'
+    shutil.copy2(src, partial)
+    os.replace(partial, dest)
+    os.remove(src)
+
+def execute_plan(plan, directory, index, journal_file=JOURNAL_FILE, workers=None):
+    """
+    Carries out a plan from plan_moves(). Same-filesystem moves are a
+    single os.rename; moves that cross devices are copied on a thread
+    pool. Every step is written to the journal before it happens, so
+    rollback() can undo a run even if it was interrupted. Empty
+    subfolders are removed at the end. Returns counts by outcome.
+    """
+
+    directory = os.path.abspath(directory)
+    results = Counter()
+    copies = []
+    moved = []
+    dropped = []
+
+    with open(journal_file, 'w', encoding='utf-8') as journal:
+        def log(entry):
+            journal.write(json.dumps(entry) + '\n')
+            journal.flush()
+
+        for action, src, dest in plan:
+            try:
+                if action == 'drop':
+                    log({'action': 'drop', 'src': src, 'same_as': dest})
+                    os.remove(src)
+                    dropped.append(src)
+                    results['dropped'] += 1
+                    continue
+
+                if os.path.lexists(dest):
+                    print(f"Skipped '{src}': '{dest}' appeared since planning.")
+                    results['skipped'] += 1
+                    continue
+
+                log({'action': 'move', 'src': src, 'dest': dest})
+                os.rename(src, dest)
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    copies.append((src, dest))
+                    continue
+                print(f"Error on '{src}': {e}")
+                results['failed'] += 1
+                continue
+
+            moved.append((src, dest))
+            results['renamed'] += 1
+
+        if copies:
+            for src, dest in copies:
+                log({'action': 'copy', 'src': src, 'dest': dest})
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(copy_across, src, dest): (src, dest) for src, dest in copies}
+
+                for future in as_completed(futures):
+                    src, dest = futures[future]
+                    try:
+                        future.result()
+                    except OSError as e:
+                        print(f"Error copying '{src}': {e}")
+                        results['failed'] += 1
+                        continue
+
+                    moved.append((src, dest))
+                    results['copied'] += 1
+
+        for root, _, _ in os.walk(directory, topdown=False):
+            if root == directory:
+                continue
+            try:
+                os.rmdir(root)
+            except OSError:
+                continue
+            log({'action': 'rmdir', 'path': root})
+
+    # One index transaction for the whole run
+    index.forget(dropped)
+    index.record_moves(moved)
+    return results
+
+def rollback(journal_file=JOURNAL_FILE):
+    """
+    Undoes the run recorded in the journal. Dropped duplicates are
+    restored first, by copying the identical file that was kept while it
+    is still where the run left it; then moves are undone newest first.
+    Returns the number of files put back.
+    """
+
+    with open(journal_file, encoding='utf-8') as journal:
+        entries = [json.loads(line) for line in journal if line.strip()]
+
+    for entry in entries:
+        if entry['action'] == 'rmdir':
+            os.makedirs(entry['path'], exist_ok=True)
+
+    restored = 0
+    for entry in entries:
+        if entry['action'] != 'drop':
+            continue
+
+        src = entry['src']
+        if not os.path.exists(src) and os.path.exists(entry['same_as']):
+            os.makedirs(os.path.dirname(src), exist_ok=True)
+            shutil.copy2(entry['same_as'], src)
+            restored += 1
+
+    for entry in reversed(entries):
+        action = entry['action']
+        if action not in ('move', 'copy'):
+            continue
+
+        src = entry['src']
+        dest = entry['dest']
+        os.makedirs(os.path.dirname(src), exist_ok=True)
+
+        if os.path.exists(src):
+            # Interrupted copy: the original is still in place
+            if action == 'copy':
+                for leftover in (dest, dest + '.part'):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+            continue
+
+        if os.path.exists(dest):
+            shutil.move(dest, src)
+            restored += 1
+
+    os.replace(journal_file, journal_file + '.undone')
+    return restored
+
+def move_files(directory, dry_run=False, workers=None, journal_file=JOURNAL_FILE, index_file=DEFAULT_INDEX_FILE):
+    # The library index lists the tree; moves are recorded so it stays current
+    index = LibraryIndex(index_file)
+    try:
+        plan = plan_moves(directory, index, workers)
+
+        if dry_run:
+            print_plan(plan)
+            return
+
+        results = execute_plan(plan, directory, index, journal_file, workers)
+        summary = ', '.join(f"{count} {outcome}" for outcome, count in sorted(results.items()))
+        print(f"{summary or 'Nothing to move'}. Undo with --rollback ({journal_file}).")
+    finally:
+        index.close()
 
 
 # Replace 'directory_path' with the path of your directory
 directory_path = r'D:\Audio\Zainab'
-move_files(directory_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move every file in the subfolders up into the top folder.")
+    parser.add_argument('directory', nargs='?', default=directory_path)
+    parser.add_argument('--dry-run', action='store_true', help="Print the plan without touching any file.")
+    parser.add_argument('--workers', type=int, default=None, help="Threads for hashing and cross-device copies.")
+    parser.add_argument('--journal', default=JOURNAL_FILE, help="Where to record the run for --rollback.")
+    parser.add_argument('--rollback', action='store_true', help="Undo the run recorded in the journal.")
+    args = parser.parse_args()
+
+    if args.rollback:
+        print(f"Restored {rollback(args.journal)} files.")
+        index = LibraryIndex()
+        index.refresh(args.directory)
+        index.close()
+    else:
+        move_files(args.directory, args.dry_run, args.workers, args.journal)
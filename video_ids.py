@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import base64
+import re
+import sys
+from array import array
+from bisect import bisect_left, insort
+from urllib.parse import parse_qs, urlparse
+
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+CHAR_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+
+VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+# The forms nearly every history line uses, matched without urlparse.
+# Anything else (other hosts, v= later in the query, ...) takes the slow path.
+COMMON_URL_RE = re.compile(
+    r'(?:https?://)?(?:'
+    r'(?:www\.|m\.)?youtube\.com/watch\?v=([0-9A-Za-z_-]{11})(?:[&#].*)?'
+    r'|youtu\.be/([0-9A-Za-z_-]{11})(?:[/?#].*)?'
+    r'|(?:www\.|m\.)?youtube\.com/(?:shorts|embed|live)/([0-9A-Za-z_-]{11})(?:[/?#].*)?'
+    r')'
+)
+
+# Newline-separated IDs that all fit in 64 bits (see pack_video_id).
+PACKABLE_BLOCK_RE = re.compile(r'(?:[0-9A-Za-z_-]{10}[AEIMQUYcgkosw048]\n)*')
+
+# Path prefixes that carry the ID as the next path segment. It wins over a
+# v= query parameter, as in COMMON_URL_RE.
+PATH_PREFIXES = ('shorts', 'embed', 'live', 'v', 'e')
+
+YOUTUBE_DOMAINS = ('youtube.com', 'youtube-nocookie.com')
+
+
+def is_youtube_host(host):
+    return any(host == domain or host.endswith('.' + domain) for domain in YOUTUBE_DOMAINS)
+
+
+def parse_video_id(value):
+    """
+    Returns the 11-character YouTube video ID for a bare ID or any of the
+    usual URL forms (watch?v=, youtu.be/, /shorts/, /embed/, /live/, with or
+    without extra query parameters), or None if there isn't one.
+    """
+
+    if not value:
+        return None
+
+    value = value.strip()
+
+    if VIDEO_ID_RE.match(value):
+        return value
+
+    match = COMMON_URL_RE.fullmatch(value)
+
+    if match:
+        return match.group(1) or match.group(2) or match.group(3)
+
+    if '://' not in value:
+        value = 'https://' + value
+
+    parsed = urlparse(value)
+    host = (parsed.hostname or '').lower()
+    segments = [segment for segment in parsed.path.split('/') if segment]
+
+    if host == 'youtu.be':
+        candidate = segments[0] if segments else None
+    elif is_youtube_host(host):
+        if len(segments) >= 2 and segments[0] in PATH_PREFIXES:
+            candidate = segments[1]
+        else:
+            candidate = parse_qs(parsed.query).get('v', [None])[0]
+    else:
+        return None
+
+    if candidate and VIDEO_ID_RE.match(candidate):
+        return candidate
+
+    return None
+
+
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def canonical_video_url(value):
+    """
+    Rewrites any recognised video URL to the watch?v= form; anything else
+    is returned unchanged.
+    """
+
+    video_id = parse_video_id(value)
+    return video_url(video_id) if video_id else value
+
+
+def pack_video_id(video_id):
+    """
+    Packs an ID into a 64-bit integer. Real YouTube IDs encode 64 bits, so
+    the last character only ever carries 4 bits; IDs that don't fit return
+    None.
+    """
+
+    value = 0
+
+    for char in video_id[:10]:
+        value = (value << 6) | CHAR_VALUES[char]
+
+    last = CHAR_VALUES[video_id[10]]
+
+    if last & 3:
+        return None
+
+    return (value << 4) | (last >> 2)
+
+
+def unpack_video_id(value):
+    chars = [ALPHABET[(value & 15) << 2]]
+    value >>= 4
+
+    for _ in range(10):
+        chars.append(ALPHABET[value & 63])
+        value >>= 6
+
+    return ''.join(reversed(chars))
+
+
+def pack_video_ids(video_ids):
+    """
+    Bulk pack_video_id(): returns an unsorted array('Q'), or None if any ID
+    doesn't fit. Decodes everything in two base64 calls instead of one
+    Python-level loop per character, which keeps a 100k history load well
+    under a tenth of a second.
+    """
+
+    if not video_ids:
+        return array('Q')
+
+    if not PACKABLE_BLOCK_RE.fullmatch('\n'.join(video_ids) + '\n'):
+        return None
+
+    count = len(video_ids)
+    # Characters 0-7 decode to 6 whole bytes; 8-10 (plus padding) to 3 bytes
+    # of which the first 2 hold the remaining 16 bits.
+    head = base64.urlsafe_b64decode(''.join(video_id[:8] for video_id in video_ids))
+    tail = base64.urlsafe_b64decode(''.join(video_id[8:] + 'A' for video_id in video_ids))
+
+    raw = bytearray(8 * count)
+
+    for offset in range(6):
+        raw[offset::8] = head[offset::6]
+
+    raw[6::8] = tail[0::3]
+    raw[7::8] = tail[1::3]
+
+    packed = array('Q')
+    packed.frombytes(bytes(raw))
+
+    if sys.byteorder == 'little':
+        packed.byteswap()
+
+    return packed
+
+
+class VideoIdSet:
+    """
+    Memory-compact set of video IDs: a sorted array of packed 64-bit values
+    (8 bytes per ID, versus roughly 100 bytes for a URL string in a set)
+    with binary-search membership. IDs that can't be packed fall back to a
+    plain set.
+    """
+
+    def __init__(self, video_ids=()):
+        video_ids = list(video_ids)
+        self._other = set()
+        packed = pack_video_ids(video_ids)
+
+        if packed is None:
+            packed = []
+
+            for video_id in video_ids:
+                value = pack_video_id(video_id) if VIDEO_ID_RE.match(video_id) else None
+
+                if value is None:
+                    self._other.add(video_id)
+                else:
+                    packed.append(value)
+
+        self._packed = array('Q', sorted(set(packed)))
+
+    def __contains__(self, video_id):
+        if not video_id or not VIDEO_ID_RE.match(video_id):
+            return False
+
+        value = pack_video_id(video_id)
+
+        if value is None:
+            return video_id in self._other
+
+        index = bisect_left(self._packed, value)
+        return index < len(self._packed) and self._packed[index] == value
+
+    def __len__(self):
+        return len(self._packed) + len(self._other)
+
+    def __iter__(self):
+        for value in self._packed:
+            yield unpack_video_id(value)
+
+        yield from self._other
+
+    def add(self, video_id):
+        if video_id in self:
+            return
+
+        value = pack_video_id(video_id) if VIDEO_ID_RE.match(video_id) else None
+
+        if value is None:
+            self._other.add(video_id)
+        else:
+            insort(self._packed, value)
+
+    def union(self, other):
+        """
+        Returns a new set holding both; cheaper than adding one at a time
+        when `other` is large.
+        """
+
+        result = VideoIdSet(other)
+        result._packed = array('Q', sorted(set(self._packed) | set(result._packed)))
+        result._other |= self._other
+        return result